@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按年分区的日线数据集
+多年历史日线以紧凑格式（见 bar_schema.py）保存为未压缩的 Arrow IPC（Feather v2）文件，
+目录结构为 <数据集目录>/year=YYYY/bars.arrow，可直接用 pyarrow.dataset 按 hive 分区读取，
+各股票的上市日期保存在 <数据集目录>/listing_dates.csv。
+分批抓取时每批先按年暂存为分段文件（<数据集目录>/_staging/，hive 分区读取时忽略），
+全部写完后每个年分区只合并重写一次。
+每个分区内按 (股票代码, 日期) 排序，文件元数据记录每只股票的行范围；
+读取时内存映射文件，按日期范围和股票筛选只访问用到的行，连续的行直接零拷贝映射为 numpy 数组，
+涨停识别按年分区逐段进行（见 limit_up_engine.detect_limit_up_chunks）
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from bar_schema import COMPACT_COLUMNS, compact_stock_bars, decode_codes, decode_dates, encode_dates
+from limit_up_engine import concat_stock_bars, group_start_mask, listing_date_series
+
+logger = logging.getLogger(__name__)
+
+PARTITION_FILE = 'bars.arrow'
+LISTING_FILE = 'listing_dates.csv'
+# 暂存分段文件的目录（下划线开头，pyarrow.dataset 默认忽略）
+STAGING_DIR = '_staging'
+# 分区文件元数据中股票行范围索引的键
+INDEX_KEY = b'gem_bar_index'
+DEFAULT_BATCH_SIZE = 200
+
+
+def _day(value):
+    return None if value is None else int(encode_dates([value])[0])
+
+
+def _year_of(days):
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _year_bounds(year):
+    return _day(f"{year}-01-01"), _day(f"{year}-12-31")
+
+
+def _write_arrow(path, bars):
+    """紧凑格式日线写为单个记录批次的 Arrow IPC 文件（先写临时文件再原子替换）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = frame_to_table(bars)
+    temp_path = f"{path}.tmp"
+    with pa.OSFile(temp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            # 整个文件写为一个记录批次，读取时每列都是一段连续内存
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    # 已映射的旧文件在引用释放前仍然有效
+    os.replace(temp_path, path)
+
+
+def _read_arrow(path):
+    return ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def _single_chunk(column):
+    return column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+
+def frame_to_table(bars):
+    """紧凑格式日线表转换为 Arrow 表，股票名称保存为字典编码
+
+    字典下标的整数类型与 pandas 分类类型的编码一致，读取时可零拷贝还原为分类列
+    """
+    names = pd.Categorical(bars['name']).remove_unused_categories()
+    arrays, fields = [], []
+    for column in COMPACT_COLUMNS:
+        if column == 'name':
+            array = pa.DictionaryArray.from_arrays(
+                pa.array(names.codes), pa.array(np.asarray(names.categories, dtype=object), pa.string()))
+        else:
+            array = pa.array(bars[column].to_numpy())
+        arrays.append(array)
+        fields.append(pa.field(column, array.type))
+
+    codes = bars['code'].to_numpy()
+    starts = np.flatnonzero(group_start_mask(codes))
+    dates = bars['date'].to_numpy()
+    index = {
+        'codes': codes[starts].tolist(),
+        'offsets': starts.tolist() + [len(codes)],
+        'min_date': int(dates.min()),
+        'max_date': int(dates.max()),
+    }
+    schema = pa.schema(fields, metadata={INDEX_KEY: json.dumps(index)})
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def table_to_frame(table, rows=None):
+    """Arrow 表转换为紧凑格式日线表
+
+    rows 为 None 时各列直接引用 Arrow 缓冲区（内存映射文件时不复制数据），
+    否则只取出 rows 指定的行
+    """
+    columns = {}
+    for column in COMPACT_COLUMNS:
+        array = _single_chunk(table.column(column))
+        if column == 'name':
+            codes = array.indices.to_numpy()
+            categories = pd.Index(array.dictionary.to_numpy(zero_copy_only=False), dtype=object)
+            columns[column] = pd.Categorical.from_codes(codes if rows is None else codes[rows],
+                                                        categories=categories, validate=False)
+        else:
+            values = array.to_numpy()
+            columns[column] = values if rows is None else values[rows]
+    return pd.DataFrame(columns, columns=COMPACT_COLUMNS, copy=False)
+
+
+def _range_rows(starts, stops):
+    """多个 [start, stop) 行范围展开为行号数组"""
+    lengths = stops - starts
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+
+
+class _Partition:
+    """一个内存映射的年分区：Arrow 表和每只股票的行范围"""
+
+    def __init__(self, path):
+        self.table = _read_arrow(path)
+        index = json.loads(self.table.schema.metadata[INDEX_KEY])
+        self.codes = np.asarray(index['codes'], dtype=np.int32)
+        self.offsets = np.asarray(index['offsets'], dtype=np.int64)
+        self.min_date = index['min_date']
+        self.max_date = index['max_date']
+
+    def row_ranges(self, start=None, end=None, codes=None):
+        """筛选条件对应的行范围 (starts, stops)，日期范围只在各股票的行内二分查找"""
+        positions = np.arange(len(self.codes)) if codes is None else np.flatnonzero(np.isin(self.codes, codes))
+        starts, stops = self.offsets[positions], self.offsets[positions + 1]
+        if (start is not None and start > self.min_date) or (end is not None and end < self.max_date):
+            dates = _single_chunk(self.table.column('date')).to_numpy()
+            starts, stops = starts.copy(), stops.copy()
+            for i, (lo, hi) in enumerate(zip(starts, stops)):
+                segment = dates[lo:hi]
+                if start is not None:
+                    starts[i] = lo + np.searchsorted(segment, start, side='left')
+                if end is not None:
+                    stops[i] = lo + np.searchsorted(segment, end, side='right')
+        keep = stops > starts
+        return starts[keep], stops[keep]
+
+    def select(self, start=None, end=None, codes=None):
+        """按日期范围和股票筛选，返回紧凑格式日线表；没有符合条件的行时返回 None
+
+        选中的行连续时零拷贝切片，否则只复制选中的行
+        """
+        starts, stops = self.row_ranges(start, end, codes)
+        if not len(starts):
+            return None
+        if np.array_equal(starts[1:], stops[:-1]):
+            return table_to_frame(self.table.slice(starts[0], stops[-1] - starts[0]))
+        return table_to_frame(self.table, _range_rows(starts, stops))
+
+
+class BarDataset:
+    """按年分区、内存映射读取的日线数据集
+
+    write() 写入紧凑格式日线（同一股票同一日期以新数据为准），分批写入时用 append() 暂存、compact() 一次合并，
+    iter_partitions() 按时间先后逐个分区产出筛选后的日线，load() 返回拼接后的完整日线表
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._partitions = {}
+
+    def _partition_path(self, year):
+        return os.path.join(self.path, f"year={year}", PARTITION_FILE)
+
+    def years(self):
+        if not os.path.isdir(self.path):
+            return []
+        years = [int(entry[5:]) for entry in os.listdir(self.path)
+                 if entry.startswith('year=') and entry[5:].isdigit()]
+        return sorted(year for year in years if os.path.exists(self._partition_path(year)))
+
+    def partition(self, year):
+        """打开（并缓存）一个年分区的内存映射"""
+        if year not in self._partitions:
+            self._partitions[year] = _Partition(self._partition_path(year))
+        return self._partitions[year]
+
+    def date_range(self):
+        """数据集覆盖的 (首个日期, 最后日期)，为空时返回 (None, None)"""
+        years = self.years()
+        if not years:
+            return None, None
+        first, last = self.partition(years[0]), self.partition(years[-1])
+        return str(decode_dates([first.min_date])[0]), str(decode_dates([last.max_date])[0])
+
+    def stats(self):
+        years = self.years()
+        return {
+            'partitions': len(years),
+            'rows': sum(self.partition(year).table.num_rows for year in years),
+            'stocks': len(set().union(*(self.partition(year).codes.tolist() for year in years))),
+            'bytes': sum(os.path.getsize(self._partition_path(year)) for year in years),
+        }
+
+    def write(self, bars):
+        """写入紧凑格式日线，按年合并到已有分区，返回写入的分区年份
+
+        每次调用都会重写涉及的整个年分区，分批写入时使用 append() 和 compact()
+        """
+        if bars is None or bars.empty:
+            return []
+        years = _year_of(bars['date'].to_numpy())
+        written = []
+        for year in np.unique(years):
+            self._merge_partition(int(year), [bars[years == year]])
+            written.append(int(year))
+        return written
+
+    def append(self, bars):
+        """按年暂存一批紧凑格式日线，不改动已有分区，compact() 后才可读取"""
+        if bars is None or bars.empty:
+            return
+        years = _year_of(bars['date'].to_numpy())
+        for year in np.unique(years):
+            directory = os.path.join(self.path, STAGING_DIR, f"year={int(year)}")
+            sequence = len(os.listdir(directory)) if os.path.isdir(directory) else 0
+            _write_arrow(os.path.join(directory, f"{sequence:06d}.arrow"), bars[years == year])
+
+    def compact(self):
+        """把暂存的分段按写入顺序合并到各年分区，每个分区只重写一次，返回写入的分区年份"""
+        staging = os.path.join(self.path, STAGING_DIR)
+        if not os.path.isdir(staging):
+            return []
+        written = []
+        for entry in sorted(os.listdir(staging)):
+            directory = os.path.join(staging, entry)
+            parts = [table_to_frame(_read_arrow(os.path.join(directory, name)))
+                     for name in sorted(os.listdir(directory)) if name.endswith('.arrow')]
+            if parts:
+                self._merge_partition(int(entry[5:]), parts)
+                written.append(int(entry[5:]))
+        shutil.rmtree(staging)
+        return written
+
+    def _merge_partition(self, year, parts):
+        """已有分区与新数据（按写入顺序）合并后重写分区"""
+        if year in self.years():
+            parts = [table_to_frame(self.partition(year).table)] + parts
+        part = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        # 同一股票同一日期保留最后写入的数据，分区内按 (股票代码, 日期) 排序
+        part = part.drop_duplicates(['code', 'date'], keep='last')
+        part = part.sort_values(['code', 'date'], kind='stable').reset_index(drop=True)
+        _write_arrow(self._partition_path(year), part)
+        self._partitions.pop(year, None)
+
+    def save_listing_dates(self, listing_dates):
+        """保存各股票的上市日期（listing_date_series 的结果），识别时用于排除新股上市初期的交易日"""
+        if listing_dates is None or listing_dates.empty:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        frame = pd.DataFrame({'code': decode_codes(listing_dates.index.to_numpy()),
+                              'listing_date': decode_dates(listing_dates.to_numpy())})
+        frame.to_csv(os.path.join(self.path, LISTING_FILE), index=False)
+
+    def listing_dates(self):
+        """各股票的上市日期，没有保存时为空"""
+        path = os.path.join(self.path, LISTING_FILE)
+        return listing_date_series(pd.read_csv(path, dtype=str) if os.path.exists(path) else None)
+
+    def iter_partitions(self, start_date=None, end_date=None, codes=None):
+        """按年份先后产出筛选后的紧凑格式日线表
+
+        start_date、end_date 为日期字符串（含两端），codes 为股票代码列表，为 None 时不筛选
+        """
+        start, end = _day(start_date), _day(end_date)
+        if codes is not None:
+            codes = np.asarray([int(code) for code in codes], dtype=np.int32)
+        for year in self.years():
+            first_day, last_day = _year_bounds(year)
+            if (start is not None and last_day < start) or (end is not None and first_day > end):
+                continue
+            frame = self.partition(year).select(start, end, codes)
+            if frame is not None:
+                yield frame
+
+    def load(self, start_date=None, end_date=None, codes=None):
+        """读取筛选后的全部日线，拼接为同一股票的行连续、按日期升序的紧凑格式日线表"""
+        frames = list(self.iter_partitions(start_date, end_date, codes))
+        if not frames:
+            return compact_stock_bars([])
+        if len(frames) == 1:
+            return frames[0]
+        bars = pd.concat(frames, ignore_index=True)
+        bars['name'] = bars['name'].astype('category')
+        # 各分区内已按股票和日期排序，按股票代码稳定排序即可
+        order = np.argsort(bars['code'].to_numpy(), kind='stable')
+        return bars.iloc[order].reset_index(drop=True)
+
+
+def build_dataset(scraper, dataset, days_back, batch_size=DEFAULT_BATCH_SIZE, stocks=None):
+    """用爬虫抓取最近 days_back 天的日线并写入数据集，返回写入的K线数
+
+    每 batch_size 只股票暂存一次，全部抓取完成后每个年分区只合并重写一次
+    """
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal total
+        bars = concat_stock_bars(batch)
+        dataset.append(bars)
+        total += len(bars)
+        batch.clear()
+
+    for stock_code, stock_name, frame in scraper.iter_stock_bars(days_back, stocks=stocks):
+        if frame is not None and not frame.empty:
+            batch.append((stock_code, stock_name, frame))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    dataset.compact()
+    dataset.save_listing_dates(scraper.get_listing_dates())
+    return total
+
+
+def parse_args(argv=None):
+    from bar_store import ADJUST_MODES
+    from data_providers import PROVIDERS
+
+    parser = argparse.ArgumentParser(description="按年分区的内存映射日线数据集")
+    parser.add_argument("command", choices=["build", "info"], help="build：抓取日线写入数据集；info：查看数据集概况")
+    parser.add_argument("--path", required=True, help="数据集目录")
+    parser.add_argument("--days", type=int, default=3650, help="build 时抓取最近多少天的日线（默认3650）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"每批写入的股票数（默认{DEFAULT_BATCH_SIZE}）")
+    parser.add_argument("--workers", type=int, default=1, help="并发抓取线程数（默认1）")
+    parser.add_argument("--rate", type=float, default=10.0, help="每秒最多请求次数（默认10）")
+    parser.add_argument("--adjust", choices=list(ADJUST_MODES), default="qfq", help="复权方式（默认qfq）")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="akshare", help="行情数据源")
+    parser.add_argument("--replay-dir", default=None, help="replay 数据源的录制目录")
+    parser.add_argument("--cache", default=None, help="本地日线仓库路径（默认 cache/<数据源名称>_daily_bars.sqlite）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    dataset = BarDataset(args.path)
+    if args.command == "build":
+        from data_providers import PROVIDERS
+        from gem_limitup_scraper import GEMLimitUpScraper, provider_options
+
+        scraper = GEMLimitUpScraper(max_workers=args.workers, requests_per_second=args.rate,
+                                    cache_path=args.cache, adjust=args.adjust,
+                                    provider=PROVIDERS[args.provider](**provider_options(args)))
+        rows = build_dataset(scraper, dataset, args.days, args.batch_size)
+        logger.info(f"已写入 {rows} 根K线")
+
+    first_date, last_date = dataset.date_range()
+    stats = dataset.stats()
+    print(f"数据集 {args.path}：{stats['partitions']} 个年分区，{stats['stocks']} 只股票，"
+          f"{stats['rows']} 根K线（{first_date} 至 {last_date}），{stats['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
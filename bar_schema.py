@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑日线数据格式
+只保留识别和统计需要的字段：股票代码编码为 int32，日期编码为 int32 天数（自1970-01-01），
+价格、涨跌额、换手率和复权乘数使用 float32，成交量使用 int32，成交额保留 float64 以免丢失精度，
+股票名称以分类类型存储
+"""
+
+import numpy as np
+import pandas as pd
+
+# 紧凑格式字段 -> akshare 日线字段
+SOURCE_COLUMNS = {
+    'date': '日期',
+    'open': '开盘',
+    'high': '最高',
+    'low': '最低',
+    'close': '收盘',
+    'change': '涨跌额',
+    'volume': '成交量',
+    'amount': '成交额',
+    'turnover': '换手率',
+    # 复权乘数（见 bar_store.MULTIPLIER_COLUMN），缺少时为 NaN，表示不知道是否经过复权
+    'factor': '复权乘数',
+}
+COMPACT_DTYPES = {
+    'code': np.int32,
+    'date': np.int32,
+    'open': np.float32,
+    'high': np.float32,
+    'low': np.float32,
+    'close': np.float32,
+    'change': np.float32,
+    'volume': np.int32,
+    'amount': np.float64,
+    'turnover': np.float32,
+    'factor': np.float32,
+}
+COMPACT_COLUMNS = ['code', 'name'] + list(SOURCE_COLUMNS)
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def encode_dates(values):
+    """日期（字符串、date 或 Timestamp）编码为 int32 天数"""
+    values = np.asarray(values)
+    try:
+        days = values.astype('datetime64[D]')
+    except (TypeError, ValueError):
+        # 带时间部分等非标准格式的字符串，截取日期部分后再解析
+        days = pd.Series(values).astype(str).str[:10].to_numpy().astype('datetime64[D]')
+    return days.astype(np.int64).astype(np.int32)
+
+
+def decode_dates(days):
+    """int32 天数解码为 YYYY-MM-DD 字符串数组"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype(str)
+
+
+def encode_code(stock_code):
+    return np.int32(int(stock_code))
+
+
+def decode_codes(codes):
+    """int32 股票代码解码为 6 位字符串数组"""
+    return np.char.mod('%06d', np.asarray(codes, dtype=np.int64))
+
+
+def _column(frame, source, dtype):
+    if source not in frame.columns:
+        return np.full(len(frame), np.nan, dtype=dtype) if np.issubdtype(dtype, np.floating) \
+            else np.zeros(len(frame), dtype=dtype)
+    values = frame[source].to_numpy(dtype=np.float64)
+    if np.issubdtype(dtype, np.integer):
+        values = np.nan_to_num(values)
+        # 超出 int32 范围时保留 int64，避免溢出
+        if len(values) and np.abs(values).max() > _INT32_MAX:
+            return values.astype(np.int64)
+    return values.astype(dtype)
+
+
+def compact_stock_bars(stock_frames):
+    """把多只股票的 akshare 日线数据转换并拼接为紧凑格式
+
+    stock_frames 为 (股票代码, 股票名称, 日线DataFrame) 的可迭代对象，
+    拼接后每只股票的行连续且保持原有日期顺序
+    """
+    parts = []
+    names = []
+    lengths = []
+    for stock_code, stock_name, frame in stock_frames:
+        if frame is None or frame.empty:
+            continue
+        part = {'date': encode_dates(frame['日期'])}
+        for column, source in SOURCE_COLUMNS.items():
+            if column != 'date':
+                part[column] = _column(frame, source, COMPACT_DTYPES[column])
+        parts.append((encode_code(stock_code), part))
+        names.append(stock_name)
+        lengths.append(len(frame))
+
+    if not parts:
+        return pd.DataFrame({column: pd.Series(dtype=COMPACT_DTYPES.get(column, object))
+                             for column in COMPACT_COLUMNS})
+
+    lengths = np.asarray(lengths)
+    categories, name_codes = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+    columns = {
+        'code': np.repeat(np.asarray([code for code, _ in parts], dtype=np.int32), lengths),
+        'name': pd.Categorical.from_codes(np.repeat(name_codes, lengths), categories=categories),
+    }
+    for column in SOURCE_COLUMNS:
+        columns[column] = np.concatenate([part[column] for _, part in parts])
+    return pd.DataFrame(columns, columns=COMPACT_COLUMNS)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地日线数据仓库
+使用 SQLite 按 (股票代码, 日期) 持久化不复权日线数据，并记录每只股票已覆盖的日期区间，
+抓取时只需下载缺失的日期区间。复权因子单独存储，读取时按需计算前复权/后复权价格，
+除权除息只需更新一张很小的因子表，不会使已缓存的历史数据失效
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+# akshare 日线字段 -> 仓库字段
+COLUMN_MAP = {
+    '日期': 'date',
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'pct_change',
+    '涨跌额': 'change',
+    '换手率': 'turnover',
+}
+STORE_COLUMNS = list(COLUMN_MAP.values())
+COLUMN_MAP_REVERSE = {value: key for key, value in COLUMN_MAP.items()}
+# 复权时需要调整的价格字段
+PRICE_COLUMNS = ['open', 'close', 'high', 'low', 'change']
+# 读取结果中每根K线的复权乘数（复权价格 / 不复权价格，不复权或未除权时为 1）
+MULTIPLIER_COLUMN = '复权乘数'
+ADJUST_MODES = ('qfq', 'hfq', 'none')
+
+# 仓库结构版本；旧版本（存储前复权价格）的缓存会被清空重建
+SCHEMA_VERSION = 2
+# 判断除权除息时允许的价格误差（元）
+EX_RIGHTS_TOLERANCE = 0.011
+# A股收盘时间（北京时间），收盘前当天的K线尚未定型
+MARKET_TIMEZONE = timezone(timedelta(hours=8))
+MARKET_CLOSE_HOUR = 15
+
+
+def last_settled_date(now=None):
+    """最后一个K线已定型的自然日：北京时间 15:00 收盘后为今天，收盘前为昨天
+
+    now 为带时区的 datetime，默认当前时间
+    """
+    now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    today = now.date()
+    return today if now.hour >= MARKET_CLOSE_HOUR else today - timedelta(days=1)
+
+
+def adjustment_multiplier(bar_dates, factor_dates, factor_values, adjust):
+    """计算每根K线的复权乘数
+
+    factor_dates/factor_values 为按日期升序的后复权累计因子，自对应日期起生效；
+    第一条因子之前的日期视为未发生除权（因子为 1）。前复权乘数再除以最新因子
+    """
+    multiplier = np.ones(len(bar_dates), dtype=np.float64)
+    if adjust == 'none' or len(factor_values) == 0:
+        return multiplier
+    factor_values = np.asarray(factor_values, dtype=np.float64)
+    position = np.searchsorted(np.asarray(factor_dates), np.asarray(bar_dates), side='right') - 1
+    multiplier = np.where(position >= 0, factor_values[np.maximum(position, 0)], 1.0)
+    if adjust == 'qfq':
+        multiplier = multiplier / factor_values[-1]
+    return multiplier
+
+
+def adjust_bars(bars, factor_dates, factor_values, adjust):
+    """不复权日线（akshare 字段）按后复权累计因子复权，四舍五入到分，并增加复权乘数列"""
+    bars = bars.copy()
+    multiplier = adjustment_multiplier(bars['日期'].map(lambda value: str(value)[:10]).to_numpy(),
+                                       np.asarray(factor_dates), factor_values, adjust)
+    columns = [COLUMN_MAP_REVERSE[column] for column in PRICE_COLUMNS if COLUMN_MAP_REVERSE[column] in bars.columns]
+    if adjust != 'none' and len(bars):
+        prices = bars[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        bars[columns] = np.round(prices * multiplier[:, None], 2)
+    bars[MULTIPLIER_COLUMN] = multiplier
+    return bars
+
+
+def _to_date(value):
+    return date.fromisoformat(str(value)[:10])
+
+
+class BarStore:
+    """基于 SQLite 的日线数据仓库（线程安全）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for table in ('bars', 'coverage', 'adjust_factors', 'factor_status'):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            columns = ", ".join(f"{name} REAL" for name in STORE_COLUMNS if name != 'date')
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS bars (code TEXT NOT NULL, date TEXT NOT NULL, {columns}, "
+                "PRIMARY KEY (code, date)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS coverage (code TEXT PRIMARY KEY, start TEXT NOT NULL, end TEXT NOT NULL)"
+            )
+            # 后复权因子（累计），自对应日期起生效
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS adjust_factors (code TEXT NOT NULL, date TEXT NOT NULL, "
+                "factor REAL NOT NULL, PRIMARY KEY (code, date)) WITHOUT ROWID"
+            )
+            # stale=1 表示新下载的数据中出现了除权除息，需要更新复权因子
+            conn.execute("CREATE TABLE IF NOT EXISTS factor_status (code TEXT PRIMARY KEY, stale INTEGER NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_coverage(self, stock_code):
+        """返回已覆盖的日期区间 (start, end)，未缓存时返回 None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT start, end FROM coverage WHERE code = ?", (stock_code,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def missing_ranges(self, stock_code, start_date, end_date):
+        """计算需要下载的日期区间列表 [(start, end), ...]
+
+        每只股票只维护一个连续的覆盖区间，请求区间与其不相交时会连带补齐中间的空档
+        """
+        coverage = self.get_coverage(stock_code)
+        if coverage is None:
+            return [(start_date, end_date)]
+
+        start, end = _to_date(start_date), _to_date(end_date)
+        covered_start, covered_end = _to_date(coverage[0]), _to_date(coverage[1])
+        ranges = []
+        if start < covered_start:
+            ranges.append((start.isoformat(), (covered_start - timedelta(days=1)).isoformat()))
+        if end > covered_end:
+            ranges.append(((covered_end + timedelta(days=1)).isoformat(), end.isoformat()))
+        return ranges
+
+    def save_range(self, stock_code, bars, start_date, end_date):
+        """保存一段不复权下载结果并扩展覆盖区间
+
+        新数据中出现除权除息时标记该股票的复权因子需要更新。
+        区间包含最近的交易日时，覆盖区间不晚于最后定型的日期（北京时间 15:00 收盘前不含当天），
+        盘中下载的当天K线会在收盘后再次运行时重新下载覆盖。定型日期之前没有K线的日期（周末、节假日、停牌）
+        同样计入覆盖区间，非交易日重复运行不再请求上游；只有刚收盘的工作日未返回当天K线时
+        （上游可能尚未发布），覆盖区间记到前一天
+        """
+        start, end = _to_date(start_date), _to_date(end_date)
+        rows = []
+        if bars is not None and not bars.empty:
+            frame = bars.rename(columns=COLUMN_MAP).reindex(columns=STORE_COLUMNS)
+            frame['date'] = frame['date'].map(lambda value: str(value)[:10])
+            rows = [(stock_code, *values) for values in frame.itertuples(index=False, name=None)]
+
+        settled = last_settled_date()
+        if end >= settled:
+            last_bar = max((_to_date(row[1]) for row in rows), default=start - timedelta(days=1))
+            if (last_bar < settled and settled == datetime.now(MARKET_TIMEZONE).date()
+                    and np.is_busday(settled)):
+                settled -= timedelta(days=1)
+            end = min(end, settled)
+
+        with self._write_lock, self._connect() as conn:
+            if rows and self._has_ex_rights(conn, stock_code, frame):
+                conn.execute("INSERT OR REPLACE INTO factor_status VALUES (?, 1)", (stock_code,))
+            if rows:
+                placeholders = ", ".join("?" * (len(STORE_COLUMNS) + 1))
+                conn.executemany(f"INSERT OR REPLACE INTO bars VALUES ({placeholders})", rows)
+            if end < start:
+                return
+            row = conn.execute("SELECT start, end FROM coverage WHERE code = ?", (stock_code,)).fetchone()
+            if row:
+                start = min(start, _to_date(row[0]))
+                end = max(end, _to_date(row[1]))
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)",
+                (stock_code, start.isoformat(), end.isoformat()),
+            )
+
+    def _has_ex_rights(self, conn, stock_code, frame):
+        """根据涨跌额判断新数据中是否出现除权除息
+
+        数据源的涨跌额以交易所公布的前收盘价（除权除息日为除权参考价）为基准，
+        若 收盘价 - 涨跌额 与前一交易日的不复权收盘价不一致，说明当日发生了除权除息
+        """
+        frame = frame.dropna(subset=['close', 'change']).sort_values('date')
+        if frame.empty:
+            return False
+        previous = conn.execute(
+            "SELECT close FROM bars WHERE code = ? AND date < ? ORDER BY date DESC LIMIT 1",
+            (stock_code, frame['date'].iloc[0]),
+        ).fetchone()
+        prev_close = np.concatenate(([previous[0] if previous else np.nan], frame['close'].to_numpy()[:-1]))
+        reference = frame['close'].to_numpy() - frame['change'].to_numpy()
+        return bool(np.any(np.abs(reference - prev_close) > EX_RIGHTS_TOLERANCE))
+
+    def needs_factors(self, stock_code):
+        """是否需要（重新）下载复权因子：从未下载过，或新数据中出现了除权除息"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT stale FROM factor_status WHERE code = ?", (stock_code,)).fetchone()
+        return row is None or bool(row[0])
+
+    def save_factors(self, stock_code, factors):
+        """保存完整的复权因子表（日期、复权因子两列，后复权累计因子）"""
+        rows = []
+        if factors is not None and not factors.empty:
+            rows = [(stock_code, str(day)[:10], float(factor))
+                    for day, factor in zip(factors['日期'], factors['复权因子'])]
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM adjust_factors WHERE code = ?", (stock_code,))
+            conn.executemany("INSERT OR REPLACE INTO adjust_factors VALUES (?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO factor_status VALUES (?, 0)", (stock_code,))
+
+    def load_factors(self, stock_code):
+        """读取复权因子表，按日期升序"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT date, factor FROM adjust_factors WHERE code = ? ORDER BY date", conn, params=(stock_code,))
+
+    def load(self, stock_code, start_date, end_date, adjust='qfq'):
+        """读取指定区间的日线数据，列名与 akshare 保持一致
+
+        adjust 为 qfq（前复权）、hfq（后复权）或 none（不复权），
+        复权价格 = 不复权价格 × 当日因子（前复权再除以最新因子），四舍五入到分；
+        复权乘数列（MULTIPLIER_COLUMN）记录每根K线的乘数，涨停判定只对乘数不为 1 的K线放宽价格容差
+        """
+        if adjust not in ADJUST_MODES:
+            raise ValueError(f"不支持的复权方式: {adjust}")
+        with self._connect() as conn:
+            frame = pd.read_sql_query(
+                f"SELECT {', '.join(STORE_COLUMNS)} FROM bars WHERE code = ? AND date BETWEEN ? AND ? ORDER BY date",
+                conn,
+                params=(stock_code, str(start_date)[:10], str(end_date)[:10]),
+            )
+        frame = frame.rename(columns=COLUMN_MAP_REVERSE)
+        factors = self.load_factors(stock_code) if adjust != 'none' else None
+        if factors is None or factors.empty:
+            return adjust_bars(frame, [], [], adjust)
+        return adjust_bars(frame, factors['date'].to_numpy(), factors['factor'].to_numpy(), adjust)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+使用合成数据源离线测量抓取、涨停识别、统计汇总和 Excel 导出各阶段的耗时，
+结果追加写入 JSON Lines 文件，便于对比不同版本的吞吐量变化
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+from data_providers import SyntheticProvider
+from gem_limitup_scraper import GEMLimitUpScraper
+from limit_up_engine import concat_stock_bars
+
+DEFAULT_SIZES = [(50, 30), (300, 120), (900, 250)]
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "benchmarks.jsonl")
+
+
+def parse_sizes(text):
+    """解析 "股票数x天数" 列表，例如 "50x30,300x120" """
+    sizes = []
+    for item in text.split(','):
+        n_stocks, n_days = item.lower().split('x')
+        sizes.append((int(n_stocks), int(n_days)))
+    return sizes
+
+
+def benchmark_size(n_stocks, n_days, workers=1, latency=0.0, error_rate=0.0, seed=0):
+    """对一组数据规模执行一次完整流程并返回各阶段耗时（秒）"""
+    provider = SyntheticProvider(n_stocks=n_stocks, n_days=n_days, seed=seed,
+                                 latency=latency, error_rate=error_rate)
+    scraper = GEMLimitUpScraper(max_workers=workers, requests_per_second=None, use_cache=False,
+                                provider=provider)
+    # 覆盖 n_days 个工作日所需的自然日数
+    days_back = (provider.calendar[-1] - provider.calendar[0]).days
+
+    timings = {}
+    start = time.perf_counter()
+    bars = concat_stock_bars(scraper.iter_stock_bars(days_back=days_back))
+    timings['fetch'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    records = scraper.identify_limit_up_batch(bars)
+    timings['detection'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scraper.create_summary_data(records)
+    timings['summary'] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        scraper.save_to_excel(records, os.path.join(tmp, 'benchmark.xlsx'))
+        timings['export'] = time.perf_counter() - start
+
+    return {
+        'stocks': n_stocks,
+        'days': n_days,
+        'bars': len(bars),
+        'records': len(records),
+        'requests': provider.request_count,
+        'workers': workers,
+        'latency': latency,
+        'error_rate': error_rate,
+        'seconds': {stage: round(value, 4) for stage, value in timings.items()},
+        'total_seconds': round(sum(timings.values()), 4),
+    }
+
+
+def run_benchmarks(sizes=None, workers=1, latency=0.0, error_rate=0.0, output_path=DEFAULT_OUTPUT):
+    """依次运行各数据规模的基准测试，结果追加到 output_path（为 None 时不写文件）"""
+    results = [benchmark_size(n_stocks, n_days, workers=workers, latency=latency, error_rate=error_rate)
+               for n_stocks, n_days in (sizes or DEFAULT_SIZES)]
+
+    if output_path:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        run_info = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+        }
+        with open(output_path, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps({**run_info, **result}, ensure_ascii=False) + '\n')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="涨停爬虫性能基准测试（离线合成数据）")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="数据规模列表，格式为 股票数x天数，逗号分隔（默认 50x30,300x120,900x250）")
+    parser.add_argument("--workers", type=int, default=1, help="并发抓取线程数")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次请求的模拟延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="请求失败概率")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果文件（JSON Lines，追加写入）")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, workers=args.workers, latency=args.latency,
+                             error_rate=args.error_rate, output_path=args.output)
+
+    print(f"{'规模':>12} {'K线数':>9} {'涨停数':>7} {'抓取':>8} {'识别':>8} {'汇总':>8} {'导出':>8} {'合计':>8}")
+    for result in results:
+        seconds = result['seconds']
+        print(f"{result['stocks']:>6}x{result['days']:<5} {result['bars']:>9} {result['records']:>7} "
+              f"{seconds['fetch']:>8.3f} {seconds['detection']:>8.3f} {seconds['summary']:>8.3f} "
+              f"{seconds['export']:>8.3f} {result['total_seconds']:>8.3f}")
+    print(f"\n结果已追加到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
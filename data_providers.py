@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行情数据源
+定义爬虫使用的数据源接口，提供 akshare 实现、直接请求日K线接口的连接池实现，
+以及用于离线测试和性能基准的合成数据源、录制回放数据源（支持模拟延迟和错误注入）
+"""
+
+import importlib
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import encode_dates
+from bar_store import adjustment_multiplier
+from limit_rules import board_of, limit_percent, limit_up_price
+
+# 日线数据字段，与 akshare 的 stock_zh_a_hist 返回值一致
+BAR_COLUMNS = ['日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
+# 复权因子表字段
+FACTOR_COLUMNS = ['日期', '复权因子']
+# 上市日期表字段
+LISTING_COLUMNS = ['code', 'listing_date']
+# 实时行情快照字段
+SPOT_COLUMNS = ['code', 'name', 'price', 'prev_close', 'open', 'high', 'low']
+# akshare 实时行情（stock_zh_a_spot_em）字段 -> 快照字段
+AKSHARE_SPOT_COLUMNS = {'代码': 'code', '名称': 'name', '最新价': 'price', '昨收': 'prev_close',
+                        '今开': 'open', '最高': 'high', '最低': 'low'}
+# 复权时需要调整的价格字段
+ADJUSTED_COLUMNS = ['开盘', '收盘', '最高', '最低', '涨跌额']
+# 东方财富日K线接口
+KLINE_URL = 'https://push2his.eastmoney.com/api/qt/stock/kline/get'
+KLINE_TOKEN = '7eea3edcaed734bea9cbfc24409ed989'
+# 复权方式 -> 接口参数 fqt
+KLINE_ADJUST = {'none': '0', 'qfq': '1', 'hfq': '2'}
+KLINE_DTYPES = {'日期': str, '开盘': np.float64, '收盘': np.float64, '最高': np.float64, '最低': np.float64,
+                '成交量': np.int64, '成交额': np.float64, '振幅': np.float64, '涨跌幅': np.float64,
+                '涨跌额': np.float64, '换手率': np.float64}
+# 合成全市场股票列表时轮流使用的代码前缀（沪深主板、创业板、科创板、北交所）
+MARKET_PREFIXES = ['600', '601', '603', '000', '002', '300', '301', '688', '830', '920']
+
+
+class DataProvider:
+    """数据源接口
+
+    get_stock_list 返回包含 code、name 两列的全部A股列表；
+    get_daily_bars 返回单只股票按日期升序的日线数据（adjust 为 qfq、hfq 或 none），失败时抛出异常；
+    get_adjust_factors 返回单只股票的后复权累计因子表（日期、复权因子两列），
+    默认实现返回空表，表示没有除权除息；
+    get_listing_dates 返回股票上市日期表（LISTING_COLUMNS 各列），用于排除新股上市初期不设涨跌幅限制的交易日，
+    默认实现返回空表，表示不知道上市日期；
+    get_spot_snapshot 返回全市场实时行情快照（SPOT_COLUMNS 各列），用于盘中监控
+    """
+
+    name = 'base'
+
+    def get_stock_list(self):
+        raise NotImplementedError
+
+    def get_daily_bars(self, stock_code, start_date, end_date, adjust='qfq'):
+        raise NotImplementedError
+
+    def get_adjust_factors(self, stock_code):
+        return pd.DataFrame(columns=FACTOR_COLUMNS)
+
+    def get_listing_dates(self):
+        return pd.DataFrame(columns=LISTING_COLUMNS)
+
+    def get_spot_snapshot(self):
+        raise NotImplementedError
+
+
+class AkshareProvider(DataProvider):
+    """基于 akshare 的在线数据源
+
+    akshare 导入耗时较长且依赖众多，延迟到第一次请求时才导入
+    """
+
+    name = 'akshare'
+
+    @property
+    def ak(self):
+        return importlib.import_module('akshare')
+
+    def get_stock_list(self):
+        return self.ak.stock_info_a_code_name()
+
+    def get_daily_bars(self, stock_code, start_date, end_date, adjust='qfq'):
+        # 东方财富历史行情接口使用 6 位代码，不带交易所前缀
+        return self.ak.stock_zh_a_hist(symbol=str(stock_code),
+                                       period="daily",
+                                       start_date=start_date.replace('-', ''),
+                                       end_date=end_date.replace('-', ''),
+                                       adjust="" if adjust == 'none' else adjust)
+
+    def get_adjust_factors(self, stock_code):
+        factors = self.ak.stock_zh_a_daily(symbol=sina_symbol(stock_code), adjust="hfq-factor")
+        factors = factors.rename(columns={'date': '日期', 'hfq_factor': '复权因子'})[FACTOR_COLUMNS]
+        factors['日期'] = factors['日期'].map(lambda value: str(value)[:10])
+        factors['复权因子'] = factors['复权因子'].astype(float)
+        return factors.sort_values('日期').reset_index(drop=True)
+
+    def get_listing_dates(self):
+        # 深交所、上交所（主板、科创板）和北交所各自公布的股票列表带有上市日期
+        sz = self.ak.stock_info_sz_name_code(symbol="A股列表")
+        frames = [sz.rename(columns={'A股代码': 'code', 'A股上市日期': 'listing_date'})[LISTING_COLUMNS]]
+        for symbol in ("主板A股", "科创板"):
+            sh = self.ak.stock_info_sh_name_code(symbol=symbol)
+            frames.append(sh.rename(columns={'证券代码': 'code', '上市日期': 'listing_date'})[LISTING_COLUMNS])
+        bj = self.ak.stock_info_bj_name_code()
+        frames.append(bj.rename(columns={'证券代码': 'code', '上市日期': 'listing_date'})[LISTING_COLUMNS])
+        listing = pd.concat(frames, ignore_index=True)
+        return listing.assign(code=listing['code'].astype(str).str.zfill(6),
+                              listing_date=listing['listing_date'].map(lambda value: str(value)[:10]))
+
+    def get_spot_snapshot(self):
+        spot = self.ak.stock_zh_a_spot_em()
+        return spot.rename(columns=AKSHARE_SPOT_COLUMNS)[SPOT_COLUMNS]
+
+
+def sina_symbol(stock_code):
+    """新浪行情接口的证券代码：沪市（5、6、9 开头，920 除外）加 sh，北交所（4、8、920 开头）加 bj，其余加 sz"""
+    code = str(stock_code)
+    if code[0] in '48' or code.startswith('920'):
+        return f"bj{code}"
+    return f"{'sh' if code[0] in '569' else 'sz'}{code}"
+
+
+def kline_secid(stock_code):
+    """东方财富行情接口的证券编号：沪市（6、9 开头，不含北交所 920 代码）为 1.代码，深市和北交所为 0.代码"""
+    code = str(stock_code)
+    return f"{1 if code[0] in '69' and not code.startswith('920') else 0}.{code}"
+
+
+def parse_kline_payload(payload):
+    """解析东方财富日K线接口的 JSON 响应，返回 BAR_COLUMNS 各列的日线数据
+
+    klines 为 "日期,开盘,收盘,最高,最低,成交量,成交额,振幅,涨跌幅,涨跌额,换手率" 格式的字符串列表，
+    整体交给 pandas 的 C 解析器一次转换为数值列，不逐行构造 Python 对象
+    """
+    data = payload.get('data') or {}
+    klines = data.get('klines') or []
+    if not klines:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    bars = pd.read_csv(io.StringIO('\n'.join(klines)), header=None, names=BAR_COLUMNS,
+                       usecols=range(len(BAR_COLUMNS)), dtype=KLINE_DTYPES, engine='c')
+    return bars
+
+
+class HttpBarProvider(DataProvider):
+    """直接请求东方财富日K线接口的数据源
+
+    使用带连接池的 requests.Session 复用 keep-alive 连接（每只股票不再重新握手），
+    pool_size 为连接池大小（应不小于抓取线程数），timeout 为 (连接超时, 读取超时) 秒。
+    响应按 gzip / deflate 压缩传输并自动解压；重试由调用方的 RequestExecutor 负责，连接池不再重试。
+    股票列表、复权因子和实时快照由 fallback 数据源提供（默认 akshare）。
+    base_url 可指向本地的录制回放服务（见 kline_server.py）用于离线测试
+    """
+
+    name = 'eastmoney'
+
+    def __init__(self, base_url=KLINE_URL, pool_size=10, timeout=(3.05, 10.0), fallback=None):
+        self.base_url = base_url
+        self.pool_size = max(int(pool_size), 1)
+        self.timeout = timeout
+        self.fallback = fallback if fallback is not None else AkshareProvider()
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        # requests 只在第一次请求时导入
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive',
+                                            'User-Agent': 'Mozilla/5.0'})
+                    self._session = session
+        return self._session
+
+    def get_stock_list(self):
+        return self.fallback.get_stock_list()
+
+    def get_daily_bars(self, stock_code, start_date, end_date, adjust='qfq'):
+        params = {
+            'fields1': 'f1,f2,f3,f4,f5,f6',
+            'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61',
+            'ut': KLINE_TOKEN,
+            'klt': '101',
+            'fqt': KLINE_ADJUST[adjust],
+            'secid': kline_secid(stock_code),
+            'beg': str(start_date)[:10].replace('-', ''),
+            'end': str(end_date)[:10].replace('-', ''),
+        }
+        response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_kline_payload(response.json())
+
+    def get_adjust_factors(self, stock_code):
+        return self.fallback.get_adjust_factors(stock_code)
+
+    def get_listing_dates(self):
+        return self.fallback.get_listing_dates()
+
+    def get_spot_snapshot(self):
+        return self.fallback.get_spot_snapshot()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class OfflineProvider(DataProvider):
+    """离线数据源基类：按请求模拟网络延迟并注入错误
+
+    latency 为每次请求的模拟延迟（秒），error_rate 为请求失败概率。
+    是否失败只取决于 (seed, 股票代码, 该股票的第几次请求)，与并发调度顺序无关
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.request_count = 0
+        self._error_streams = {}
+        self._lock = threading.Lock()
+
+    def _simulate_request(self, stock_code):
+        with self._lock:
+            self.request_count += 1
+            # 每只股票一个独立的随机数流，第 n 次请求取第 n 个随机数
+            rng = self._error_streams.get(stock_code)
+            if rng is None:
+                rng = self._error_streams[stock_code] = np.random.default_rng([self.seed, int(stock_code), 1])
+            draw = rng.random()
+        if self.latency:
+            time.sleep(self.latency)
+        if draw < self.error_rate:
+            raise ConnectionError(f"模拟请求失败: {stock_code}")
+
+
+class SyntheticProvider(OfflineProvider):
+    """确定性的合成数据源
+
+    生成 n_stocks 只股票、截至 end_date 的 n_days 个工作日的日线数据，
+    每只股票的行情只取决于 seed 和股票代码；limit_up_prob 为每日以涨停收盘的概率，
+    涨跌幅不超过该股票所属板块当日的涨跌幅限制。
+    universe 为 'gem' 时只生成创业板股票（300001 起），为 'market' 时按 MARKET_PREFIXES 覆盖各板块
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, n_stocks=100, n_days=250, end_date=None, seed=0,
+                 latency=0.0, error_rate=0.0, limit_up_prob=0.03, universe='gem'):
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.n_stocks = n_stocks
+        self.n_days = n_days
+        self.limit_up_prob = limit_up_prob
+        self.universe = universe
+        end = pd.Timestamp(end_date) if end_date else pd.Timestamp.now().normalize()
+        self.calendar = pd.bdate_range(end=end, periods=n_days)
+        self._dates = np.asarray(self.calendar.strftime('%Y-%m-%d'))
+        self._bars = {}
+        self._spot = None
+
+    def get_stock_list(self):
+        if self.universe == 'market':
+            codes = [f"{MARKET_PREFIXES[i % len(MARKET_PREFIXES)]}{i // len(MARKET_PREFIXES) + 1:03d}"
+                     for i in range(self.n_stocks)]
+        else:
+            codes = [str(300001 + i) for i in range(self.n_stocks)]
+        return pd.DataFrame({'code': codes, 'name': [f"合成{code}" for code in codes]})
+
+    def _generate(self, stock_code):
+        rng = np.random.default_rng([self.seed, int(stock_code)])
+        n = self.n_days
+        percent = limit_percent(np.repeat(board_of([int(stock_code)]), n), encode_dates(self._dates),
+                                np.zeros(n, dtype=bool))
+        limit = percent / 100
+        returns = np.clip(rng.normal(0.001, 0.03, n), -limit, limit)
+        limit_up_days = rng.random(n) < self.limit_up_prob
+        returns[limit_up_days] = limit[limit_up_days]
+        returns[0] = 0.0
+        close = np.round(rng.uniform(5, 60) * np.cumprod(1 + returns), 2)
+        # 涨停日的收盘价取交易所规则下精确到分的涨停价（按日期顺序处理，连板时基于前一日涨停价）
+        for day in np.flatnonzero(limit_up_days[1:]) + 1:
+            close[day] = limit_up_price(close[day - 1], percent[day])
+        prev_close = np.concatenate(([close[0]], close[:-1]))
+        open_ = np.round(prev_close * (1 + rng.normal(0, 0.01, n)), 2)
+        high = np.maximum(np.maximum(open_, close), np.round(close * (1 + np.abs(rng.normal(0, 0.01, n))), 2))
+        low = np.minimum(np.minimum(open_, close), np.round(close * (1 - np.abs(rng.normal(0, 0.01, n))), 2))
+        volume = rng.integers(10_000, 500_000, n).astype(np.float64)
+        return pd.DataFrame({
+            '日期': self._dates,
+            '开盘': open_,
+            '收盘': close,
+            '最高': high,
+            '最低': low,
+            '成交量': volume,
+            '成交额': np.round(volume * close * 100, 2),
+            '振幅': np.round((high - low) / prev_close * 100, 2),
+            '涨跌幅': np.round((close - prev_close) / prev_close * 100, 2),
+            '涨跌额': np.round(close - prev_close, 2),
+            '换手率': np.round(rng.uniform(0.5, 20, n), 2),
+        })
+
+    def get_spot_snapshot(self):
+        """模拟的盘中实时快照：每次调用各股票随机游走一步，价格限制在涨跌停价之间，
+        少数股票会拉升到涨停价或从涨停价回落"""
+        if self._spot is None:
+            stocks = self.get_stock_list()
+            codes = stocks['code'].to_numpy()
+            rng = np.random.default_rng([self.seed, 2])
+            prev_close = np.round(rng.uniform(5, 60, len(codes)), 2)
+            percent = limit_percent(board_of(codes.astype(np.int64)),
+                                    encode_dates([self._dates[-1]] * len(codes)), np.zeros(len(codes), dtype=bool))
+            self._spot = {
+                'rng': rng, 'code': codes, 'name': stocks['name'].to_numpy(), 'prev_close': prev_close,
+                'limit_up': limit_up_price(prev_close, percent),
+                'limit_down': np.round(prev_close * (1 - percent / 100), 2),
+                'price': prev_close.copy(), 'open': None, 'high': prev_close.copy(), 'low': prev_close.copy(),
+            }
+        spot = self._spot
+        self._simulate_request('000000')
+        rng = spot['rng']
+        price = spot['price'] * (1 + rng.normal(0.0005, 0.004, len(spot['price'])))
+        jumps = rng.random(len(price)) < self.limit_up_prob / 10
+        price = np.where(jumps, spot['limit_up'], price)
+        price = np.round(np.clip(price, spot['limit_down'], spot['limit_up']), 2)
+        spot['price'] = price
+        if spot['open'] is None:
+            spot['open'] = price.copy()
+        spot['high'] = np.maximum(spot['high'], price)
+        spot['low'] = np.minimum(spot['low'], price)
+        return pd.DataFrame({column: spot[column] for column in SPOT_COLUMNS}, columns=SPOT_COLUMNS)
+
+    def get_daily_bars(self, stock_code, start_date, end_date, adjust='qfq'):
+        self._simulate_request(stock_code)
+        bars = self._bars.get(stock_code)
+        if bars is None:
+            bars = self._bars.setdefault(stock_code, self._generate(stock_code))
+        left = np.searchsorted(self._dates, str(start_date)[:10], side='left')
+        right = np.searchsorted(self._dates, str(end_date)[:10], side='right')
+        return bars.iloc[left:right].reset_index(drop=True)
+
+
+class ReplayProvider(OfflineProvider):
+    """回放本地录制的数据目录
+
+    目录结构：stock_list.csv（code、name 两列）、bars/<股票代码>.csv（不复权）、
+    可选的 factors/<股票代码>.csv（后复权累计因子）和 listing_dates.csv（上市日期），
+    可以用 record_provider 从任意数据源录制。
+    请求前复权/后复权数据时按因子表计算
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory, latency=0.0, error_rate=0.0, seed=0):
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.directory = directory
+
+    def get_stock_list(self):
+        return pd.read_csv(os.path.join(self.directory, 'stock_list.csv'), dtype={'code': str})
+
+    def get_daily_bars(self, stock_code, start_date, end_date, adjust='qfq'):
+        self._simulate_request(stock_code)
+        path = os.path.join(self.directory, 'bars', f"{stock_code}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        bars = pd.read_csv(path, dtype={'日期': str})
+        in_range = (bars['日期'] >= str(start_date)[:10]) & (bars['日期'] <= str(end_date)[:10])
+        bars = bars.loc[in_range].reset_index(drop=True)
+        if adjust != 'none':
+            factors = self._read_factors(stock_code)
+            multiplier = adjustment_multiplier(bars['日期'].to_numpy(), factors['日期'].to_numpy(),
+                                               factors['复权因子'].to_numpy(), adjust)
+            columns = [column for column in ADJUSTED_COLUMNS if column in bars.columns]
+            bars[columns] = np.round(bars[columns].to_numpy(dtype=np.float64) * multiplier[:, None], 2)
+        return bars
+
+    def _read_factors(self, stock_code):
+        path = os.path.join(self.directory, 'factors', f"{stock_code}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=FACTOR_COLUMNS)
+        return pd.read_csv(path, dtype={'日期': str})
+
+    def get_adjust_factors(self, stock_code):
+        self._simulate_request(stock_code)
+        return self._read_factors(stock_code)
+
+    def get_listing_dates(self):
+        path = os.path.join(self.directory, 'listing_dates.csv')
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=LISTING_COLUMNS)
+        return pd.read_csv(path, dtype=str)
+
+
+PROVIDERS = {
+    'akshare': AkshareProvider,
+    'http': HttpBarProvider,
+    'synthetic': SyntheticProvider,
+    'replay': ReplayProvider,
+}
+
+
+def record_provider(provider, directory, start_date, end_date, stock_codes=None):
+    """把数据源的股票列表、上市日期、不复权日线数据和复权因子录制到目录，供 ReplayProvider 回放"""
+    os.makedirs(os.path.join(directory, 'bars'), exist_ok=True)
+    os.makedirs(os.path.join(directory, 'factors'), exist_ok=True)
+    stock_list = provider.get_stock_list()
+    if stock_codes is not None:
+        stock_list = stock_list[stock_list['code'].isin(stock_codes)]
+    stock_list[['code', 'name']].to_csv(os.path.join(directory, 'stock_list.csv'), index=False)
+    listing = provider.get_listing_dates()
+    if not listing.empty:
+        listing[listing['code'].isin(stock_list['code'])][LISTING_COLUMNS].to_csv(
+            os.path.join(directory, 'listing_dates.csv'), index=False)
+    for stock_code in stock_list['code']:
+        bars = provider.get_daily_bars(stock_code, start_date, end_date, adjust='none')
+        bars = bars.assign(日期=bars['日期'].map(lambda value: str(value)[:10]))
+        bars.to_csv(os.path.join(directory, 'bars', f"{stock_code}.csv"), index=False)
+        factors = provider.get_adjust_factors(stock_code)
+        if not factors.empty:
+            factors.to_csv(os.path.join(directory, 'factors', f"{stock_code}.csv"), index=False)
+    return directory
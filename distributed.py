@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多节点分布式抓取
+协调者把创业板股票列表切分为任务写入共享工作队列（SQLite），各主机上的工作者以租约方式领取任务，
+抓取日线并识别涨停后把涨停记录写回队列，协调者等待全部任务完成后合并输出报表。
+工作者处理任务期间定期续租；工作者失联时租约到期，任务会被其他工作者重新领取
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from bar_store import ADJUST_MODES
+from data_providers import PROVIDERS
+from gem_limitup_scraper import GEMLimitUpScraper, provider_options
+from limit_up_engine import RECORD_COLUMNS, concat_stock_bars
+from report_writers import REPORT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_SIZE = 50
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 300.0
+TASK_STATUSES = ('pending', 'leased', 'done', 'failed')
+
+
+class WorkQueue:
+    """基于 SQLite 的共享工作队列（线程、进程安全）
+
+    每个作业（job）包含若干任务，任务状态为 pending（待领取）、leased（已租出）、
+    done（完成）或 failed（超过最大尝试次数）。领取在 BEGIN IMMEDIATE 事务中进行，
+    同一任务同一时刻只会租给一个工作者；租约到期未完成的任务可被重新领取。
+    处理出错交还的任务按指数退避延后发放（pending 状态下 lease_expires 为最早可领取时间），
+    尝试次数达到上限后标记为 failed。
+    多台主机共用时需放在支持文件锁的共享存储上
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 retry_delay=DEFAULT_RETRY_DELAY):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, params TEXT NOT NULL, "
+                "created_at TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks (job_id TEXT NOT NULL, task_id INTEGER NOT NULL, "
+                "payload TEXT NOT NULL, status TEXT NOT NULL, worker TEXT, lease_expires REAL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+                "PRIMARY KEY (job_id, task_id)) WITHOUT ROWID"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # isolation_level=None：事务由 BEGIN IMMEDIATE 显式控制
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def create_job(self, params, payloads, job_id=None):
+        """创建作业并写入全部任务，返回作业编号"""
+        job_id = job_id or datetime.now().strftime('%Y%m%d%H%M%S-') + uuid.uuid4().hex[:6]
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO jobs (job_id, params, created_at) VALUES (?, ?, ?)",
+                         (job_id, json.dumps(params, ensure_ascii=False), datetime.now().isoformat()))
+            conn.executemany(
+                "INSERT INTO tasks (job_id, task_id, payload, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, task_id, json.dumps(payload, ensure_ascii=False)) for task_id, payload in enumerate(payloads)])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return job_id
+
+    def job_params(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT params FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            raise KeyError(f"作业不存在: {job_id}")
+        return json.loads(row[0])
+
+    def latest_job(self):
+        """最近创建的作业编号，没有作业时返回 None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT job_id FROM jobs ORDER BY created_at DESC, job_id DESC LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def claim(self, job_id, worker_id):
+        """领取一个待处理（退避时间已过）或租约已到期的任务，返回 (任务编号, 任务内容)，
+        没有可领取的任务时返回 None
+
+        尝试次数达到上限的任务标记为 failed，不再发放
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = COALESCE(error, '租约多次到期') "
+                "WHERE job_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (job_id, now, self.max_attempts))
+            row = conn.execute(
+                "SELECT task_id, payload FROM tasks WHERE job_id = ? AND "
+                "((status = 'pending' AND (lease_expires IS NULL OR lease_expires <= ?)) OR "
+                "(status = 'leased' AND lease_expires < ?)) ORDER BY task_id LIMIT 1",
+                (job_id, now, now)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE job_id = ? AND task_id = ?",
+                    (worker_id, now + self.lease_seconds, job_id, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return (row[0], json.loads(row[1])) if row is not None else None
+
+    def _update_owned(self, sql, params):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).rowcount == 1
+        finally:
+            conn.close()
+
+    def renew(self, job_id, task_id, worker_id):
+        """续租，任务已被他人领取或已完成时返回 False"""
+        return self._update_owned(
+            "UPDATE tasks SET lease_expires = ? WHERE job_id = ? AND task_id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, job_id, task_id, worker_id))
+
+    def complete(self, job_id, task_id, worker_id, result):
+        """提交任务结果；任务已被重新租给其他工作者或已完成时丢弃结果并返回 False"""
+        return self._update_owned(
+            "UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL "
+            "WHERE job_id = ? AND task_id = ? AND worker = ? AND status = 'leased'",
+            (json.dumps(result, ensure_ascii=False), job_id, task_id, worker_id))
+
+    def release(self, job_id, task_id, worker_id, error):
+        """处理出错时交还任务：尝试次数达到上限时标记为 failed，否则按指数退避
+        （retry_delay × 2^(尝试次数-1)，最长 MAX_RETRY_DELAY 秒）后才可被重新领取"""
+        return self._update_owned(
+            "UPDATE tasks SET worker = NULL, error = ?, "
+            "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_expires = CASE WHEN attempts >= ? THEN NULL "
+            "ELSE ? + MIN(? * (1 << (attempts - 1)), ?) END "
+            "WHERE job_id = ? AND task_id = ? AND worker = ? AND status = 'leased'",
+            (str(error), self.max_attempts, self.max_attempts, time.time(), self.retry_delay, MAX_RETRY_DELAY,
+             job_id, task_id, worker_id))
+
+    def progress(self, job_id):
+        """各状态的任务数"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY status",
+                                (job_id,)).fetchall()
+        finally:
+            conn.close()
+        counts = dict.fromkeys(TASK_STATUSES, 0)
+        counts.update(dict(rows))
+        return counts
+
+    def results(self, job_id):
+        """按任务编号顺序返回 [(任务编号, 状态, 结果或None, 错误信息)]"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT task_id, status, result, error FROM tasks WHERE job_id = ? ORDER BY task_id",
+                                (job_id,)).fetchall()
+        finally:
+            conn.close()
+        return [(task_id, status, json.loads(result) if result else None, error)
+                for task_id, status, result, error in rows]
+
+
+class Coordinator:
+    """协调者：切分任务、等待完成并合并结果"""
+
+    def __init__(self, queue, scraper=None, task_size=DEFAULT_TASK_SIZE):
+        self.queue = queue
+        self.scraper = scraper if scraper is not None else GEMLimitUpScraper()
+        self.task_size = max(int(task_size), 1)
+        self.failed_stocks = {}
+
+    def submit(self, days_back=30, date_range=None, job_id=None):
+        """获取创业板股票列表并按代码顺序切分为任务，返回作业编号"""
+        start_date, end_date = date_range or self.scraper._date_range(days_back)
+        stocks = self.scraper.get_gem_stock_list()
+        if stocks.empty:
+            raise RuntimeError("无法获取创业板股票列表")
+        stock_items = [[code, name] for code, name in zip(stocks['code'], stocks['name'])]
+        payloads = [{'stocks': stock_items[offset:offset + self.task_size]}
+                    for offset in range(0, len(stock_items), self.task_size)]
+        params = {'start_date': start_date, 'end_date': end_date,
+                  'threshold': self.scraper.limit_up_threshold, 'adjust': self.scraper.adjust}
+        job_id = self.queue.create_job(params, payloads, job_id)
+        logger.info(f"已创建作业 {job_id}：{len(stock_items)} 只股票，{len(payloads)} 个任务")
+        return job_id
+
+    def wait(self, job_id, poll_interval=2.0, timeout=None):
+        """等待作业的全部任务完成或失败，返回各状态任务数；超时抛出 TimeoutError"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            counts = self.queue.progress(job_id)
+            if counts != last:
+                total = sum(counts.values())
+                logger.info(f"作业 {job_id} 进度：完成 {counts['done']}/{total}，处理中 {counts['leased']}，"
+                            f"失败 {counts['failed']}")
+                last = counts
+            if counts['pending'] == 0 and counts['leased'] == 0:
+                return counts
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"等待作业 {job_id} 超时")
+            time.sleep(poll_interval)
+
+    def merge(self, job_id):
+        """合并各任务的涨停记录（按日期降序），失败的股票和任务记录在 self.failed_stocks"""
+        frames = []
+        self.failed_stocks = {}
+        for task_id, status, result, error in self.queue.results(job_id):
+            if status != 'done':
+                logger.warning(f"任务 {task_id} 未完成（{status}）：{error}")
+                continue
+            self.failed_stocks.update(result['failed'])
+            if result['records']:
+                frames.append(pd.DataFrame(result['records'], columns=RECORD_COLUMNS))
+        if not frames:
+            return pd.DataFrame(columns=RECORD_COLUMNS)
+        merged = pd.concat(frames, ignore_index=True)
+        return merged.sort_values('涨停日期', ascending=False, kind='stable').reset_index(drop=True)
+
+    def run(self, days_back=30, poll_interval=2.0, timeout=None, filename=None):
+        """提交作业、等待工作者处理完毕后合并并输出报表"""
+        logger.info("=== 分布式爬取：协调者启动 ===")
+        job_id = self.submit(days_back)
+        self.wait(job_id, poll_interval, timeout)
+        result_data = self.merge(job_id)
+        output_paths = self.scraper.save_report(result_data, filename)
+        logger.info(f"输出文件: {', '.join(output_paths)}")
+        if self.failed_stocks:
+            logger.warning(f"共 {len(self.failed_stocks)} 只股票获取数据失败")
+        logger.info("=== 分布式爬取完成 ===")
+        return result_data
+
+
+class Worker:
+    """工作者：循环领取任务、抓取并识别涨停、提交结果
+
+    provider_factory 为无参函数，返回本工作者使用的数据源；scraper_options 传给 GEMLimitUpScraper
+    （涨停阈值和复权方式以作业参数为准）
+    """
+
+    def __init__(self, queue, provider_factory, worker_id=None, **scraper_options):
+        self.queue = queue
+        self.provider_factory = provider_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.scraper_options = scraper_options
+        self.tasks_completed = 0
+
+    def _scraper(self, params):
+        return GEMLimitUpScraper(provider=self.provider_factory(), adjust=params['adjust'],
+                                 limit_up_threshold=params['threshold'], **self.scraper_options)
+
+    def process(self, scraper, params, payload):
+        """处理一个任务，返回可写回队列的结果"""
+        stocks = pd.DataFrame(payload['stocks'], columns=['code', 'name'])
+        bars = concat_stock_bars(scraper.iter_stock_bars(
+            date_range=(params['start_date'], params['end_date']), stocks=stocks))
+        records = scraper.identify_limit_up_batch(bars)
+        records = records.assign(涨停日期=records['涨停日期'].map(lambda value: str(value)[:10]))
+        return {'records': json.loads(records.to_json(orient='records', force_ascii=False)),
+                'failed': dict(scraper.failed_stocks)}
+
+    def _keep_alive(self, job_id, task_id, stop):
+        # 每三分之一个租期续租一次，任务被他人接手后停止
+        while not stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.renew(job_id, task_id, self.worker_id):
+                logger.warning(f"任务 {task_id} 的租约已失效")
+                return
+
+    def run(self, job_id=None, max_tasks=None, poll_interval=1.0):
+        """处理作业直到全部任务完成（或处理满 max_tasks 个），返回完成的任务数
+
+        暂无可领取的任务但仍有任务租在其他工作者手中或在退避等待中时，每隔 poll_interval 秒重试，
+        以便接手租约到期（工作者失联）或退避结束的任务
+        """
+        job_id = job_id or self.queue.latest_job()
+        if job_id is None:
+            logger.warning("队列中没有作业")
+            return 0
+        params = self.queue.job_params(job_id)
+        scraper = self._scraper(params)
+        logger.info(f"工作者 {self.worker_id} 开始处理作业 {job_id}")
+        completed = 0
+        while max_tasks is None or completed < max_tasks:
+            claimed = self.queue.claim(job_id, self.worker_id)
+            if claimed is None:
+                counts = self.queue.progress(job_id)
+                if counts['leased'] == 0 and counts['pending'] == 0:
+                    break
+                time.sleep(poll_interval)
+                continue
+            task_id, payload = claimed
+            stop = threading.Event()
+            keeper = threading.Thread(target=self._keep_alive, args=(job_id, task_id, stop), daemon=True)
+            keeper.start()
+            try:
+                result = self.process(scraper, params, payload)
+            except Exception as e:
+                logger.error(f"任务 {task_id} 处理失败: {e}")
+                self.queue.release(job_id, task_id, self.worker_id, e)
+                continue
+            finally:
+                stop.set()
+                keeper.join()
+            if self.queue.complete(job_id, task_id, self.worker_id, result):
+                completed += 1
+                logger.info(f"任务 {task_id} 完成：{len(payload['stocks'])} 只股票，{len(result['records'])} 条涨停记录")
+            else:
+                logger.warning(f"任务 {task_id} 已被其他工作者接手，结果已丢弃")
+        self.tasks_completed += completed
+        logger.info(f"工作者 {self.worker_id} 结束，完成 {completed} 个任务")
+        return completed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="创业板涨停爬虫分布式模式（共享 SQLite 工作队列）")
+    parser.add_argument("role", choices=["coordinator", "worker"], help="角色：协调者或工作者")
+    parser.add_argument("--queue", required=True, help="共享工作队列路径（SQLite 文件）")
+    parser.add_argument("--job", default=None, help="作业编号（工作者默认处理最近创建的作业）")
+    parser.add_argument("--days", type=int, default=30, help="查询最近多少天的数据（默认30）")
+    parser.add_argument("--task-size", type=int, default=DEFAULT_TASK_SIZE,
+                        help=f"每个任务的股票数（默认{DEFAULT_TASK_SIZE}）")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"任务租期（秒，默认{DEFAULT_LEASE_SECONDS:.0f}），工作者失联超过租期后任务被重新发放")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"单个任务的最大尝试次数（默认{DEFAULT_MAX_ATTEMPTS}），超过后标记为失败")
+    parser.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_DELAY,
+                        help=f"任务处理出错后重新发放的初始退避时间（秒，默认{DEFAULT_RETRY_DELAY:.0f}），每次翻倍")
+    parser.add_argument("--workers", type=int, default=1, help="工作者内的抓取线程数（默认1）")
+    parser.add_argument("--rate", type=float, default=10.0, help="每个工作者每秒最多请求次数（默认10）")
+    parser.add_argument("--threshold", type=float, default=None, help="按涨跌幅阈值（百分比）识别涨停")
+    parser.add_argument("--adjust", choices=list(ADJUST_MODES), default="qfq", help="复权方式（默认qfq）")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="akshare", help="行情数据源")
+    parser.add_argument("--replay-dir", default=None, help="replay 数据源的录制目录")
+    parser.add_argument("--format", nargs="+", choices=list(REPORT_FORMATS), default=["xlsx"],
+                        help="协调者输出的报表格式（默认 xlsx）")
+    parser.add_argument("--output", default=None, help="协调者输出文件路径")
+    parser.add_argument("--timeout", type=float, default=None, help="协调者等待作业完成的最长时间（秒）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    queue = WorkQueue(args.queue, lease_seconds=args.lease, max_attempts=args.max_attempts,
+                      retry_delay=args.retry_delay)
+    options = provider_options(args)
+    if args.role == "coordinator":
+        scraper = GEMLimitUpScraper(provider=PROVIDERS[args.provider](**options), adjust=args.adjust,
+                                    limit_up_threshold=args.threshold, report_formats=args.format)
+        result = Coordinator(queue, scraper, task_size=args.task_size).run(
+            days_back=args.days, timeout=args.timeout, filename=args.output)
+        print(f"\n✅ 完成！共 {len(result)} 条涨停记录，已保存到 {scraper.output_file}")
+    else:
+        worker = Worker(queue, lambda: PROVIDERS[args.provider](**options),
+                        max_workers=args.workers, requests_per_second=args.rate)
+        worker.run(args.job)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,136 +3,301 @@
 """
 A股创业板涨停股票爬虫
 功能：查找近一个月以来中国A股创业板所有出现过涨停的股票
-涨停标准：19% 以上涨幅（创业板涨停限制为20%）
+涨停标准：收盘价达到交易所规则计算的涨停价（创业板 2020-08-24 起为 20%，此前为 10%）
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import time
 import os
 import logging
-from openpyxl.utils import get_column_letter
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bar_store import ADJUST_MODES, BarStore, adjust_bars
+from data_providers import PROVIDERS, AkshareProvider
+from bar_schema import decode_codes, decode_dates, encode_dates
+from limit_rules import BOARD_NAMES, GEM_BOARD, board_of
+from limit_up_engine import (concat_stock_bars, detect_limit_up, detect_limit_up_chunks, detect_limit_up_incremental,
+                             detect_limit_up_scenarios, listing_date_series, placeholder_carry)
+from metrics import Metrics, ProgressReporter
+from rate_limit import TokenBucket
+from report_writers import (REPORT_FORMATS, STREAM_WRITERS, SummaryAccumulator, estimate_column_widths,
+                            write_columnar_report, write_excel_report)
+from request_executor import AdaptiveConcurrencyLimiter, CircuitBreaker, RequestExecutor, RetryPolicy
+from rolling_window import RollingSummary, RollingWindowState
+from run_journal import RunJournal
+from summary_engine import LimitUpSummary
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 复权数据比较涨停价时的容差（元），只用于复权乘数不为 1 的K线
+ADJUSTED_PRICE_TOLERANCE = 0.01
+
 class GEMLimitUpScraper:
     """创业板涨停股票爬虫类"""
     
-    def __init__(self):
-        """初始化爬虫"""
-        self.limit_up_threshold = 19.0  # 涨停阈值（19%以上）
+    def __init__(self, max_workers=1, requests_per_second=10.0, cache_path=None, use_cache=True,
+                 provider=None, max_retries=3, request_executor=None, adjust='qfq',
+                 limit_up_threshold=None, metrics=None, report_formats=('xlsx',), excel_engine='auto'):
+        """初始化爬虫
+
+        max_workers: 并发抓取的线程数，1 表示顺序抓取
+        requests_per_second: 全局请求速率上限（所有线程共享），None 表示不限速
+        cache_path: 本地日线仓库路径，默认 cache/<数据源名称>_daily_bars.sqlite
+        use_cache: 是否启用本地日线仓库，只下载缺失的日期区间
+        provider: 行情数据源（data_providers.DataProvider），默认使用 akshare
+        max_retries: 单次请求失败后的最大重试次数（指数退避加随机抖动）
+        request_executor: 自定义的上游请求执行器（request_executor.RequestExecutor），
+            默认组合重试、熔断器、AIMD 自适应并发上限（不超过 max_workers）和令牌桶限流
+        adjust: 复权方式 qfq（前复权）、hfq（后复权）或 none（不复权）。启用本地仓库时
+            仓库保存不复权数据和复权因子，读取时再按该方式复权
+        limit_up_threshold: 涨停阈值（百分比），None 表示按交易所涨跌停规则识别（见 limit_rules.py）
+        metrics: 运行指标记录器（metrics.Metrics），默认新建；记录各阶段耗时、请求延迟和处理量
+        report_formats: run 系列方法输出的报表格式，可组合 xlsx、parquet、feather、csv
+        excel_engine: xlsx 写出引擎，auto 表示安装了 xlsxwriter 时优先使用
+        """
+        if adjust not in ADJUST_MODES:
+            raise ValueError(f"不支持的复权方式: {adjust}")
+        unknown_formats = set(report_formats) - set(REPORT_FORMATS)
+        if not report_formats or unknown_formats:
+            raise ValueError(f"不支持的报表格式: {', '.join(sorted(unknown_formats)) or '（空）'}")
+        self.report_formats = tuple(report_formats)
+        self.excel_engine = excel_engine
+        self.adjust = adjust
+        self.provider = provider if provider is not None else AkshareProvider()
+        self.limit_up_threshold = limit_up_threshold
+        # 复权价格经过四舍五入，与按前收盘价计算的涨停价可能相差一分钱；
+        # 未发生除权（复权乘数为 1）的K线仍按不复权价格严格比较
+        self.price_tolerance = 0.0 if adjust == 'none' else ADJUSTED_PRICE_TOLERANCE
+        self.max_workers = max(int(max_workers), 1)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.metrics = metrics if metrics is not None else Metrics()
+        # (数据对象, 行数, 统计结果)，见 summarize
+        self._summary_cache = None
+        if request_executor is None:
+            request_executor = RequestExecutor(
+                retry_policy=RetryPolicy(max_retries=max_retries),
+                circuit_breaker=CircuitBreaker(),
+                concurrency_limiter=AdaptiveConcurrencyLimiter(
+                    initial_limit=min(4, self.max_workers), max_limit=self.max_workers),
+                rate_limiter=self.rate_limiter,
+                metrics=self.metrics,
+            )
+        self.request_executor = request_executor
         # Excel 输出文件将保存到项目目录下的 output/gem_limit_up_stocks.xlsx
         self.output_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
         self.output_filename = "gem_limit_up_stocks.xlsx"
         self.output_file = os.path.join(self.output_directory, self.output_filename)
+        if cache_path is None:
+            cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache",
+                                      f"{self.provider.name}_daily_bars.sqlite")
+        self.bar_store = BarStore(cache_path) if use_cache else None
+        # 最近一次运行中获取数据失败的股票：股票代码 -> 错误信息
+        self.failed_stocks = {}
+        # 各股票的上市日期，见 get_listing_dates
+        self._listing_dates = None
         
     def get_gem_stock_list(self):
         """获取创业板股票列表"""
         try:
             logger.info("正在获取创业板股票列表...")
             # 获取A股股票基本信息表
-            stock_basic = ak.stock_info_a_code_name()
-            # 筛选创业板股票（股票代码以300开头）
-            gem_stocks = stock_basic[stock_basic['code'].str.startswith('300')]
+            with self.metrics.stage('list_fetch'):
+                stock_basic = self.request_executor.call(self.provider.get_stock_list)
+            # 筛选创业板股票（300、301 等 30x 开头的代码）
+            gem_stocks = stock_basic[board_of(stock_basic['code'].astype(int)) == GEM_BOARD]
             logger.info(f"获取到 {len(gem_stocks)} 只创业板股票")
             return gem_stocks
         except Exception as e:
             logger.error(f"获取创业板股票列表失败: {e}")
             return pd.DataFrame()
     
+    def get_market_stock_list(self):
+        """获取全市场股票列表，增加 board 列（主板、创业板、科创板、北交所）"""
+        try:
+            logger.info("正在获取全市场股票列表...")
+            with self.metrics.stage('list_fetch'):
+                stock_basic = self.request_executor.call(self.provider.get_stock_list)
+            stock_basic = stock_basic.assign(board=BOARD_NAMES[board_of(stock_basic['code'].astype(int))])
+            logger.info(f"获取到 {len(stock_basic)} 只股票")
+            return stock_basic
+        except Exception as e:
+            logger.error(f"获取全市场股票列表失败: {e}")
+            return pd.DataFrame()
+    
+    def get_listing_dates(self):
+        """各股票的上市日期（见 limit_up_engine.listing_date_series），首次调用时从数据源获取
+
+        数据源不提供或获取失败时为空，此时只按收盘价高于涨停价排除新股上市初期不设涨跌幅限制的交易日
+        """
+        if self._listing_dates is None:
+            try:
+                with self.metrics.stage('list_fetch'):
+                    frame = self.request_executor.call(self.provider.get_listing_dates)
+                self._listing_dates = listing_date_series(frame)
+            except Exception as e:
+                logger.warning(f"获取上市日期失败，不按上市日期排除新股: {e}")
+                self._listing_dates = listing_date_series(None)
+        return self._listing_dates
+    
+    def _download_daily_data(self, stock_code, start_date, end_date, adjust=None):
+        """从数据源下载单只股票的日线数据（重试耗尽后抛出异常），adjust 默认使用实例的复权方式"""
+        # 请求经执行器统一重试、熔断和限流（令牌桶替代固定延时）；命中本地仓库时不占用配额
+        return self.request_executor.call(
+            self.provider.get_daily_bars, stock_code, start_date, end_date, adjust=adjust or self.adjust)
+    
     def get_stock_daily_data(self, stock_code, start_date, end_date):
-        """获取单只股票的日线数据"""
+        """获取单只股票的日线数据
+
+        启用本地仓库时先查询仓库，只下载缺失的日期区间（不复权），
+        仓库发现新的除权除息后重新获取复权因子，读取时再按 self.adjust 复权。
+        返回的数据包含复权乘数列（bar_store.MULTIPLIER_COLUMN）
+        """
         try:
-            # akshare需要股票代码格式为sz300xxx
-            ak_code = f"sz{stock_code}"
-            # 获取股票日线数据
-            stock_data = ak.stock_zh_a_hist(symbol=ak_code, 
-                                           period="daily", 
-                                           start_date=start_date.replace('-', ''), 
-                                           end_date=end_date.replace('-', ''),
-                                           adjust="qfq")  # 前复权
-            return stock_data
+            if self.bar_store is None:
+                # 不使用仓库时同样下载不复权数据和复权因子后在本地复权，得到每根K线的复权乘数
+                bars = self._download_daily_data(stock_code, start_date, end_date, adjust='none')
+                if self.adjust == 'none' or bars.empty:
+                    return adjust_bars(bars, [], [], 'none')
+                factors = self.request_executor.call(self.provider.get_adjust_factors, stock_code)
+                return adjust_bars(bars, factors['日期'].to_numpy(), factors['复权因子'].to_numpy(dtype=np.float64),
+                                   self.adjust)
+            
+            for range_start, range_end in self.bar_store.missing_ranges(stock_code, start_date, end_date):
+                bars = self._download_daily_data(stock_code, range_start, range_end, adjust='none')
+                self.bar_store.save_range(stock_code, bars, range_start, range_end)
+            if self.adjust != 'none' and self.bar_store.needs_factors(stock_code):
+                factors = self.request_executor.call(self.provider.get_adjust_factors, stock_code)
+                self.bar_store.save_factors(stock_code, factors)
+            return self.bar_store.load(stock_code, start_date, end_date, adjust=self.adjust)
         except Exception as e:
-            logger.warning(f"获取股票 {stock_code} 数据失败: {e}")
+            logger.warning(f"获取股票 {stock_code} 数据失败（已重试）: {e}")
+            self.failed_stocks[stock_code] = str(e)
             return pd.DataFrame()
     
     def identify_limit_up_stocks(self, stock_data, stock_code, stock_name):
-        """识别涨停股票"""
+        """识别单只股票的涨停记录，返回记录字典列表"""
         if stock_data.empty:
             return []
         
-        limit_up_records = []
-        
-        for idx, row in stock_data.iterrows():
-            # 计算涨跌幅
-            if idx == 0:
-                continue  # 第一天没有前一日数据，跳过
-            
-            prev_close = stock_data.iloc[idx-1]['收盘']
-            current_close = row['收盘']
-            pct_change = (current_close - prev_close) / prev_close * 100
-            
-            # 判断是否涨停（涨幅 >= 19%）
-            if pct_change >= self.limit_up_threshold:
-                record = {
-                    '股票代码': stock_code,
-                    '股票名称': stock_name,
-                    '涨停日期': row['日期'],
-                    '涨停价格': current_close,
-                    '前日收盘价': prev_close,
-                    '涨跌幅(%)': round(pct_change, 2),
-                    '开盘价': row['开盘'],
-                    '最高价': row['最高'],
-                    '最低价': row['最低'],
-                    '成交量': row['成交量'],
-                    '成交额': row['成交额'],
-                    '换手率(%)': row['换手率'] if '换手率' in row else None
-                }
-                limit_up_records.append(record)
+        bars = concat_stock_bars([(stock_code, stock_name, stock_data)])
+        return self.identify_limit_up_batch(bars).to_dict('records')
+    
+    def identify_limit_up_batch(self, bars):
+        """在多只股票拼接后的日线表上批量识别涨停，返回涨停记录DataFrame"""
+        with self.metrics.stage('detection'):
+            records = detect_limit_up(bars, self.limit_up_threshold, self.price_tolerance, self.get_listing_dates())
+        self.metrics.add('record_rows', len(records))
+        return records
+    
+    def identify_from_dataset(self, dataset, date_range=None, codes=None):
+        """在按年分区的日线数据集（见 bar_dataset.BarDataset）上识别涨停，返回涨停记录DataFrame
+
+        各分区内存映射后逐段识别，分区之间延续连板状态；
+        date_range 为 (start_date, end_date)，codes 为股票代码列表，为 None 时不筛选
+        """
+        start_date, end_date = date_range or (None, None)
+        with self.metrics.stage('detection'):
+            records = detect_limit_up_chunks(dataset.iter_partitions(start_date, end_date, codes),
+                                             self.limit_up_threshold, self.price_tolerance, dataset.listing_dates())
+        self.metrics.add('record_rows', len(records))
+        return records
+    
+    def _fetch_stock_bars(self, idx, total_stocks, stock_code, stock_name, start_date, end_date):
+        """抓取单只股票的日线数据（可在工作线程中执行）"""
+        # 逐只股票的日志只在调试级别输出，进度由 ProgressReporter 限频汇报
+        logger.debug(f"处理股票 {idx}/{total_stocks}: {stock_code} - {stock_name}")
         
-        return limit_up_records
+        stock_data = self.get_stock_daily_data(stock_code, start_date, end_date)
+        if not stock_data.empty:
+            self.metrics.add('bar_rows', len(stock_data))
+            self.metrics.add('bar_bytes', int(stock_data.memory_usage(deep=True).sum()))
+        return stock_code, stock_name, stock_data
     
-    def scrape_limit_up_stocks(self, days_back=30):
-        """爬取涨停股票数据"""
+    def _date_range(self, days_back, end_date=None):
+        """计算截至 end_date（默认今天）最近 days_back 天的时间范围 (start_date, end_date)"""
+        end = pd.Timestamp(end_date) if end_date else pd.Timestamp(datetime.now().date())
+        start = end - timedelta(days=days_back)
+        return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    
+    def iter_stock_bars(self, days_back=30, max_workers=None, date_range=None, skip_codes=None, stocks=None,
+                        start_dates=None):
+        """逐只股票产出 (股票代码, 股票名称, 日线DataFrame)
+
+        并发抓取时仍按股票列表顺序产出，max_workers 为 None 时使用实例配置的线程数。
+        date_range 为 (start_date, end_date) 时忽略 days_back；
+        skip_codes 中的股票不抓取，产出的日线数据为 None；
+        start_dates 为 {股票代码: 开始日期} 时这些股票从各自的开始日期抓取，开始日期晚于结束日期的股票不抓取；
+        stocks 为包含 code、name 列的股票列表时只抓取这些股票，默认抓取全部创业板股票。
+        等待日线数据的时间计入 bar_fetch 阶段，调用方处理数据的时间不计入
+        """
         # 计算时间范围
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+        start_date, end_date = date_range or self._date_range(days_back)
+        skip_codes = skip_codes or ()
+        start_dates = start_dates or {}
+        self.failed_stocks = {}
         
-        logger.info(f"开始爬取 {start_date} 至 {end_date} 期间的创业板涨停股票数据")
-        
-        # 获取创业板股票列表
-        gem_stocks = self.get_gem_stock_list()
+        if stocks is None:
+            logger.info(f"开始爬取 {start_date} 至 {end_date} 期间的创业板涨停股票数据")
+            # 获取创业板股票列表
+            gem_stocks = self.get_gem_stock_list()
+        else:
+            gem_stocks = stocks
         if gem_stocks.empty:
             logger.error("无法获取创业板股票列表")
-            return pd.DataFrame()
+            return
         
-        all_limit_up_records = []
-        total_stocks = len(gem_stocks)
+        stocks = list(zip(gem_stocks['code'], gem_stocks['name']))
+        total_stocks = len(stocks)
+        workers = max(int(max_workers or self.max_workers), 1)
+        progress = ProgressReporter(total_stocks, label='抓取日线')
         
-        for idx, (_, stock) in enumerate(gem_stocks.iterrows(), 1):
-            stock_code = stock['code']
-            stock_name = stock['name']
-            
-            logger.info(f"处理股票 {idx}/{total_stocks}: {stock_code} - {stock_name}")
-            
-            # 获取股票数据
-            stock_data = self.get_stock_daily_data(stock_code, start_date, end_date)
-            
-            if not stock_data.empty:
-                # 识别涨停记录
-                limit_up_records = self.identify_limit_up_stocks(stock_data, stock_code, stock_name)
-                all_limit_up_records.extend(limit_up_records)
-            
-            # 添加延时避免请求过于频繁
-            time.sleep(0.1)
+        def process(item):
+            idx, (stock_code, stock_name) = item
+            try:
+                stock_start = start_dates.get(stock_code, start_date)
+                if stock_code in skip_codes or stock_start > end_date:
+                    return stock_code, stock_name, None
+                return self._fetch_stock_bars(idx, total_stocks, stock_code, stock_name, stock_start, end_date)
+            finally:
+                progress.advance()
+        
+        items = enumerate(stocks, 1)
+        if workers == 1:
+            yield from self.metrics.timed(map(process, items), 'bar_fetch')
+        else:
+            logger.info(f"使用 {workers} 个线程并发抓取")
+            # 按提交顺序返回结果，保证合并顺序与顺序抓取一致
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                yield from self.metrics.timed(bounded_map(executor, process, items, 2 * workers), 'bar_fetch')
+        progress.finish()
+    
+    def iter_limit_up_records(self, days_back=30, max_workers=None):
+        """逐只股票产出涨停记录DataFrame（无涨停的股票不产出）"""
+        for stock_code, stock_name, stock_data in self.iter_stock_bars(days_back, max_workers):
+            records = self.identify_limit_up_batch(concat_stock_bars([(stock_code, stock_name, stock_data)]))
+            if not records.empty:
+                yield records
+    
+    def scrape_limit_up_stocks(self, days_back=30, max_workers=None, journal_path=None, resume=False):
+        """爬取涨停股票数据
+
+        max_workers 为 None 时使用实例配置的线程数。
+        指定 journal_path 时逐只股票记录运行日志；resume 为 True 时从日志恢复，
+        沿用日志中的日期范围并跳过已完成的股票
+        """
+        if journal_path is None:
+            # 拼接所有股票的日线数据，一次性批量识别涨停
+            bars = concat_stock_bars(self.iter_stock_bars(days_back, max_workers))
+            result_df = self.identify_limit_up_batch(bars)
+        else:
+            result_df = self._scrape_with_journal(days_back, max_workers, journal_path, resume)
         
-        # 转换为DataFrame
-        if all_limit_up_records:
-            result_df = pd.DataFrame(all_limit_up_records)
+        if not result_df.empty:
             # 按日期排序
             result_df = result_df.sort_values('涨停日期', ascending=False)
             logger.info(f"共发现 {len(result_df)} 条涨停记录")
@@ -142,39 +307,146 @@ class GEMLimitUpScraper:
         
         return result_df
     
-    def save_to_excel(self, data, filename=None):
-        """保存数据到Excel文件"""
+    def scrape_scenarios(self, scenarios, max_workers=None):
+        """多情景爬取：scenarios 为 (天数, 涨停阈值) 列表，阈值为 None 时按交易所规则识别
+
+        只抓取最宽的窗口一次，所有情景共用同一份日线和前收盘价、涨停判定，
+        各情景的结果与单独运行 scrape_limit_up_stocks 相同。返回与 scenarios 对应的涨停记录表列表
+        """
+        widest = max(days_back for days_back, _ in scenarios)
+        bars = concat_stock_bars(self.iter_stock_bars(widest, max_workers))
+        windows = [(int(encode_dates([self._date_range(days_back)[0]])[0]), threshold)
+                   for days_back, threshold in scenarios]
+        with self.metrics.stage('detection'):
+            results = detect_limit_up_scenarios(bars, windows, self.price_tolerance, self.get_listing_dates())
+        self.metrics.add('record_rows', sum(len(records) for records in results))
+        return [records.sort_values('涨停日期', ascending=False) if not records.empty else pd.DataFrame()
+                for records in results]
+    
+    def _scrape_with_journal(self, days_back, max_workers, journal_path, resume):
+        """带运行日志的爬取：每完成一只股票即写入日志，结束时合并日志与本次结果
+
+        日志记录天数、日期范围、涨停阈值、复权方式和数据源。恢复时沿用日志中的日期范围（跨日恢复也抓取同一区间），
+        涨停阈值、复权方式或数据源与本次运行不一致时不恢复，重新开始完整运行
+        """
+        journal = RunJournal(journal_path)
+        date_range = self._date_range(days_back)
+        params = {'days_back': days_back, 'start_date': date_range[0], 'end_date': date_range[1],
+                  'threshold': self.limit_up_threshold, 'adjust': self.adjust, 'provider': self.provider.name}
+        state = journal.load() if resume else None
+        if resume and state is None:
+            logger.warning(f"未找到可恢复的运行日志 {journal_path}，开始新的运行")
+        elif state is not None:
+            header = state[0]
+            mismatched = [key for key in ('threshold', 'adjust', 'provider') if header.get(key) != params[key]]
+            if mismatched:
+                logger.warning(f"运行日志的运行参数（{', '.join(mismatched)}）与当前配置不一致，重新开始完整运行")
+                state = None
+            else:
+                if header.get('days_back', days_back) != days_back:
+                    logger.warning(f"运行日志记录的天数为 {header['days_back']}，恢复运行沿用日志中的日期范围")
+                date_range = (header['start_date'], header['end_date'])
+        
+        if state is not None:
+            completed = state[1]
+            logger.info(f"从运行日志恢复：已完成 {len(completed)} 只股票，继续处理剩余股票")
+            journal.resume()
+        else:
+            completed = {}
+            journal.start(params)
+        
+        frames = []
+        try:
+            for stock_code, stock_name, stock_data in self.iter_stock_bars(
+                    max_workers=max_workers, date_range=date_range, skip_codes=completed):
+                if stock_data is None:
+                    frames.append(completed[stock_code])
+                    continue
+                records = self.identify_limit_up_batch(concat_stock_bars([(stock_code, stock_name, stock_data)]))
+                frames.append(records)
+                # 获取失败的股票不记入日志，恢复运行时会重新抓取
+                if stock_code not in self.failed_stocks:
+                    journal.record(stock_code, records)
+        finally:
+            journal.close()
+        
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    
+    def scrape_to_file_streaming(self, days_back=30, max_workers=None, filename=None, output_format='xlsx'):
+        """流式爬取并写出涨停数据
+
+        每只股票的涨停记录识别后立即写入文件（xlsx 只写模式或 csv 追加），
+        统计汇总通过累加器增量计算，内存占用不随记录数增长。
+        记录按股票顺序写出，不再按日期整体排序。返回 (输出路径, 统计累加器)
+        """
+        if output_format not in STREAM_WRITERS:
+            raise ValueError(f"不支持的流式输出格式: {output_format}")
+        if filename is None or not str(filename).strip():
+            stem, _ = os.path.splitext(self.output_filename)
+            output_path = os.path.join(self.output_directory, f"{stem}.{output_format}")
+        else:
+            output_path = os.path.abspath(str(filename))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        self.output_file = output_path
+        
+        writer = STREAM_WRITERS[output_format](output_path)
+        accumulator = SummaryAccumulator()
+        for records in self.iter_limit_up_records(days_back, max_workers):
+            with self.metrics.stage('report_write'):
+                writer.write(records)
+            with self.metrics.stage('summary'):
+                accumulator.update(records)
+        with self.metrics.stage('summary'):
+            summary_sheets = accumulator.to_sheets()
+        with self.metrics.stage('report_write'):
+            writer.close(summary_sheets)
+        self.metrics.add('output_bytes', os.path.getsize(output_path))
+        
+        if accumulator.total_records:
+            logger.info(f"共发现 {accumulator.total_records} 条涨停记录")
+        else:
+            logger.warning("未发现涨停记录")
+        logger.info(f"数据已保存到 {output_path}")
+        return output_path, accumulator
+    
+    def _resolve_output_path(self, filename):
+        """输出文件的绝对路径（默认 output/gem_limit_up_stocks.xlsx），并创建所在目录"""
         if filename is None or not str(filename).strip():
-            filename = self.output_filename
-            output_path = os.path.join(self.output_directory, filename)
+            output_path = os.path.join(self.output_directory, self.output_filename)
         else:
             filename = str(filename)
             output_path = filename if os.path.isabs(filename) else os.path.abspath(filename)
         target_dir = os.path.dirname(output_path)
         if target_dir:
             os.makedirs(target_dir, exist_ok=True)
-        
+        return output_path
+    
+    def _report_sheets(self, data, extra_sheets=None, summary_sheets=None):
+        if data is None or data.empty:
+            return {}
+        if summary_sheets is None:
+            with self.metrics.stage('summary'):
+                summary_sheets = self.create_summary_data(data)
+        return {**summary_sheets, **(extra_sheets or {})}
+    
+    def save_to_excel(self, data, filename=None, extra_sheets=None, summary_sheets=None):
+        """保存数据到Excel文件
+
+        extra_sheets 为额外写入的 {工作表名称: DataFrame}；
+        summary_sheets 为已计算好的汇总表（如增量模式的累加器结果），默认由 create_summary_data 生成
+        """
+        output_path = self._resolve_output_path(filename)
         self.output_file = output_path
         
         try:
             if data is None or data.empty:
                 logger.warning("没有数据可保存，将生成包含提示信息的Excel文件")
-                placeholder = pd.DataFrame([{"提示": "在指定的时间范围内未找到涨停记录"}])
-                with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                    placeholder.to_excel(writer, sheet_name='统计汇总', index=False)
-                    self.adjust_column_width(writer.sheets['统计汇总'], placeholder)
-            else:
-                with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                    data.to_excel(writer, sheet_name='涨停股票数据', index=False)
-                    self.adjust_column_width(writer.sheets['涨停股票数据'], data)
-                    
-                    summary_sheets = self.create_summary_data(data)
-                    for sheet_name, sheet_df in summary_sheets.items():
-                        if sheet_df is None or sheet_df.empty:
-                            continue
-                        sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        self.adjust_column_width(writer.sheets[sheet_name], sheet_df)
+            sheets = self._report_sheets(data, extra_sheets, summary_sheets)
+            with self.metrics.stage('excel_write'):
+                write_excel_report(output_path, data, sheets, engine=self.excel_engine)
             
+            self.metrics.add('output_bytes', os.path.getsize(output_path))
             abs_path = os.path.abspath(output_path)
             logger.info(f"数据已保存到 {abs_path}")
             return output_path
@@ -183,86 +455,113 @@ class GEMLimitUpScraper:
             logger.error(f"保存Excel文件失败: {e}", exc_info=True)
             raise
     
+    def save_report(self, data, filename=None, extra_sheets=None, summary_sheets=None, formats=None):
+        """按 formats（默认实例配置的 report_formats）写出报表，返回写出的全部文件路径
+
+        各格式共用 filename 的文件名主干（如 output/gem_limit_up_stocks.xlsx 与 .parquet），
+        汇总表只计算一次。Parquet / Feather / CSV 的汇总表写为 <文件名>_<表名>.<扩展名>
+        """
+        formats = list(formats or self.report_formats)
+        stem, _ = os.path.splitext(self._resolve_output_path(filename))
+        sheets = self._report_sheets(data, extra_sheets, summary_sheets)
+        paths = []
+        for output_format in formats:
+            output_path = f"{stem}.{output_format}"
+            if output_format == 'xlsx':
+                paths.append(self.save_to_excel(data, output_path, summary_sheets=sheets))
+                continue
+            with self.metrics.stage('report_write'):
+                written = write_columnar_report(output_path, data, sheets, output_format)
+            self.metrics.add('output_bytes', sum(os.path.getsize(path) for path in written))
+            logger.info(f"数据已保存到 {output_path}")
+            paths.extend(written)
+        self.output_file = f"{stem}.{formats[0]}"
+        return paths
+    
+    def summarize(self, data):
+        """计算涨停记录的统计结果（见 summary_engine.LimitUpSummary）
+
+        同一个数据对象只计算一次：打印统计信息和生成各个汇总表共用缓存的结果
+        """
+        cached = self._summary_cache
+        if cached is not None and cached[0] is data and cached[1] == len(data):
+            return cached[2]
+        summary = LimitUpSummary(data)
+        self._summary_cache = (data, len(data), summary)
+        return summary
+    
     def create_summary_data(self, data):
         """创建统计汇总数据"""
         if data is None or data.empty:
             return {}
-        
-        summary_records = []
-        
-        # 按股票统计涨停次数
-        stock_stats = data.groupby(['股票代码', '股票名称']).agg({
-            '涨停日期': 'count',
-            '涨跌幅(%)': ['max', 'mean', 'min'],
-            '成交量': 'sum'
-        }).round(2)
-        
-        stock_stats.columns = ['涨停次数', '最大涨幅(%)', '平均涨幅(%)', '最小涨幅(%)', '总成交量']
-        stock_stats = stock_stats.reset_index()
-        stock_stats = stock_stats.sort_values('涨停次数', ascending=False)
-        
-        # 按日期统计涨停股票数量
-        date_stats = data.groupby('涨停日期').size().reset_index(name='涨停股票数')
-        date_stats = date_stats.sort_values('涨停日期', ascending=False)
-        
-        summary_records.append({
-            '统计类型': '总体统计',
-            '统计项': '总涨停记录数',
-            '数值': len(data)
-        })
-        
-        summary_records.append({
-            '统计类型': '总体统计',
-            '统计项': '涉及股票数量',
-            '数值': data['股票代码'].nunique()
-        })
-        
-        summary_records.append({
-            '统计类型': '总体统计',
-            '统计项': '平均涨幅(%)',
-            '数值': round(data['涨跌幅(%)'].mean(), 2)
-        })
-        
-        summary_records.append({
-            '统计类型': '总体统计',
-            '统计项': '最大涨幅(%)',
-            '数值': round(data['涨跌幅(%)'].max(), 2)
-        })
-        
-        summary_df = pd.DataFrame(summary_records)
-        
-        return {
-            '统计汇总': summary_df,
-            '按股票统计': stock_stats,
-            '按日期统计': date_stats
-        }
+        return self.summarize(data).to_sheets()
     
     def adjust_column_width(self, worksheet, data):
-        """调整Excel列宽"""
+        """调整Excel列宽（openpyxl 工作表），列宽按抽样估算，见 report_writers.estimate_column_widths"""
         if data is None or getattr(data, 'empty', False):
             return
         
-        for column in data.columns:
-            max_length = max(
-                data[column].astype(str).map(len).max(),
-                len(str(column))
-            )
-            # 设置合适的列宽，最小10，最大30
-            adjusted_width = min(max(max_length + 2, 10), 30)
-            column_letter = get_column_letter(data.columns.get_loc(column) + 1)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+        # openpyxl 只在导出 Excel 时才需要，延迟导入
+        from openpyxl.utils import get_column_letter
+        
+        for position, width in enumerate(estimate_column_widths(data), 1):
+            worksheet.column_dimensions[get_column_letter(position)].width = width
+    
+    def report_failed_stocks(self):
+        """输出请求统计和重试耗尽后仍失败的股票，返回失败股票DataFrame"""
+        stats = self.request_executor.stats
+        limiter = self.request_executor.concurrency_limiter
+        concurrency = f"，并发上限峰值 {limiter.peak_limit}，当前 {limiter.limit}" if limiter is not None else ""
+        logger.info(f"请求统计: 共 {stats['requests']} 次请求，重试 {stats['retries']} 次，"
+                    f"最终失败 {stats['failures']} 次{concurrency}")
+        stage_summary = self.metrics.stage_summary()
+        if stage_summary:
+            logger.info(f"阶段耗时: {stage_summary}")
+        
+        failed = pd.DataFrame(sorted(self.failed_stocks.items()), columns=['股票代码', '错误信息'])
+        if not failed.empty:
+            logger.warning(f"{len(failed)} 只股票重试后仍获取失败: {', '.join(failed['股票代码'])}")
+            print(f"\n=== 获取失败的股票（{len(failed)} 只） ===")
+            print(failed.to_string(index=False))
+        return failed
     
-    def run(self, days_back=30):
+    def run(self, days_back=30, max_workers=None, journal_path=None, resume=False):
         """运行爬虫"""
         logger.info("=== A股创业板涨停股票爬虫启动 ===")
         
         # 爬取数据
-        result_data = self.scrape_limit_up_stocks(days_back)
+        result_data = self.scrape_limit_up_stocks(days_back, max_workers=max_workers,
+                                                  journal_path=journal_path, resume=resume)
+        
+        # 保存报表（无论是否有数据都会生成文件）
+        output_paths = self.save_report(result_data)
+        logger.info(f"输出文件: {', '.join(output_paths)}")
+        self._print_results(result_data)
         
-        # 保存到Excel（无论是否有数据都会生成文件）
-        output_path = self.save_to_excel(result_data)
-        logger.info(f"Excel 输出文件: {output_path}")
+        self.report_failed_stocks()
+        logger.info("=== 爬虫执行完成 ===")
+        return result_data
+    
+    def run_dataset(self, dataset, days_back=None):
+        """在本地日线数据集上识别涨停并保存报表，不请求数据源
+
+        days_back 从数据集的最后日期往前计算，为 None 时使用全部历史
+        """
+        logger.info(f"=== 从日线数据集 {dataset.path} 识别涨停 ===")
+        last_date = dataset.date_range()[1]
+        date_range = self._date_range(days_back, end_date=last_date) if days_back and last_date else None
+        result_data = self.identify_from_dataset(dataset, date_range)
+        if not result_data.empty:
+            result_data = result_data.sort_values('涨停日期', ascending=False)
+            logger.info(f"共发现 {len(result_data)} 条涨停记录")
         
+        output_paths = self.save_report(result_data)
+        logger.info(f"输出文件: {', '.join(output_paths)}")
+        self._print_results(result_data)
+        return result_data
+    
+    def _print_results(self, result_data):
+        """显示部分结果和统计信息"""
         if result_data is not None and not result_data.empty:
             # 显示部分结果
             print("\n=== 涨停股票数据预览 ===")
@@ -270,30 +569,282 @@ class GEMLimitUpScraper:
             
             print(f"\n=== 统计信息 ===")
             print(f"总涨停记录数: {len(result_data)}")
-            print(f"涉及股票数量: {result_data['股票代码'].nunique()}")
-            print(f"平均涨幅: {result_data['涨跌幅(%)'].mean():.2f}%")
-            print(f"最大涨幅: {result_data['涨跌幅(%)'].max():.2f}%")
+            summary = self.summarize(result_data)
+            print(f"涉及股票数量: {summary.stock_count}")
+            print(f"平均涨幅: {summary.pct_mean:.2f}%")
+            print(f"最大涨幅: {summary.pct_max:.2f}%")
         else:
             logger.warning("未找到任何涨停记录")
+    
+    def run_scenarios(self, scenarios, max_workers=None):
+        """以多情景模式运行爬虫：每个情景写出一份报表（文件名见 scenario_name），返回 {情景: 涨停记录表}"""
+        logger.info(f"=== A股创业板涨停股票爬虫启动（{len(scenarios)} 个情景） ===")
+        # 重复的情景只计算一次
+        scenarios = list(dict.fromkeys((int(days_back), threshold) for days_back, threshold in scenarios))
+        results = dict(zip(scenarios, self.scrape_scenarios(scenarios, max_workers)))
         
+        stem, _ = os.path.splitext(self.output_filename)
+        print(f"\n=== 情景统计 ===")
+        for (days_back, threshold), result_data in results.items():
+            name = scenario_name(days_back, threshold)
+            output_paths = self.save_report(result_data, os.path.join(self.output_directory, f"{stem}_{name}.xlsx"))
+            logger.info(f"情景 {name} 输出文件: {', '.join(output_paths)}")
+            stock_count = self.summarize(result_data).stock_count if not result_data.empty else 0
+            print(f"{name}: {len(result_data)} 条涨停记录，{stock_count} 只股票 -> {self.output_file}")
+        
+        self.report_failed_stocks()
+        logger.info("=== 爬虫执行完成 ===")
+        return results
+    
+    def run_streaming(self, days_back=30, max_workers=None, output_format='xlsx'):
+        """以流式模式运行爬虫，返回统计累加器"""
+        logger.info("=== A股创业板涨停股票爬虫启动（流式模式） ===")
+        
+        output_path, accumulator = self.scrape_to_file_streaming(
+            days_back, max_workers=max_workers, output_format=output_format)
+        logger.info(f"输出文件: {output_path}")
+        
+        if accumulator.total_records:
+            print(f"\n=== 统计信息 ===")
+            print(f"总涨停记录数: {accumulator.total_records}")
+            print(f"涉及股票数量: {accumulator.stock_count}")
+            print(f"平均涨幅: {accumulator.pct_mean:.2f}%")
+            print(f"最大涨幅: {accumulator.pct_max:.2f}%")
+        else:
+            logger.warning("未找到任何涨停记录")
+        
+        self.report_failed_stocks()
+        logger.info("=== 爬虫执行完成 ===")
+        return accumulator
+
+    
+    def update_rolling_window(self, days_back=30, max_workers=None, state_path=None, end_date=None):
+        """增量更新滚动窗口，返回 (窗口内涨停记录, RollingSummary)
+
+        读取上一次的状态，每只股票只抓取该股票上次处理到的日期之后的新K线（上次抓取失败或没有数据的股票
+        下次补抓缺失的交易日），延续连板状态识别涨停，追加新记录并淘汰移出窗口的日期。
+        状态不存在或参数变化时按完整窗口重新构建。end_date 为窗口结束日期，默认今天
+        """
+        state_path = state_path or os.path.join(self.output_directory, "rolling_state.json")
+        window = RollingWindowState(state_path)
+        params = {'days_back': days_back, 'threshold': self.limit_up_threshold, 'adjust': self.adjust}
+        start_date, end_date = self._date_range(days_back, end_date)
+
+        state = window.load()
+        if state is not None and state[0].get('rule') != params:
+            logger.warning("滚动窗口参数与当前配置不一致，重新构建完整窗口")
+            state = None
+        if state is None:
+            summary, carry, processed, start_dates = RollingSummary(), None, None, {}
+        else:
+            saved, summary, carry = state
+            processed = saved['processed']
+            # 每只股票从自己上次处理到的日期的下一天开始抓取，不早于窗口开始日期
+            next_dates = pd.to_datetime(decode_dates(carry['date'].to_numpy())) + timedelta(days=1)
+            start_dates = {code: max(day, start_date) for code, day in
+                           zip(decode_codes(carry.index.to_numpy()), next_dates.strftime('%Y-%m-%d'))}
+        fetch_start = min(start_dates.values()) if start_dates else start_date
+
+        if fetch_start <= end_date:
+            logger.info(f"增量更新：处理 {fetch_start} 至 {end_date} 的新数据")
+            stocks = self.get_gem_stock_list()
+            bars = concat_stock_bars(self.iter_stock_bars(max_workers=max_workers, date_range=(start_date, end_date),
+                                                          stocks=stocks, start_dates=start_dates))
+            records, carry = detect_limit_up_incremental(
+                bars, carry, self.limit_up_threshold, self.price_tolerance, self.get_listing_dates())
+            # 抓取失败或没有K线的股票记为处理到窗口开始前一天，下次从窗口开始日期补抓
+            if not stocks.empty:
+                window_eve = (pd.Timestamp(start_date) - timedelta(days=1)).strftime('%Y-%m-%d')
+                carry = placeholder_carry(carry, stocks['code'].astype(int), window_eve)
+            summary.update(records)
+            if not bars.empty:
+                processed = max(processed or '', str(decode_dates([bars['date'].max()])[0]))
+            if self.failed_stocks:
+                logger.warning(f"{len(self.failed_stocks)} 只股票抓取失败，下次增量更新时补抓")
+            logger.info(f"新增 {len(records)} 条涨停记录")
+        else:
+            logger.info("滚动窗口已是最新，无需抓取")
+
+        evicted = summary.evict_before(start_date)
+        if evicted:
+            logger.info(f"淘汰 {evicted} 条移出窗口的涨停记录")
+        if carry is not None and not carry.empty:
+            window.save({'rule': params, 'processed': processed}, summary, carry)
+        records = summary.records.sort_values('涨停日期', ascending=False, kind='stable').reset_index(drop=True)
+        return records, summary
+    
+    def run_incremental(self, days_back=30, max_workers=None, state_path=None):
+        """以增量模式运行爬虫：更新滚动窗口并输出报表"""
+        logger.info("=== A股创业板涨停股票爬虫启动（增量模式） ===")
+        result_data, summary = self.update_rolling_window(days_back, max_workers, state_path)
+        output_paths = self.save_report(result_data, summary_sheets=summary.to_sheets())
+        logger.info(f"输出文件: {', '.join(output_paths)}")
+        logger.info(f"窗口内共 {summary.total_records} 条涨停记录，涉及 {summary.stock_count} 只股票")
+        self.report_failed_stocks()
         logger.info("=== 爬虫执行完成 ===")
         return result_data
 
 
-def main():
+def bounded_map(executor, func, items, window):
+    """按顺序产出 func(item) 的结果，同一时刻最多有 window 个已提交未取走的任务
+
+    与 executor.map 不同，不会一开始就提交全部任务：消费者处理较慢时（如流式写出），
+    已完成但未取走的日线数据最多 window 份，内存占用不随股票数量增长
+    """
+    pending = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def scenario_name(days_back, threshold):
+    """情景名称，用于报表文件名，例如 30d_rule、90d_19.8pct"""
+    return f"{days_back}d_rule" if threshold is None else f"{days_back}d_{threshold:g}pct"
+
+
+def parse_scenario(text):
+    """解析情景参数 "天数" 或 "天数:阈值"，只写天数时按交易所规则识别"""
+    days, _, threshold = text.partition(':')
+    try:
+        days_back = int(days)
+        threshold = float(threshold) if threshold and threshold != 'rule' else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"情景格式应为 天数 或 天数:阈值，例如 30 或 90:19.8，收到 {text!r}")
+    if days_back <= 0:
+        raise argparse.ArgumentTypeError(f"情景天数必须为正数，收到 {text!r}")
+    return days_back, threshold
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="A股创业板涨停股票爬虫")
+    parser.add_argument("--days", type=int, default=30, help="查询最近多少天的数据（默认30）")
+    parser.add_argument("--workers", type=int, default=1, help="并发抓取线程数（默认1，即顺序抓取）")
+    parser.add_argument("--rate", type=float, default=10.0,
+                        help="每秒最多请求次数，所有线程共享（默认10，<=0 表示不限速）")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="按涨跌幅阈值（百分比）识别涨停，默认按交易所涨跌停规则识别")
+    parser.add_argument("--retries", type=int, default=3, help="单次请求失败后的最大重试次数（默认3）")
+    parser.add_argument("--cache", default=None, help="本地日线仓库路径（默认 cache/<数据源名称>_daily_bars.sqlite）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用本地日线仓库，每次全量下载")
+    parser.add_argument("--adjust", choices=list(ADJUST_MODES), default="qfq",
+                        help="复权方式：qfq 前复权（默认）、hfq 后复权、none 不复权")
+    parser.add_argument("--provider", choices=["akshare", "http", "synthetic", "replay"], default="akshare",
+                        help="行情数据源：akshare（在线）、http（连接池直连日K线接口）、synthetic（合成数据）、"
+                             "replay（回放录制目录）")
+    parser.add_argument("--http-pool-size", type=int, default=None,
+                        help="http 数据源的连接池大小（默认取抓取线程数与 10 的较大值）")
+    parser.add_argument("--http-timeout", type=float, nargs=2, default=[3.05, 10.0], metavar=("CONNECT", "READ"),
+                        help="http 数据源的连接超时和读取超时（秒，默认 3.05 10）")
+    parser.add_argument("--http-url", default=None, help="http 数据源的日K线接口地址（如本地回放服务 kline_server.py）")
+    parser.add_argument("--replay-dir", default=None, help="replay 数据源的录制目录")
+    parser.add_argument("--journal", default=None,
+                        help="运行日志路径：逐只股票记录进度，中断后可用 --resume 继续")
+    parser.add_argument("--resume", action="store_true",
+                        help="从运行日志恢复上次中断的运行（未指定 --journal 时使用 output/run_journal.jsonl）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量模式：只处理上次运行之后的新交易日，滚动维护窗口内的涨停记录和统计")
+    parser.add_argument("--state", default=None,
+                        help="增量模式的状态文件路径（默认 output/rolling_state.json）")
+    parser.add_argument("--stream", choices=sorted(STREAM_WRITERS), default=None,
+                        help="流式模式：逐只股票写出结果（xlsx 只写模式或 csv），内存占用恒定")
+    parser.add_argument("--format", nargs="+", choices=list(REPORT_FORMATS), default=["xlsx"],
+                        help="报表格式，可同时指定多个（默认 xlsx）：parquet、feather 需要 pyarrow，"
+                             "汇总表写为同名前缀的独立文件")
+    parser.add_argument("--excel-engine", choices=["auto", "openpyxl", "xlsxwriter"], default="auto",
+                        help="xlsx 写出引擎（默认 auto：安装了 xlsxwriter 时优先使用）")
+    parser.add_argument("--scenarios", nargs="+", type=parse_scenario, default=None, metavar="DAYS[:THRESHOLD]",
+                        help="多情景模式：只抓取最宽窗口一次，按每个 天数[:阈值] 情景分别识别并各写一份报表，"
+                             "例如 --scenarios 5 30 90:19 250:19.8（只写天数时按交易所规则识别）")
+    parser.add_argument("--dataset", default=None,
+                        help="从按年分区的日线数据集（bar_dataset.py 生成）识别涨停，不请求数据源；"
+                             "--days 从数据集的最后日期往前计算")
+    parser.add_argument("--metrics", default=None,
+                        help="运行指标输出路径前缀：写出 <前缀>.json、<前缀>.prom（Prometheus 文本格式），"
+                             "并追加到 <前缀>_history.jsonl")
+    return parser.parse_args(argv)
+
+
+def create_provider(args):
+    """根据命令行参数创建数据源"""
+    return PROVIDERS[args.provider](**provider_options(args))
+
+
+def provider_options(args):
+    """根据命令行参数得到数据源的构造参数"""
+    if args.provider == "replay":
+        if not args.replay_dir:
+            raise ValueError("replay 数据源需要指定 --replay-dir")
+        return {'directory': args.replay_dir}
+    if args.provider == "http":
+        # 其他入口（全市场扫描、分布式模式）没有 http 相关参数时使用默认值
+        options = {'pool_size': getattr(args, 'http_pool_size', None) or max(getattr(args, 'workers', 1), 10)}
+        if getattr(args, 'http_timeout', None):
+            options['timeout'] = tuple(args.http_timeout)
+        if getattr(args, 'http_url', None):
+            options['base_url'] = args.http_url
+        return options
+    return {}
+
+
+def run_cli_mode(scraper, args):
+    """按命令行参数选择的模式运行爬虫"""
+    if args.dataset:
+        # 数据集依赖 pyarrow，只在使用时导入
+        from bar_dataset import BarDataset
+        
+        result = scraper.run_dataset(BarDataset(args.dataset), days_back=args.days)
+        print(f"\n✅ 完成！共 {len(result)} 条涨停记录，已保存到 {scraper.output_file}")
+        return
+    
+    if args.scenarios:
+        results = scraper.run_scenarios(args.scenarios)
+        print(f"\n✅ 完成！{len(results)} 个情景的报表已保存到 {scraper.output_directory}")
+        return
+    
+    if args.incremental:
+        result = scraper.run_incremental(days_back=args.days, state_path=args.state)
+        print(f"\n✅ 完成！窗口内共 {len(result)} 条涨停记录，已保存到 {scraper.output_file}")
+        return
+    
+    if args.stream:
+        accumulator = scraper.run_streaming(days_back=args.days, output_format=args.stream)
+        print(f"\n✅ 完成！共 {accumulator.total_records} 条涨停记录，已保存到 {scraper.output_file}")
+        return
+    
+    journal_path = args.journal
+    if args.resume and journal_path is None:
+        journal_path = os.path.join(scraper.output_directory, "run_journal.jsonl")
+    
+    # 运行爬虫（默认查询近30天）
+    result = scraper.run(days_back=args.days, journal_path=journal_path, resume=args.resume)
+    
+    if result is not None and not result.empty:
+        print(f"\n✅ 成功！数据已保存到 {scraper.output_file}")
+    else:
+        print(f"\nℹ️  未发现涨停数据，本次仍生成结果文件: {scraper.output_file}")
+
+
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
     try:
         # 创建爬虫实例
-        scraper = GEMLimitUpScraper()
-        
-        # 运行爬虫（默认查询近30天）
-        result = scraper.run(days_back=30)
-        
-        if result is not None and not result.empty:
-            print(f"\n✅ 成功！数据已保存到 {scraper.output_file}")
-        else:
-            print(f"\nℹ️  未发现涨停数据，本次仍生成结果文件: {scraper.output_file}")
-            
+        scraper = GEMLimitUpScraper(max_workers=args.workers, requests_per_second=args.rate,
+                                    cache_path=args.cache, use_cache=not args.no_cache,
+                                    provider=create_provider(args), max_retries=args.retries,
+                                    adjust=args.adjust, limit_up_threshold=args.threshold,
+                                    report_formats=args.format, excel_engine=args.excel_engine)
+        try:
+            run_cli_mode(scraper, args)
+        finally:
+            if args.metrics:
+                paths = scraper.metrics.export(args.metrics)
+                logger.info(f"运行指标已保存到 {', '.join(paths)}")
+    
     except Exception as e:
         logger.error(f"程序执行出错: {e}")
         print(f"\n❌ 程序执行失败: {e}")
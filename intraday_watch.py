@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中涨停监控
+按固定间隔拉取一次全市场实时行情快照（或回放本地录制的快照序列），
+与上一份快照的状态做数组比较，发现股票触及涨停价、封住涨停、炸板（从涨停价打开）时产生事件，
+并记录从快照到达到事件产生的延迟。每份快照只做一次对齐和若干次向量比较，不逐只股票循环
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import decode_codes, encode_dates
+from data_providers import PROVIDERS, SPOT_COLUMNS
+from gem_limitup_scraper import provider_options
+from limit_rules import BOARD_NAMES, board_of, is_st_name, limit_percent, limit_up_price
+from request_executor import RequestExecutor, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# 事件类型：触板（最高价首次触及涨停价）、封板（最新价达到涨停价）、炸板（封板后最新价低于涨停价）
+EVENT_TOUCH, EVENT_SEAL, EVENT_BREAK = '触板', '封板', '炸板'
+EVENT_COLUMNS = ['快照时间', '事件', '股票代码', '股票名称', '最新价', '涨停价', '延迟(毫秒)']
+# 比较价格时的浮点误差
+_EPSILON = 1e-6
+
+
+class Snapshot:
+    """一份对齐为数组的全市场快照
+
+    codes 为 int32 股票代码，price / prev_close / high 为 float64 数组；
+    received 为快照到达时的 time.perf_counter()，用于计算事件延迟
+    """
+
+    __slots__ = ('timestamp', 'codes', 'names', 'price', 'prev_close', 'high', 'received')
+
+    def __init__(self, timestamp, codes, names, price, prev_close, high, received=None):
+        self.timestamp = timestamp
+        self.codes = codes
+        self.names = names
+        self.price = price
+        self.prev_close = prev_close
+        self.high = high
+        self.received = time.perf_counter() if received is None else received
+
+    @classmethod
+    def from_frame(cls, frame, timestamp=None, received=None):
+        """由 SPOT_COLUMNS 格式的快照表构造"""
+        received = time.perf_counter() if received is None else received
+        numeric = {column: pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64)
+                   for column in ('price', 'prev_close', 'high')}
+        return cls(
+            timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            frame['code'].astype(str).to_numpy().astype(np.int64).astype(np.int32),
+            frame['name'].to_numpy(dtype=object),
+            numeric['price'], numeric['prev_close'], numeric['high'], received,
+        )
+
+
+class LimitUpWatcher:
+    """涨停状态机
+
+    第一份快照确定监控的股票集合（按代码排序）并计算每只股票的涨停价，
+    之后每份快照按代码对齐到同一顺序，与上一份快照的状态比较得到事件
+    """
+
+    def __init__(self, boards=None):
+        self.boards = boards
+        self.codes = None
+        self.names = None
+        self.limit_price = None
+        self._prev_close = None
+        self._day = None
+        self.touched = None
+        self.sealed = None
+        self.snapshots = 0
+        self.latencies = []
+
+    def _initialize(self, snapshot):
+        order = np.argsort(snapshot.codes, kind='stable')
+        codes, names = snapshot.codes[order], snapshot.names[order]
+        if self.boards:
+            keep = np.isin(BOARD_NAMES[board_of(codes)], self.boards)
+            codes, names = codes[keep], names[keep]
+        self.codes = codes
+        self.names = names
+        self.touched = np.zeros(len(codes), dtype=bool)
+        self.sealed = np.zeros(len(codes), dtype=bool)
+        self._prev_close = None
+        self._day = None
+        logger.info(f"开始监控 {len(codes)} 只股票")
+
+    def _align(self, snapshot):
+        """按代码把快照对齐到监控顺序，返回 (price, prev_close, high)，快照中缺失的股票为 NaN"""
+        if len(snapshot.codes) == len(self.codes) and np.array_equal(snapshot.codes, self.codes):
+            return snapshot.price, snapshot.prev_close, snapshot.high
+        order = np.argsort(snapshot.codes, kind='stable')
+        sorted_codes = snapshot.codes[order]
+        position = np.clip(np.searchsorted(sorted_codes, self.codes), 0, max(len(sorted_codes) - 1, 0))
+        found = sorted_codes[position] == self.codes if len(sorted_codes) else np.zeros(len(self.codes), bool)
+        source = order[position]
+        aligned = []
+        for values in (snapshot.price, snapshot.prev_close, snapshot.high):
+            aligned.append(np.where(found, values[source], np.nan))
+        return tuple(aligned)
+
+    def _update_limit_prices(self, prev_close, timestamp):
+        # 快照日期变化（新交易日或第一份快照）时重置状态并重新计算全部涨停价
+        day = encode_dates([str(timestamp)[:10]])[0]
+        if day != self._day:
+            if self._day is not None:
+                self.touched[:] = False
+                self.sealed[:] = False
+            self._day = day
+            self._prev_close = prev_close.copy()
+            self.limit_price = self._limit_prices(np.arange(len(self.codes)), prev_close)
+            return
+        # 同一交易日内只重新计算昨收确实变化的股票；快照中缺失（NaN）不算变化，沿用已知的昨收和涨停价
+        with np.errstate(invalid='ignore'):
+            changed = ~np.isnan(prev_close) & (prev_close != self._prev_close)
+        rows = np.flatnonzero(changed)
+        if len(rows):
+            self._prev_close[rows] = prev_close[rows]
+            self.limit_price[rows] = self._limit_prices(rows, prev_close[rows])
+
+    def _limit_prices(self, rows, prev_close):
+        percent = limit_percent(board_of(self.codes[rows]), np.full(len(rows), self._day, dtype=np.int32),
+                                is_st_name(self.names[rows]))
+        return limit_up_price(prev_close, percent)
+
+    def process(self, snapshot):
+        """处理一份快照，返回事件列表 [(事件, 股票代码, 股票名称, 最新价, 涨停价)]"""
+        if self.codes is None:
+            self._initialize(snapshot)
+        price, prev_close, high = self._align(snapshot)
+        self._update_limit_prices(prev_close, snapshot.timestamp)
+        self.snapshots += 1
+
+        floor = self.limit_price - _EPSILON
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(price)
+            at_limit = valid & (price >= floor)
+            touched_now = (valid & (high >= floor)) | at_limit
+        touch = touched_now & ~self.touched
+        seal = at_limit & ~self.sealed
+        # 缺失最新价（停牌或快照中没有该股票）时保持原状态，不视为炸板
+        broken = self.sealed & valid & ~at_limit
+        self.touched |= touched_now
+        self.sealed = np.where(valid, at_limit, self.sealed)
+
+        events = []
+        for kind, mask in ((EVENT_TOUCH, touch), (EVENT_SEAL, seal), (EVENT_BREAK, broken)):
+            hits = np.flatnonzero(mask)
+            if len(hits):
+                codes = decode_codes(self.codes[hits])
+                events.extend(zip([kind] * len(hits), codes, self.names[hits],
+                                  price[hits].tolist(), self.limit_price[hits].tolist()))
+        return events
+
+    def latency_summary(self):
+        """事件延迟统计（毫秒）"""
+        if not self.latencies:
+            return {}
+        values = np.asarray(self.latencies)
+        return {
+            'events': len(values),
+            'p50_ms': round(float(np.percentile(values, 50)), 3),
+            'p99_ms': round(float(np.percentile(values, 99)), 3),
+            'max_ms': round(float(values.max()), 3),
+        }
+
+
+class PollingSnapshotSource:
+    """按间隔轮询数据源的实时行情快照，请求经执行器统一重试"""
+
+    def __init__(self, provider, interval=3.0, max_snapshots=None, request_executor=None, record_path=None):
+        self.provider = provider
+        self.interval = interval
+        self.max_snapshots = max_snapshots
+        self.request_executor = request_executor or RequestExecutor(retry_policy=RetryPolicy(max_retries=2))
+        self.record_path = record_path
+
+    def __iter__(self):
+        count = 0
+        while self.max_snapshots is None or count < self.max_snapshots:
+            started = time.monotonic()
+            try:
+                frame = self.request_executor.call(self.provider.get_spot_snapshot)
+            except Exception as e:
+                logger.warning(f"获取实时行情快照失败（已重试）: {e}")
+            else:
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+                yield Snapshot.from_frame(frame, timestamp)
+                # 录制放在事件处理之后，不计入事件延迟
+                if self.record_path:
+                    record_snapshot(frame, timestamp, self.record_path)
+            count += 1
+            remaining = self.interval - (time.monotonic() - started)
+            if remaining > 0 and (self.max_snapshots is None or count < self.max_snapshots):
+                time.sleep(remaining)
+
+
+class ReplaySnapshotSource:
+    """回放本地录制的快照序列（CSV，每行一只股票，timestamp 列区分不同快照）
+
+    加载时一次性把每份快照转换为数组；speed 为回放倍速，0 表示不等待、尽快回放；
+    max_snapshots 为最多回放的快照份数，None 表示全部回放
+    """
+
+    def __init__(self, path, speed=0.0, max_snapshots=None):
+        self.speed = speed
+        feed = pd.read_csv(path, dtype={'code': str, 'timestamp': str})
+        groups = itertools.islice(feed.groupby('timestamp', sort=False), max_snapshots)
+        self._snapshots = [Snapshot.from_frame(group, timestamp) for timestamp, group in groups]
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def __iter__(self):
+        previous = None
+        for snapshot in self._snapshots:
+            current = pd.Timestamp(snapshot.timestamp)
+            if self.speed and previous is not None:
+                time.sleep(max((current - previous).total_seconds() / self.speed, 0))
+            previous = current
+            # 快照在加载时已转换为数组，到达时间记为回放到该快照的时刻
+            snapshot.received = time.perf_counter()
+            yield snapshot
+
+
+def record_snapshot(frame, timestamp, path):
+    """把一份快照追加到录制文件，供 ReplaySnapshotSource 回放"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    rows = frame[SPOT_COLUMNS].assign(timestamp=timestamp)
+    rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False, encoding='utf-8')
+
+
+def watch(source, watcher=None, on_event=None):
+    """消费快照源并产生事件，返回 (事件表, 监控器)
+
+    on_event 为每个事件的回调，参数为 EVENT_COLUMNS 对应的元组
+    """
+    watcher = watcher or LimitUpWatcher()
+    rows = []
+    try:
+        for snapshot in source:
+            events = watcher.process(snapshot)
+            if not events:
+                continue
+            latency_ms = (time.perf_counter() - snapshot.received) * 1000
+            for kind, stock_code, stock_name, price, limit_price in events:
+                row = (snapshot.timestamp, kind, stock_code, stock_name, price, limit_price, round(latency_ms, 3))
+                watcher.latencies.append(latency_ms)
+                rows.append(row)
+                if on_event is not None:
+                    on_event(row)
+    except KeyboardInterrupt:
+        logger.info("监控已停止")
+    return pd.DataFrame(rows, columns=EVENT_COLUMNS), watcher
+
+
+def _log_event(row):
+    timestamp, kind, stock_code, stock_name, price, limit_price, latency_ms = row
+    logger.info(f"[{timestamp}] {kind} {stock_code} {stock_name} 最新价 {price:.2f} 涨停价 {limit_price:.2f}"
+                f"（延迟 {latency_ms:.2f} 毫秒）")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="盘中涨停监控（全市场实时快照）")
+    parser.add_argument("--interval", type=float, default=3.0, help="快照轮询间隔秒数（默认3）")
+    parser.add_argument("--count", type=int, default=None, help="最多处理多少份快照（默认一直运行，回放时默认全部回放）")
+    parser.add_argument("--boards", nargs="+", choices=list(BOARD_NAMES), default=None,
+                        help="只监控指定板块（默认全部）")
+    # replay 数据源只回放日线，没有实时快照；回放录制的快照使用 --replay
+    parser.add_argument("--provider", choices=sorted(name for name in PROVIDERS if name != "replay"),
+                        default="akshare", help="行情数据源")
+    parser.add_argument("--replay", default=None, help="回放录制的快照文件（CSV）代替在线轮询")
+    parser.add_argument("--speed", type=float, default=0.0, help="回放倍速，0 表示尽快回放（默认0）")
+    parser.add_argument("--record", default=None, help="把轮询到的快照追加录制到该文件")
+    parser.add_argument("--events", default=None, help="事件输出文件（CSV）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    if args.replay:
+        source = ReplaySnapshotSource(args.replay, speed=args.speed, max_snapshots=args.count)
+    else:
+        provider = PROVIDERS[args.provider](**provider_options(args))
+        source = PollingSnapshotSource(provider, interval=args.interval, max_snapshots=args.count,
+                                       record_path=args.record)
+    events, watcher = watch(source, LimitUpWatcher(boards=args.boards), on_event=_log_event)
+    logger.info(f"共处理 {watcher.snapshots} 份快照，产生 {len(events)} 个事件，延迟统计: {watcher.latency_summary()}")
+    if args.events:
+        events.to_csv(args.events, index=False, encoding='utf-8-sig')
+        logger.info(f"事件已保存到 {args.events}")
+
+
+if __name__ == "__main__":
+    main()
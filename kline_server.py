@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地日K线回放服务
+以东方财富日K线接口的 URL 和 JSON 格式回放录制目录（record_provider 录制，见 ReplayProvider）中的数据，
+支持 HTTP/1.1 keep-alive 和 gzip 压缩，并统计连接数和请求数，
+用于离线测试 HttpBarProvider 和测量每次请求的开销
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from data_providers import KLINE_ADJUST, ReplayProvider
+
+logger = logging.getLogger(__name__)
+
+KLINE_PATH = '/api/qt/stock/kline/get'
+# 接口参数 fqt -> 复权方式
+FQT_ADJUST = {value: key for key, value in KLINE_ADJUST.items()}
+
+
+def format_klines(bars):
+    """日线数据转换为接口的 klines 字符串列表（字段顺序同 BAR_COLUMNS）"""
+    return [','.join(str(value) for value in row) for row in bars.itertuples(index=False, name=None)]
+
+
+class KlineRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，keep-alive 连接上需关闭 Nagle 算法以免等待延迟确认
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != KLINE_PATH:
+            self._send(404, {'error': f"未知的路径: {url.path}"})
+            return
+        self.server.count('requests')
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            stock_code = params['secid'].split('.', 1)[1]
+            start_date = f"{params['beg'][:4]}-{params['beg'][4:6]}-{params['beg'][6:8]}"
+            end_date = f"{params['end'][:4]}-{params['end'][4:6]}-{params['end'][6:8]}"
+            adjust = FQT_ADJUST[params.get('fqt', '0')]
+        except (KeyError, IndexError):
+            self._send(400, {'error': '缺少或无法识别的参数'})
+            return
+        bars = self.server.provider.get_daily_bars(stock_code, start_date, end_date, adjust=adjust)
+        klines = format_klines(bars)
+        self._send(200, {'rc': 0, 'data': {'code': stock_code, 'klines': klines} if klines else None})
+
+    def _send(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class KlineReplayServer(ThreadingHTTPServer):
+    """回放服务：provider 为提供日线数据的数据源（通常是 ReplayProvider），stats 记录连接数和请求数"""
+
+    daemon_threads = True
+
+    def __init__(self, provider, host='127.0.0.1', port=0):
+        super().__init__((host, port), KlineRequestHandler)
+        self.provider = provider
+        self.stats = {'connections': 0, 'requests': 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{KLINE_PATH}"
+
+    def start(self):
+        """在后台线程中运行，返回自身"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="本地日K线回放服务（东方财富接口格式）")
+    parser.add_argument("directory", help="record_provider 录制的数据目录")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8766, help="端口（默认8766）")
+    args = parser.parse_args(argv)
+    server = KlineReplayServer(ReplayProvider(args.directory), args.host, args.port)
+    logger.info(f"回放服务已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(f"回放服务已停止，共 {server.stats['connections']} 个连接、{server.stats['requests']} 次请求")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
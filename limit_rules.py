@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易所涨跌停规则
+按股票代码判断所属板块，结合交易日期所处的制度阶段和 ST 状态得到涨跌幅限制比例，
+以前收盘价计算精确到分的涨停价（交易所规则：四舍五入到 0.01 元），
+再把每根K线分类为封板、触板（最高价触及涨停价）和一字板。全部为数组运算
+"""
+
+import numpy as np
+
+from bar_schema import encode_dates
+
+# 板块编码
+MAIN_BOARD, GEM_BOARD, STAR_BOARD, BSE_BOARD = 0, 1, 2, 3
+BOARD_NAMES = np.array(['主板', '创业板', '科创板', '北交所'], dtype=object)
+
+# 涨跌幅限制制度：(板块, 是否ST, 生效日期, 涨跌幅限制百分比)，同一板块按生效日期升序
+LIMIT_REGIMES = [
+    (MAIN_BOARD, False, '1996-12-16', 10),
+    (MAIN_BOARD, True, '1998-04-22', 5),
+    # 主板风险警示股票涨跌幅限制由 5% 调整为 10%
+    (MAIN_BOARD, True, '2025-07-07', 10),
+    (GEM_BOARD, False, '2009-10-30', 10),
+    (GEM_BOARD, True, '2009-10-30', 5),
+    # 创业板注册制改革，涨跌幅限制由 10% 调整为 20%（含 ST 股票）
+    (GEM_BOARD, False, '2020-08-24', 20),
+    (GEM_BOARD, True, '2020-08-24', 20),
+    (STAR_BOARD, False, '2019-07-22', 20),
+    (STAR_BOARD, True, '2019-07-22', 20),
+    (BSE_BOARD, False, '2021-11-15', 30),
+    (BSE_BOARD, True, '2021-11-15', 30),
+]
+
+# 新股上市后不设涨跌幅限制的交易日数：(板块, 生效日期, 天数)，按上市日期适用，同一板块按生效日期升序。
+# 核准制下主板、创业板上市首日涨幅限制为 44%，不适用日常涨跌停规则，同样按无涨跌幅限制处理
+IPO_FREE_SESSIONS = [
+    (MAIN_BOARD, '1996-12-16', 1),
+    # 主板注册制
+    (MAIN_BOARD, '2023-04-10', 5),
+    (GEM_BOARD, '2009-10-30', 1),
+    (GEM_BOARD, '2020-08-24', 5),
+    (STAR_BOARD, '2019-07-22', 5),
+    (BSE_BOARD, '2021-11-15', 1),
+]
+
+# 封板形态：换手板（盘中打开过或开盘未涨停）、T字板（开盘涨停、盘中打开后回封）、一字板（全天封死）
+SEAL_TURNOVER, SEAL_T, SEAL_ONE_WORD = 0, 1, 2
+SEAL_NAMES = np.array(['换手板', 'T字板', '一字板'], dtype=object)
+
+# 比较价格时的浮点误差
+_EPSILON = 1e-6
+
+
+def board_of(codes):
+    """股票代码（整数）转换为板块编码数组，无法识别的代码按主板处理"""
+    codes = np.asarray(codes, dtype=np.int64)
+    prefix = codes // 1000
+    return np.select(
+        [
+            (prefix >= 300) & (prefix <= 309),
+            (prefix == 688) | (prefix == 689),
+            ((codes >= 430000) & (codes < 440000)) | ((codes >= 830000) & (codes < 880000))
+            | (prefix == 920),
+        ],
+        [GEM_BOARD, STAR_BOARD, BSE_BOARD],
+        default=MAIN_BOARD,
+    ).astype(np.int8)
+
+
+def is_st_name(names):
+    """按股票名称判断是否为风险警示股票（ST、*ST 等）"""
+    names = np.asarray(names, dtype=object).astype(str)
+    return np.char.find(np.char.upper(names), 'ST') >= 0
+
+
+def limit_percent(boards, dates, is_st):
+    """每根K线适用的涨跌幅限制百分比（整数），dates 为 int32 天数"""
+    boards = np.asarray(boards)
+    dates = np.asarray(dates)
+    is_st = np.asarray(is_st, dtype=bool)
+    percent = np.zeros(len(boards), dtype=np.int16)
+    for board, st, effective, pct in LIMIT_REGIMES:
+        # 制度按生效日期升序排列，后生效的覆盖先生效的
+        mask = (boards == board) & (is_st == st) & (dates >= encode_dates([effective])[0])
+        percent[mask] = pct
+    # 生效日期之前的数据（如北交所开市前的精选层）沿用该板块最早的制度
+    for board, st, _, pct in LIMIT_REGIMES:
+        missing = (percent == 0) & (boards == board) & (is_st == st)
+        percent[missing] = pct
+    return percent
+
+
+def ipo_free_sessions(boards, listing_dates):
+    """按上市日期得到新股不设涨跌幅限制的交易日数，listing_dates 为 int32 天数"""
+    boards = np.asarray(boards)
+    listing_dates = np.asarray(listing_dates)
+    sessions = np.zeros(len(boards), dtype=np.int16)
+    for board, effective, count in IPO_FREE_SESSIONS:
+        sessions[(boards == board) & (listing_dates >= encode_dates([effective])[0])] = count
+    return sessions
+
+
+def limit_up_price(prev_close, percent):
+    """按交易所规则计算涨停价：前收盘价 × (1 + 涨跌幅限制)，四舍五入到 0.01 元
+
+    以分为单位用整数计算，避免 10.05 × 1.1 之类的浮点舍入误差
+    """
+    prev_cents = np.round(np.asarray(prev_close, dtype=np.float64) * 100)
+    valid = np.isfinite(prev_cents)
+    cents = np.where(valid, prev_cents, 0).astype(np.int64)
+    limit_cents = (cents * (100 + np.asarray(percent, dtype=np.int64)) + 50) // 100
+    return np.where(valid, limit_cents / 100.0, np.nan)
+
+
+def classify_limit_bars(codes, dates, is_st, prev_close, open_, high, low, close, tolerance=0.0, no_limit=None):
+    """对每根K线做涨停分类
+
+    返回字典：limit_pct（涨跌幅限制百分比）、limit_price（涨停价）、touched（最高价触及涨停价）、
+    closed（收盘封住涨停）、one_word（一字板）、seal（封板形态编码，未封板为 -1）。
+    tolerance 为价格比较的容差（可按行给出）：不复权价格为 0；复权价格经过四舍五入，可放宽到 0.01。
+    no_limit 为不设涨跌幅限制的K线（如新股上市初期）的布尔掩码，这些K线不会被判为涨停；
+    收盘价高于涨停价（超出容差）的K线同样说明当日没有涨跌幅限制
+    """
+    percent = limit_percent(board_of(codes), dates, is_st)
+    limit_price = limit_up_price(prev_close, percent)
+    floor = limit_price - tolerance - _EPSILON
+    ceiling = limit_price + tolerance + _EPSILON
+    limited = np.ones(len(percent), dtype=bool) if no_limit is None else ~np.asarray(no_limit, dtype=bool)
+    # NaN 参与比较结果为 False，缺少前收盘价的K线自然被排除
+    with np.errstate(invalid='ignore'):
+        limited &= ~(np.asarray(close) > ceiling)
+        touched = limited & (np.asarray(high) >= floor)
+        closed = limited & (np.asarray(close) >= floor)
+        opened_at_limit = closed & (np.asarray(open_) >= floor)
+        one_word = opened_at_limit & (np.asarray(low) >= floor)
+    seal = np.where(one_word, SEAL_ONE_WORD, np.where(opened_at_limit, SEAL_T, SEAL_TURNOVER))
+    return {
+        'limit_pct': percent,
+        'limit_price': limit_price,
+        'touched': touched,
+        'closed': closed,
+        'one_word': one_word,
+        'seal': np.where(closed, seal, -1).astype(np.int8),
+    }
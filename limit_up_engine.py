@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+涨停识别引擎
+将所有股票的日线数据拼接为紧凑格式（见 bar_schema.py）的一张表，用 NumPy 分组移位
+计算前收盘价和涨跌幅，按交易所涨跌停规则（见 limit_rules.py）一次筛选得到全部涨停记录，
+并对涨停序列做游程编码得到连板数
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import compact_stock_bars, decode_codes, decode_dates, encode_dates
+from limit_rules import SEAL_NAMES, board_of, classify_limit_bars, ipo_free_sessions, is_st_name
+
+# 涨停记录的输出字段（与 Excel 输出保持一致）
+RECORD_COLUMNS = [
+    '股票代码', '股票名称', '涨停日期', '涨停价格', '前日收盘价', '涨跌幅(%)',
+    '开盘价', '最高价', '最低价', '成交量', '成交额', '换手率(%)', '连板数', '板型',
+    '涨停幅度(%)', '封板形态'
+]
+
+# 增量识别时每只股票携带的状态：最后一根K线的日期、收盘价、连板数，以及再前一根K线是否涨停
+CARRY_COLUMNS = ['date', 'close', 'boards', 'prev_limit_up']
+
+# 板型：首板、连板（连板数>=2）、断板回封（前一交易日断板、再前一交易日涨停的首板）
+BOARD_TYPES = np.array(['首板', '连板', '断板回封'], dtype=object)
+
+
+def concat_stock_bars(stock_frames):
+    """拼接多只股票的日线数据为紧凑格式
+
+    stock_frames 为 (股票代码, 股票名称, 日线DataFrame) 的可迭代对象，
+    返回的表中每只股票的行连续且保持原有日期顺序
+    """
+    return compact_stock_bars(stock_frames)
+
+
+def group_start_mask(keys):
+    """返回每个分组首行的布尔掩码（要求同一分组的行连续排列）"""
+    keys = np.asarray(keys)
+    starts = np.ones(len(keys), dtype=bool)
+    if len(keys) > 1:
+        starts[1:] = keys[1:] != keys[:-1]
+    return starts
+
+
+def grouped_shift(values, starts):
+    """按分组向后移位一行，每个分组首行填充 NaN"""
+    shifted = np.empty(len(values), dtype=np.float64)
+    if len(values):
+        shifted[0] = np.nan
+        shifted[1:] = values[:-1]
+        shifted[starts] = np.nan
+    return shifted
+
+
+def grouped_shift_bool(values, starts, fill=False):
+    """布尔数组按分组向后移位一行，每个分组首行填充 fill（标量或与分组首行一一对应的数组）"""
+    shifted = np.zeros(len(values), dtype=bool)
+    if len(values):
+        shifted[1:] = values[:-1]
+        shifted[starts] = fill
+    return shifted
+
+
+def listing_date_series(frame):
+    """数据源的上市日期表（code、listing_date 列）转换为以 int32 股票代码为索引的 int32 天数"""
+    if frame is None or frame.empty:
+        return pd.Series(dtype=np.int32, index=pd.Index([], dtype=np.int32, name='code'))
+    frame = frame.dropna(subset=['listing_date'])
+    return pd.Series(encode_dates(frame['listing_date'].to_numpy()),
+                     index=pd.Index(frame['code'].astype(np.int64).to_numpy().astype(np.int32), name='code'))
+
+
+def new_listing_mask(codes, dates, listing_dates=None):
+    """新股上市初期（不设涨跌幅限制）的K线掩码
+
+    listing_dates 为 listing_date_series 的结果，不在其中的股票不做排除。
+    上市后第几个交易日按上市日期到K线日期之间的工作日数计算，只取决于股票和日期，
+    与K线属于哪个批次、窗口无关（停牌复牌、历史较短的股票不会被误判为新股）
+    """
+    mask = np.zeros(len(codes), dtype=bool)
+    if listing_dates is None or listing_dates.empty or not len(codes):
+        return mask
+    listed = listing_dates.reindex(codes).to_numpy(dtype=np.float64)
+    rows = np.flatnonzero(~np.isnan(listed) & (dates >= listed))
+    if not len(rows):
+        return mask
+    listed = listed[rows].astype(np.int32)
+    sessions = np.busday_count(listed.astype('datetime64[D]'), dates[rows].astype('datetime64[D]'))
+    mask[rows] = sessions < ipo_free_sessions(board_of(codes[rows]), listed)
+    return mask
+
+
+def limit_up_streaks(is_limit_up, starts, carry_boards=None, carry_prev_limit_up=None):
+    """对每只股票的涨停序列做游程编码
+
+    返回 (连板数, 是否断板回封)，连板数为当日所在连续涨停段中的第几板（非涨停日为 0）。
+    增量识别时 carry_boards 为每只股票（与分组首行一一对应）上一根已处理K线的连板数，
+    carry_prev_limit_up 为再前一根K线是否涨停，用于延续跨批次的连板和断板回封
+    """
+    group_count = int(np.count_nonzero(starts))
+    if carry_boards is None:
+        carry_boards = np.zeros(group_count, dtype=np.int64)
+    if carry_prev_limit_up is None:
+        carry_prev_limit_up = np.zeros(group_count, dtype=bool)
+    carry_boards = np.asarray(carry_boards, dtype=np.int64)
+    carry_limit_up = carry_boards > 0
+
+    prev_limit_up = grouped_shift_bool(is_limit_up, starts, carry_limit_up)
+    run_start = is_limit_up & ~prev_limit_up
+    # 分组首行也作为游程锚点，延续上一批次的连板时从携带的连板数继续计数
+    anchor = run_start | (starts & is_limit_up)
+    offset = np.zeros(len(is_limit_up), dtype=np.int64)
+    offset[starts] = np.where(carry_limit_up, carry_boards, 0)
+    positions = np.arange(len(is_limit_up))
+    anchor_pos = np.maximum.accumulate(np.where(anchor, positions, 0)) if len(positions) else positions
+    boards = np.where(is_limit_up, positions - anchor_pos + 1 + offset[anchor_pos], 0)
+    reseal = run_start & grouped_shift_bool(prev_limit_up, starts, carry_prev_limit_up)
+    return boards, reseal
+
+
+def price_array(values):
+    """float32 价格还原为 float64
+
+    A股价格最小变动单位为 0.01 元，float32 有约 7 位有效数字，
+    四舍五入到分即可还原 10 万元以下价格的精确值
+    """
+    return np.round(np.asarray(values, dtype=np.float64), 2)
+
+
+def previous_close(bars, close, starts):
+    """每根K线的前收盘价
+
+    有涨跌额时取 收盘价 - 涨跌额，即交易所公布的前收盘价（除权除息日为除权参考价，
+    每只股票的首日也有值）；缺少涨跌额时退回到上一根K线的收盘价
+    """
+    prev_close = grouped_shift(close, starts)
+    if 'change' in bars.columns:
+        reference = np.round(close - bars['change'].to_numpy(dtype=np.float64), 2)
+        prev_close = np.where(np.isnan(reference), prev_close, reference)
+    return prev_close
+
+
+def name_is_st(names):
+    """按股票名称判断每行是否为 ST 股票，分类类型的名称只对类别做一次字符串判断"""
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        flags = is_st_name(names.cat.categories)
+        codes = names.cat.codes.to_numpy()
+        return np.where(codes >= 0, flags[codes] if len(flags) else False, False)
+    return is_st_name(names.to_numpy())
+
+
+def detect_limit_up_compact(bars, threshold=None, tolerance=0.0, listing_dates=None):
+    """在紧凑格式的日线表中识别涨停，返回紧凑格式的涨停记录
+
+    同一股票的行需连续且按日期升序，记录按输入顺序排列。
+    threshold 为 None 时按交易所规则识别：收盘价达到精确到分的涨停价即为涨停，
+    tolerance 为价格比较容差（见 limit_rules.classify_limit_bars）；
+    threshold 为百分比时沿用按涨跌幅阈值识别的旧规则。
+    listing_dates 为各股票的上市日期（见 listing_date_series），用于排除新股上市初期不设涨跌幅限制的交易日
+    """
+    return _detect_compact(bars, threshold, tolerance, listing_dates=listing_dates)[0]
+
+
+def detect_limit_up_incremental(bars, carry=None, threshold=None, tolerance=0.0, listing_dates=None):
+    """增量识别：在新K线上识别涨停，并延续上一批次每只股票的收盘价和连板状态
+
+    carry 为上一次返回的状态表（以 int32 股票代码为索引，含 date、close、boards、prev_limit_up 列），
+    bars 中早于等于状态日期的K线会被忽略。股票在状态日期之后缺少交易日（其他股票有K线的日期）时，
+    不延续该股票的连板状态和收盘价。返回 (涨停记录表, 更新后的状态表)
+    """
+    if carry is not None and not carry.empty and not bars.empty:
+        last_date = carry['date'].reindex(bars['code'].to_numpy()).to_numpy()
+        bars = bars[~(bars['date'].to_numpy() <= last_date)].reset_index(drop=True)
+        carry = _break_gapped_carry(bars, carry)
+    records, new_carry = _detect_compact(bars, threshold, tolerance, carry, listing_dates)
+    return records_to_frame(records), _merge_carry(carry, new_carry)
+
+
+def _break_gapped_carry(bars, carry):
+    """状态日期与本批次第一根K线之间有交易日缺失的股票，清除其连板状态和收盘价
+
+    交易日取本批次各K线日期和状态中有收盘价的日期（补位行没有收盘价，其日期不一定是交易日）
+    """
+    codes = bars['code'].to_numpy()
+    dates = bars['date'].to_numpy()
+    starts = group_start_mask(codes)
+    known = carry['close'].notna().to_numpy()
+    calendar = np.union1d(dates, carry['date'].to_numpy()[known])
+    last_date = carry['date'].reindex(codes[starts]).to_numpy(dtype=np.float64)
+    missing = np.searchsorted(calendar, dates[starts]) - np.searchsorted(calendar, last_date, side='right')
+    gapped = codes[starts][~np.isnan(last_date) & (missing > 0)]
+    if not len(gapped):
+        return carry
+    carry = carry.copy()
+    carry.loc[gapped, ['close', 'boards', 'prev_limit_up']] = [np.nan, 0, False]
+    return carry
+
+
+def placeholder_carry(carry, codes, last_date):
+    """状态表中补上没有状态的股票（抓取失败或没有K线）：日期为 last_date，没有收盘价，连板数为 0
+
+    下一次增量识别从 last_date 之后继续抓取这些股票
+    """
+    codes = np.asarray(codes, dtype=np.int32)
+    if carry is not None and not carry.empty:
+        codes = codes[~np.isin(codes, carry.index.to_numpy())]
+    placeholders = pd.DataFrame({
+        'date': np.full(len(codes), encode_dates([last_date])[0], dtype=np.int32),
+        'close': np.nan,
+        'boards': np.zeros(len(codes), dtype=np.int16),
+        'prev_limit_up': np.zeros(len(codes), dtype=bool),
+    }, index=pd.Index(codes, name='code'), columns=CARRY_COLUMNS)
+    return _merge_carry(carry, placeholders) if len(codes) else carry
+
+
+def detect_limit_up_chunks(chunks, threshold=None, tolerance=0.0, listing_dates=None):
+    """分段识别：chunks 为按时间先后排列的紧凑格式日线表（如按年分区的历史数据），
+    每段内同一股票的行连续且按日期升序，各段之间延续每只股票的收盘价和连板状态，
+    结果与拼接后一次识别相同。返回按股票代码和日期排序的涨停记录表
+    """
+    carry = None
+    parts = []
+    for bars in chunks:
+        if bars.empty:
+            continue
+        records, new_carry = _detect_compact(bars, threshold, tolerance, carry, listing_dates)
+        carry = _merge_carry(carry, new_carry)
+        parts.append(records)
+    if not parts:
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+    records = pd.concat(parts, ignore_index=True)
+    order = np.lexsort((records['date'].to_numpy(), records['code'].to_numpy()))
+    return records_to_frame(records.iloc[order])
+
+
+def _merge_carry(carry, new_carry):
+    """本批次没有K线的股票保留上一批次的状态"""
+    if carry is None or carry.empty:
+        return new_carry
+    return pd.concat([carry[~carry.index.isin(new_carry.index)], new_carry]).sort_index()
+
+
+def _detect_compact(bars, threshold, tolerance, carry=None, listing_dates=None):
+    codes = bars['code'].to_numpy()
+    close = price_array(bars['close'].to_numpy())
+    starts = group_start_mask(codes)
+    prev_close = previous_close(bars, close, starts)
+    carry_boards = carry_prev_limit_up = None
+    if carry is not None and not carry.empty:
+        group_carry = carry.reindex(codes[starts])
+        # 缺少涨跌额时每只股票首行的前收盘价取上一批次的收盘价
+        prev_close[starts] = np.where(np.isnan(prev_close[starts]),
+                                      group_carry['close'].to_numpy(dtype=np.float64), prev_close[starts])
+        carry_boards = group_carry['boards'].fillna(0).to_numpy(dtype=np.int64)
+        carry_prev_limit_up = group_carry['prev_limit_up'].fillna(False).to_numpy(dtype=bool)
+    no_limit = new_listing_mask(codes, bars['date'].to_numpy(), listing_dates)
+    pct_change, rules = _limit_features(bars, close, prev_close, tolerance, no_limit)
+    # NaN 参与比较结果为 False，缺少前收盘价的K线自然被排除；新股不设涨跌幅限制的交易日不计为涨停
+    is_limit_up = rules['closed'] if threshold is None else (pct_change >= threshold) & ~no_limit
+    boards, reseal = limit_up_streaks(is_limit_up, starts, carry_boards, carry_prev_limit_up)
+    hits = np.flatnonzero(is_limit_up)
+
+    # 每只股票最后一根K线的状态，供下一批次增量识别
+    ends = np.flatnonzero(np.append(starts[1:], True)) if len(codes) else np.array([], dtype=np.int64)
+    prev_limit_up = grouped_shift_bool(is_limit_up, starts, carry_boards > 0 if carry_boards is not None else False)
+    new_carry = pd.DataFrame({
+        'date': bars['date'].to_numpy()[ends],
+        'close': close[ends],
+        'boards': boards[ends].astype(np.int16),
+        'prev_limit_up': prev_limit_up[ends],
+    }, index=pd.Index(codes[ends], name='code'), columns=CARRY_COLUMNS)
+
+    records = _hit_records(bars, hits, close, prev_close, pct_change, rules, boards[hits], reseal[hits])
+    return records, new_carry
+
+
+def row_tolerance(bars, tolerance):
+    """每根K线的价格比较容差：复权乘数为 1 的K线（未经复权）严格比较，容差只用于复权价格"""
+    if not tolerance or 'factor' not in bars.columns:
+        return tolerance
+    return np.where(bars['factor'].to_numpy() == 1, 0.0, tolerance)
+
+
+def _limit_features(bars, close, prev_close, tolerance, no_limit=None):
+    """涨跌幅和交易所规则的涨停判定（见 limit_rules.classify_limit_bars），返回 (涨跌幅, 判定结果)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_change = (close - prev_close) / prev_close * 100
+    rules = classify_limit_bars(
+        bars['code'].to_numpy(), bars['date'].to_numpy(), name_is_st(bars['name']), prev_close,
+        price_array(bars['open'].to_numpy()), price_array(bars['high'].to_numpy()),
+        price_array(bars['low'].to_numpy()), close, row_tolerance(bars, tolerance), no_limit)
+    return pct_change, rules
+
+
+def _hit_records(bars, hits, close, prev_close, pct_change, rules, boards, reseal):
+    """由涨停K线的行号生成紧凑格式的涨停记录，boards 和 reseal 为这些行的连板数和断板回封标记"""
+    return pd.DataFrame({
+        'code': bars['code'].to_numpy()[hits],
+        'name': bars['name'].array[hits],
+        'date': bars['date'].to_numpy()[hits],
+        'close': close[hits],
+        'prev_close': prev_close[hits],
+        'pct_change': np.round(pct_change[hits], 2),
+        'open': bars['open'].to_numpy()[hits],
+        'high': bars['high'].to_numpy()[hits],
+        'low': bars['low'].to_numpy()[hits],
+        'volume': bars['volume'].to_numpy()[hits].astype(np.int64),
+        'amount': bars['amount'].to_numpy()[hits],
+        'turnover': bars['turnover'].to_numpy()[hits],
+        'boards': boards.astype(np.int16),
+        'reseal': reseal,
+        'limit_pct': rules['limit_pct'][hits],
+        'seal': rules['seal'][hits],
+    })
+
+
+def detect_limit_up_scenarios(bars, scenarios, tolerance=0.0, listing_dates=None):
+    """多情景识别：在同一份日线上按多组 (起始日期, 涨跌幅阈值) 识别涨停
+
+    scenarios 为 (起始日期的 int32 天数或 None, 阈值百分比或 None) 列表，阈值为 None 时按交易所规则识别。
+    前收盘价、涨跌幅和交易所规则判定只计算一次，各情景只在窗口内的行上重新计算连板，
+    结果与只抓取该窗口的日线后单独识别相同。返回与 scenarios 对应的涨停记录表列表
+    """
+    if bars is None or bars.empty:
+        return [pd.DataFrame(columns=RECORD_COLUMNS) for _ in scenarios]
+    codes = bars['code'].to_numpy()
+    dates = bars['date'].to_numpy()
+    close = price_array(bars['close'].to_numpy())
+    prev_close = previous_close(bars, close, group_start_mask(codes))
+    no_limit = new_listing_mask(codes, dates, listing_dates)
+    pct_change, rules = _limit_features(bars, close, prev_close, tolerance, no_limit)
+    # 单独识别时窗口内首行的前收盘价只能来自涨跌额，没有涨跌额的行不会被识别为涨停
+    if 'change' in bars.columns:
+        has_reference = ~np.isnan(bars['change'].to_numpy(dtype=np.float64))
+    else:
+        has_reference = np.zeros(len(bars), dtype=bool)
+
+    results = []
+    windows = {}
+    for start_day, threshold in scenarios:
+        if start_day not in windows:
+            rows = np.arange(len(bars)) if start_day is None else np.flatnonzero(dates >= start_day)
+            starts = group_start_mask(codes[rows])
+            excluded = (starts & ~has_reference[rows]) | no_limit[rows]
+            windows[start_day] = (rows, starts, excluded)
+        rows, starts, excluded = windows[start_day]
+        is_limit_up = (rules['closed'] if threshold is None else pct_change >= threshold)[rows]
+        is_limit_up[excluded] = False
+        boards, reseal = limit_up_streaks(is_limit_up, starts)
+        hit_positions = np.flatnonzero(is_limit_up)
+        records = _hit_records(bars, rows[hit_positions], close, prev_close, pct_change, rules,
+                               boards[hit_positions], reseal[hit_positions])
+        results.append(records_to_frame(records))
+    return results
+
+
+def records_to_frame(records):
+    """紧凑格式的涨停记录转换为输出用的中文字段表"""
+    return pd.DataFrame({
+        '股票代码': decode_codes(records['code'].to_numpy()),
+        '股票名称': np.asarray(records['name'], dtype=object),
+        '涨停日期': decode_dates(records['date'].to_numpy()),
+        '涨停价格': records['close'].to_numpy(),
+        '前日收盘价': records['prev_close'].to_numpy(),
+        '涨跌幅(%)': records['pct_change'].to_numpy(),
+        '开盘价': price_array(records['open'].to_numpy()),
+        '最高价': price_array(records['high'].to_numpy()),
+        '最低价': price_array(records['low'].to_numpy()),
+        '成交量': records['volume'].to_numpy(),
+        '成交额': records['amount'].to_numpy(),
+        '换手率(%)': np.round(records['turnover'].to_numpy().astype(np.float64), 2),
+        '连板数': records['boards'].to_numpy(),
+        '板型': board_type_labels(records['boards'].to_numpy(), records['reseal'].to_numpy()),
+        '涨停幅度(%)': records['limit_pct'].to_numpy(),
+        # 阈值规则下未达到涨停价的记录没有封板形态
+        '封板形态': np.where(records['seal'].to_numpy() >= 0,
+                          SEAL_NAMES[np.maximum(records['seal'].to_numpy(), 0)], ''),
+    }, columns=RECORD_COLUMNS)
+
+
+def board_type_labels(boards, reseal):
+    """连板数和断板回封标记转换为板型文字"""
+    return BOARD_TYPES[np.where(np.asarray(boards) > 1, 1, np.where(np.asarray(reseal, dtype=bool), 2, 0))]
+
+
+def frame_to_records(data):
+    """输出用的中文字段涨停记录表转换为紧凑格式（只含统计所需字段）
+
+    缺少连板字段时（例如旧版本生成的数据）boards 和 reseal 列不存在
+    """
+    records = pd.DataFrame({
+        'code': data['股票代码'].astype(np.int64).to_numpy().astype(np.int32),
+        'name': pd.Categorical(data['股票名称']),
+        'date': encode_dates(data['涨停日期'].to_numpy()),
+        'pct_change': data['涨跌幅(%)'].to_numpy(dtype=np.float64),
+        'volume': data['成交量'].to_numpy(dtype=np.float64).astype(np.int64),
+    })
+    if '连板数' in data.columns:
+        records['boards'] = data['连板数'].to_numpy(dtype=np.int16)
+        records['reseal'] = (data['板型'] == '断板回封').to_numpy() if '板型' in data.columns \
+            else np.zeros(len(data), dtype=bool)
+    return records
+
+
+def detect_limit_up(bars, threshold=None, tolerance=0.0, listing_dates=None):
+    """在紧凑格式的日线表中识别涨停，返回输出用的中文字段涨停记录表"""
+    if bars is None or bars.empty:
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+    return records_to_frame(detect_limit_up_compact(bars, threshold, tolerance, listing_dates))
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场涨停扫描
+把沪深主板、创业板、科创板和北交所的全部股票按板块和代码区间切分为分片，
+分发到进程池中并行处理：每个工作进程独立抓取日线并识别涨停，
+主进程按分片顺序合并结果，输出到同一份报表并记录每个分片的进度和耗时
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from bar_store import ADJUST_MODES
+from report_writers import REPORT_FORMATS
+from data_providers import PROVIDERS
+from gem_limitup_scraper import GEMLimitUpScraper, provider_options
+from limit_rules import BOARD_NAMES
+from limit_up_engine import RECORD_COLUMNS, concat_stock_bars
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 200
+SHARD_COLUMNS = ['分片', '板块', '起始代码', '结束代码', '股票数', '涨停记录数', '失败股票数',
+                 '请求次数', '耗时(秒)', 'CPU时间(秒)']
+
+
+def shard_stock_list(stocks, shard_size=DEFAULT_SHARD_SIZE):
+    """按板块和代码区间切分股票列表
+
+    stocks 需包含 code、name、board 三列，返回分片字典列表，
+    每个分片只含同一板块内代码连续的至多 shard_size 只股票
+    """
+    shard_size = max(int(shard_size), 1)
+    shards = []
+    board_order = {name: position for position, name in enumerate(BOARD_NAMES)}
+    ordered = stocks.assign(_board_order=stocks['board'].map(board_order)).sort_values(['_board_order', 'code'])
+    for board, group in ordered.groupby('_board_order', sort=True):
+        for offset in range(0, len(group), shard_size):
+            chunk = group.iloc[offset:offset + shard_size]
+            shards.append({
+                'shard_id': len(shards),
+                'board': BOARD_NAMES[board],
+                'stocks': list(zip(chunk['code'], chunk['name'])),
+            })
+    return shards
+
+
+def scan_shard(task):
+    """在工作进程中处理一个分片：创建独立的数据源和爬虫，抓取日线并识别涨停"""
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    provider = PROVIDERS[task['provider']](**task['provider_options'])
+    scraper = GEMLimitUpScraper(provider=provider, **task['scraper_options'])
+    stocks = pd.DataFrame(task['stocks'], columns=['code', 'name'])
+    bars = concat_stock_bars(scraper.iter_stock_bars(date_range=task['date_range'], stocks=stocks))
+    records = scraper.identify_limit_up_batch(bars)
+    return {
+        'shard_id': task['shard_id'],
+        'board': task['board'],
+        'records': records,
+        'failed': dict(scraper.failed_stocks),
+        'stats': {
+            '分片': task['shard_id'] + 1,
+            '板块': task['board'],
+            '起始代码': task['stocks'][0][0],
+            '结束代码': task['stocks'][-1][0],
+            '股票数': len(task['stocks']),
+            '涨停记录数': len(records),
+            '失败股票数': len(scraper.failed_stocks),
+            '请求次数': scraper.request_executor.stats['requests'],
+            '耗时(秒)': round(time.perf_counter() - start, 3),
+            'CPU时间(秒)': round(time.process_time() - cpu_start, 3),
+        },
+    }
+
+
+class MarketScanner:
+    """全市场扫描器
+
+    provider / provider_options 为数据源名称（data_providers.PROVIDERS）和构造参数，
+    工作进程据此各自创建数据源；processes 为进程数（1 表示在当前进程中依次处理分片）；
+    scraper_options 传给每个分片的 GEMLimitUpScraper（如 max_workers、cache_path、adjust）。
+    requests_per_second 为全局请求速率上限，平均分配给各进程
+    """
+
+    def __init__(self, provider='akshare', provider_options=None, processes=None,
+                 shard_size=DEFAULT_SHARD_SIZE, requests_per_second=10.0, **scraper_options):
+        self.provider = provider
+        self.provider_options = dict(provider_options or {})
+        self.processes = max(int(processes or os.cpu_count() or 1), 1)
+        self.shard_size = shard_size
+        rate = requests_per_second / self.processes if requests_per_second else None
+        self.scraper_options = {'requests_per_second': rate, **scraper_options}
+        # 主进程只用于获取股票列表和保存报表
+        self.scraper = GEMLimitUpScraper(provider=PROVIDERS[provider](**self.provider_options),
+                                         **self.scraper_options)
+        self.failed_stocks = {}
+        self.shard_stats = pd.DataFrame(columns=SHARD_COLUMNS)
+
+    def _tasks(self, shards, date_range):
+        for shard in shards:
+            yield {**shard, 'date_range': date_range, 'provider': self.provider,
+                   'provider_options': self.provider_options, 'scraper_options': self.scraper_options}
+
+    def _run_shards(self, tasks):
+        """执行全部分片，按完成顺序产出分片结果"""
+        if self.processes == 1:
+            for task in tasks:
+                yield scan_shard(task)
+            return
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            futures = [executor.submit(scan_shard, task) for task in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def scan(self, days_back=30, boards=None, date_range=None):
+        """扫描全市场，返回合并后的涨停记录（按日期降序）
+
+        boards 为板块名称列表时只扫描这些板块；分片统计保存在 self.shard_stats
+        """
+        date_range = date_range or self.scraper._date_range(days_back)
+        stocks = self.scraper.get_market_stock_list()
+        if stocks.empty:
+            logger.error("无法获取全市场股票列表")
+            return pd.DataFrame(columns=RECORD_COLUMNS)
+        if boards:
+            stocks = stocks[stocks['board'].isin(boards)]
+
+        shards = shard_stock_list(stocks, self.shard_size)
+        logger.info(f"开始扫描 {date_range[0]} 至 {date_range[1]}：{len(stocks)} 只股票，"
+                    f"{len(shards)} 个分片，{self.processes} 个进程")
+        start = time.perf_counter()
+        results = []
+        for done, result in enumerate(self._run_shards(self._tasks(shards, date_range)), 1):
+            stats = result['stats']
+            logger.info(f"分片 {done}/{len(shards)} 完成：{stats['板块']} {stats['起始代码']}-{stats['结束代码']}，"
+                        f"{stats['股票数']} 只股票，{stats['涨停记录数']} 条涨停记录，耗时 {stats['耗时(秒)']:.2f} 秒")
+            results.append(result)
+        logger.info(f"全市场扫描完成，耗时 {time.perf_counter() - start:.2f} 秒")
+
+        # 按分片编号合并，结果与处理顺序无关
+        results.sort(key=lambda item: item['shard_id'])
+        self.failed_stocks = {code: error for result in results for code, error in result['failed'].items()}
+        self.shard_stats = pd.DataFrame([result['stats'] for result in results], columns=SHARD_COLUMNS)
+        frames = [result['records'] for result in results if not result['records'].empty]
+        if not frames:
+            return pd.DataFrame(columns=RECORD_COLUMNS)
+        merged = pd.concat(frames, ignore_index=True)
+        return merged.sort_values('涨停日期', ascending=False, kind='stable').reset_index(drop=True)
+
+    def board_summary(self):
+        """按板块汇总分片统计"""
+        if self.shard_stats.empty:
+            return pd.DataFrame()
+        summary = self.shard_stats.groupby('板块', sort=False)[
+            ['股票数', '涨停记录数', '失败股票数', '请求次数', '耗时(秒)']].sum().reset_index()
+        return summary.round(3)
+
+    def run(self, days_back=30, boards=None, filename=None):
+        """扫描全市场并输出报表，额外写入按板块统计和分片统计两张表"""
+        logger.info("=== A股全市场涨停扫描启动 ===")
+        result_data = self.scan(days_back, boards)
+        output_paths = self.scraper.save_report(
+            result_data, filename or os.path.join(self.scraper.output_directory, 'market_limit_up_stocks.xlsx'),
+            extra_sheets={'按板块统计': self.board_summary(), '分片统计': self.shard_stats})
+        logger.info(f"输出文件: {', '.join(output_paths)}")
+        if self.failed_stocks:
+            logger.warning(f"共 {len(self.failed_stocks)} 只股票获取数据失败")
+        logger.info("=== 全市场扫描完成 ===")
+        return result_data
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="A股全市场涨停扫描（按板块分片，多进程并行）")
+    parser.add_argument("--days", type=int, default=30, help="查询最近多少天的数据（默认30）")
+    parser.add_argument("--processes", type=int, default=None, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--workers", type=int, default=4, help="每个进程内的抓取线程数（默认4）")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"每个分片的股票数（默认{DEFAULT_SHARD_SIZE}）")
+    parser.add_argument("--boards", nargs="+", choices=list(BOARD_NAMES), default=None,
+                        help="只扫描指定板块（默认全部）")
+    parser.add_argument("--rate", type=float, default=10.0, help="全部进程合计的每秒请求数上限（默认10）")
+    parser.add_argument("--adjust", choices=list(ADJUST_MODES), default="qfq", help="复权方式（默认qfq）")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="akshare", help="行情数据源")
+    parser.add_argument("--replay-dir", default=None, help="replay 数据源的录制目录")
+    parser.add_argument("--format", nargs="+", choices=list(REPORT_FORMATS), default=["xlsx"],
+                        help="报表格式，可同时指定多个（默认 xlsx）")
+    parser.add_argument("--output", default=None, help="输出文件路径（默认 output/market_limit_up_stocks.xlsx）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    options = provider_options(args)
+    if args.provider == "synthetic":
+        options['universe'] = 'market'
+    scanner = MarketScanner(provider=args.provider, provider_options=options,
+                            processes=args.processes, shard_size=args.shard_size,
+                            requests_per_second=args.rate, max_workers=args.workers, adjust=args.adjust,
+                            report_formats=args.format)
+    result_data = scanner.run(days_back=args.days, boards=args.boards, filename=args.output)
+    print(f"\n✅ 完成！共 {len(result_data)} 条涨停记录")
+    print(scanner.shard_stats.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+记录各阶段的墙钟时间和 CPU 时间、上游请求的延迟分布和错误次数、处理的行数和字节数，
+可导出为 JSON（并追加到历史文件便于比较多次运行）和 Prometheus 文本格式；
+另提供按时间间隔限频的进度输出，代替逐只股票的日志
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'gem_scraper'
+# 请求延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PERCENTILES = (50, 90, 99)
+
+
+class Metrics:
+    """线程安全的指标记录器
+
+    stage() 统计阶段耗时（同名阶段累加，阶段可以嵌套）；observe_request() 记录一次上游请求；
+    add() 累加计数（行数、字节数等）
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        # 阶段名称 -> [墙钟时间, CPU 时间, 次数]
+        self.stages = {}
+        # 请求类型 -> {'latencies': [...], 'errors': 次数}
+        self.requests = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            with self._lock:
+                entry = self.stages.setdefault(name, [0.0, 0.0, 0])
+                entry[0] += wall
+                entry[1] += cpu
+                entry[2] += 1
+
+    def timed(self, iterable, name):
+        """包装迭代器：只统计等待下一个元素的时间，消费者处理元素的时间不计入该阶段"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def observe_request(self, operation, latency, success=True):
+        with self._lock:
+            entry = self.requests.setdefault(operation, {'latencies': [], 'errors': 0})
+            entry['latencies'].append(latency)
+            if not success:
+                entry['errors'] += 1
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: {'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6), 'count': count}
+                      for name, (wall, cpu, count) in self.stages.items()}
+            requests = {}
+            for operation, entry in self.requests.items():
+                latencies = np.asarray(entry['latencies'], dtype=np.float64)
+                summary = {'count': len(latencies), 'errors': entry['errors'],
+                           'total_seconds': round(float(latencies.sum()), 6)}
+                for pct in PERCENTILES:
+                    summary[f'p{pct}_seconds'] = round(float(np.percentile(latencies, pct)), 6) if len(latencies) else None
+                requests[operation] = summary
+            return {
+                'started_at': self.started_at,
+                'stages': stages,
+                'requests': requests,
+                'counters': dict(self.counters),
+            }
+
+    def stage_summary(self):
+        """一行文字的阶段耗时汇总"""
+        with self._lock:
+            parts = [f"{name} {wall:.2f}s（CPU {cpu:.2f}s）" for name, (wall, cpu, _) in self.stages.items()]
+        return '，'.join(parts)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+
+        with self._lock:
+            stages = dict(self.stages)
+            requests = {operation: (list(entry['latencies']), entry['errors'])
+                        for operation, entry in self.requests.items()}
+            counters = dict(self.counters)
+
+        metric('stage_wall_seconds', 'gauge', 'Wall-clock seconds spent in each pipeline stage')
+        for name, (wall, _, _) in stages.items():
+            lines.append(f'{METRIC_PREFIX}_stage_wall_seconds{{stage="{name}"}} {wall:.6f}')
+        metric('stage_cpu_seconds', 'gauge', 'Process CPU seconds spent in each pipeline stage')
+        for name, (_, cpu, _) in stages.items():
+            lines.append(f'{METRIC_PREFIX}_stage_cpu_seconds{{stage="{name}"}} {cpu:.6f}')
+
+        metric('request_latency_seconds', 'histogram', 'Upstream request latency')
+        for operation, (latencies, _) in requests.items():
+            values = np.asarray(latencies, dtype=np.float64)
+            for bucket in LATENCY_BUCKETS:
+                count = int(np.count_nonzero(values <= bucket))
+                lines.append(f'{METRIC_PREFIX}_request_latency_seconds_bucket{{operation="{operation}",le="{bucket}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_request_latency_seconds_bucket{{operation="{operation}",le="+Inf"}} {len(values)}')
+            lines.append(f'{METRIC_PREFIX}_request_latency_seconds_sum{{operation="{operation}"}} {values.sum():.6f}')
+            lines.append(f'{METRIC_PREFIX}_request_latency_seconds_count{{operation="{operation}"}} {len(values)}')
+        metric('request_errors_total', 'counter', 'Failed upstream request attempts')
+        for operation, (_, errors) in requests.items():
+            lines.append(f'{METRIC_PREFIX}_request_errors_total{{operation="{operation}"}} {errors}')
+
+        for name, value in counters.items():
+            metric(f'{name}_total', 'counter', f'Total {name.replace("_", " ")}')
+            lines.append(f'{METRIC_PREFIX}_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, prefix):
+        """写出 <prefix>.json、<prefix>.prom，并向 <prefix>_history.jsonl 追加一行，返回写出的路径"""
+        directory = os.path.dirname(os.path.abspath(prefix))
+        os.makedirs(directory, exist_ok=True)
+        data = self.to_dict()
+        paths = [f"{prefix}.json", f"{prefix}.prom", f"{prefix}_history.jsonl"]
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        with open(paths[2], 'a', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+        return paths
+
+
+class ProgressReporter:
+    """限频的进度输出：每隔 interval 秒最多输出一行，包含完成数、速度和预计剩余时间"""
+
+    def __init__(self, total, label='处理股票', interval=5.0):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self._started = time.monotonic()
+        self._last_report = self._started
+        self._lock = threading.Lock()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self._last_report < self.interval or self.done >= self.total:
+                return
+            self._last_report = now
+            done = self.done
+        self._report(done, now)
+
+    def finish(self):
+        self._report(self.done, time.monotonic())
+
+    def _report(self, done, now):
+        elapsed = now - self._started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - done) / rate if rate > 0 else 0.0
+        logger.info(f"{self.label} {done}/{self.total}（{done / max(self.total, 1):.0%}），"
+                    f"{rate:.1f} 只/秒，已用 {elapsed:.1f} 秒，预计剩余 {remaining:.1f} 秒")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+涨停记录查询服务
+一次性加载已输出的涨停记录（xlsx / parquet / feather / csv 报表或增量模式的状态文件），
+按日期和股票代码建立内存索引，支持按日期、日期区间、单只股票历史和涨停次数 / 连板排行查询，
+查询结果经 LRU 缓存；可选启动本地 HTTP 服务以 JSON 返回结果
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import decode_codes, decode_dates, encode_dates
+from limit_up_engine import RECORD_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_PORT = 8765
+TOP_COLUMNS = ['股票代码', '股票名称', '涨停次数', '最高连板', '首次涨停', '最近涨停']
+DATE_COUNT_COLUMNS = ['涨停日期', '涨停股票数']
+TOP_ORDERS = ('count', 'streak')
+
+
+def load_records(path):
+    """读取涨停记录：按扩展名识别报表格式，.json 视为增量模式的状态文件"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        records = pd.read_parquet(path)
+    elif extension == '.feather':
+        records = pd.read_feather(path)
+    elif extension == '.csv':
+        records = pd.read_csv(path, dtype={'股票代码': str})
+    elif extension == '.xlsx':
+        sheets = pd.read_excel(path, sheet_name=None, dtype={'股票代码': str})
+        records = sheets.get('涨停股票数据', pd.DataFrame(columns=RECORD_COLUMNS))
+    elif extension == '.json':
+        with open(path, encoding='utf-8') as f:
+            records = pd.DataFrame(json.load(f)['records'], columns=RECORD_COLUMNS)
+    else:
+        raise ValueError(f"不支持的涨停记录文件: {path}")
+    return records
+
+
+def _normalize_date(value):
+    """查询参数中的日期转换为 int32 天数，None 原样返回"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(encode_dates([str(value)])[0])
+    except ValueError:
+        raise ValueError(f"无法识别的日期: {value}") from None
+
+
+def _normalize_code(value):
+    code = str(value).strip()
+    if not code.isdigit() or len(code) > 6:
+        raise ValueError(f"无法识别的股票代码: {value}")
+    return int(code)
+
+
+class LimitUpIndex:
+    """涨停记录的内存索引
+
+    记录按 (日期, 股票代码) 排序，日期区间查询为 searchsorted 得到的连续切片；
+    另保存按 (股票代码, 日期) 排序的位置数组，单只股票的历史同样是连续切片。
+    日期参数为 int32 天数（见 bar_schema.encode_dates），股票代码为整数
+    """
+
+    def __init__(self, records):
+        records = records.reset_index(drop=True)
+        codes = records['股票代码'].astype(np.int64).to_numpy().astype(np.int32)
+        dates = encode_dates(records['涨停日期'].to_numpy()) if len(records) else np.array([], dtype=np.int32)
+        order = np.lexsort((codes, dates))
+        self.records = records.iloc[order].reset_index(drop=True)
+        # 输出统一为 6 位代码和 YYYY-MM-DD 日期字符串
+        self.records['股票代码'] = decode_codes(codes[order])
+        self.records['涨停日期'] = decode_dates(dates[order])
+        self.codes = codes[order]
+        self.dates = dates[order]
+        self.boards = self.records['连板数'].to_numpy(dtype=np.int16) if '连板数' in self.records.columns \
+            else np.ones(len(self.records), dtype=np.int16)
+        self._code_order = np.lexsort((self.dates, self.codes))
+        self._sorted_codes = self.codes[self._code_order]
+
+    def __len__(self):
+        return len(self.records)
+
+    def date_positions(self, start=None, end=None):
+        """日期在 [start, end] 内的记录位置（切片）"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, start, side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, end, side='right'))
+        return slice(lo, max(lo, hi))
+
+    def code_positions(self, code, start=None, end=None):
+        """某只股票日期在 [start, end] 内的记录位置（按日期升序的位置数组）"""
+        lo = int(np.searchsorted(self._sorted_codes, code, side='left'))
+        hi = int(np.searchsorted(self._sorted_codes, code, side='right'))
+        positions = self._code_order[lo:hi]
+        if start is not None or end is not None:
+            dates = self.dates[positions]
+            first = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+            last = len(dates) if end is None else int(np.searchsorted(dates, end, side='right'))
+            positions = positions[first:max(first, last)]
+        return positions
+
+    def select(self, positions):
+        return self.records.iloc[positions].reset_index(drop=True)
+
+    def date_counts(self, start=None, end=None):
+        window = self.date_positions(start, end)
+        days, counts = np.unique(self.dates[window], return_counts=True)
+        return pd.DataFrame({'涨停日期': decode_dates(days), '涨停股票数': counts.astype(np.int64)},
+                            columns=DATE_COUNT_COLUMNS)
+
+    def top_stocks(self, n=10, by='count', start=None, end=None):
+        """日期区间内按涨停次数（count）或最高连板数（streak）排名前 n 的股票"""
+        if by not in TOP_ORDERS:
+            raise ValueError(f"不支持的排序方式: {by}")
+        window = self.date_positions(start, end)
+        codes = self.codes[window]
+        if not len(codes):
+            return pd.DataFrame(columns=TOP_COLUMNS)
+        # 区间内按 (股票代码, 日期) 排序后，每只股票为连续的一段
+        order = np.lexsort((self.dates[window], codes))
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        counts = np.diff(np.r_[starts, len(sorted_codes)])
+        max_boards = np.maximum.reduceat(self.boards[window][order], starts)
+        dates = self.dates[window][order]
+        first_dates = dates[starts]
+        last_dates = dates[np.r_[starts[1:], len(sorted_codes)] - 1]
+
+        primary, secondary = (counts, max_boards) if by == 'count' else (max_boards, counts)
+        # 主键、次键降序，代码升序
+        ranking = np.lexsort((sorted_codes[starts], -secondary, -primary))[:n]
+        names = self.records['股票名称'].to_numpy()[window][order][starts]
+        return pd.DataFrame({
+            '股票代码': decode_codes(sorted_codes[starts][ranking]),
+            '股票名称': names[ranking],
+            '涨停次数': counts[ranking].astype(np.int64),
+            '最高连板': max_boards[ranking].astype(np.int64),
+            '首次涨停': decode_dates(first_dates[ranking]),
+            '最近涨停': decode_dates(last_dates[ranking]),
+        }, columns=TOP_COLUMNS)
+
+
+class LimitUpQueryService:
+    """涨停记录查询服务：参数规范化后经 LRU 缓存执行查询
+
+    返回的 DataFrame 与缓存共享，调用方需要修改时请先 copy()
+    """
+
+    def __init__(self, source, cache_size=DEFAULT_CACHE_SIZE):
+        """source 为涨停记录文件路径、涨停记录 DataFrame 或 LimitUpIndex"""
+        if isinstance(source, LimitUpIndex):
+            self.index = source
+        else:
+            records = load_records(source) if isinstance(source, (str, os.PathLike)) else source
+            self.index = LimitUpIndex(records)
+        self._cached = lru_cache(maxsize=cache_size)(self._execute)
+
+    def _execute(self, kind, *args):
+        index = self.index
+        if kind == 'range':
+            start, end, code = args
+            positions = index.date_positions(start, end) if code is None else index.code_positions(code, start, end)
+            return index.select(positions)
+        if kind == 'dates':
+            return index.date_counts(*args)
+        if kind == 'top':
+            return index.top_stocks(*args)
+        raise ValueError(f"未知的查询类型: {kind}")
+
+    def on_date(self, date):
+        """某一天的全部涨停记录"""
+        day = _normalize_date(date)
+        return self._cached('range', day, day, None)
+
+    def date_range(self, start=None, end=None, code=None):
+        """日期区间内的涨停记录，可限定股票代码"""
+        code = None if code in (None, '') else _normalize_code(code)
+        return self._cached('range', _normalize_date(start), _normalize_date(end), code)
+
+    def stock_history(self, code, start=None, end=None):
+        """单只股票的涨停历史（按日期升序）"""
+        return self.date_range(start, end, code)
+
+    def date_counts(self, start=None, end=None):
+        """日期区间内每天的涨停股票数"""
+        return self._cached('dates', _normalize_date(start), _normalize_date(end))
+
+    def top_stocks(self, n=10, by='count', start=None, end=None):
+        """日期区间内按涨停次数（count）或最高连板数（streak）排名前 n 的股票"""
+        if by not in TOP_ORDERS:
+            raise ValueError(f"不支持的排序方式: {by}")
+        return self._cached('top', max(int(n), 0), by, _normalize_date(start), _normalize_date(end))
+
+    def stats(self):
+        info = self._cached.cache_info()
+        return {'records': len(self.index), 'stocks': int(len(np.unique(self.index.codes))),
+                'first_date': str(decode_dates(self.index.dates[:1])[0]) if len(self.index) else None,
+                'last_date': str(decode_dates(self.index.dates[-1:])[0]) if len(self.index) else None,
+                'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}}
+
+
+def _frame_json(frame):
+    return json.loads(frame.to_json(orient='records', force_ascii=False))
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """HTTP 接口（只读，GET）
+
+    /limit-ups?date=&start=&end=&code=    涨停记录
+    /stocks/<代码>?start=&end=             单只股票涨停历史
+    /top?n=&by=count|streak&start=&end=    涨停次数 / 连板排行
+    /dates?start=&end=                      每日涨停股票数
+    /stats                                  数据集和缓存统计
+    """
+
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if parts == ['limit-ups']:
+                if 'date' in params:
+                    body = _frame_json(self.service.on_date(params['date']))
+                else:
+                    body = _frame_json(self.service.date_range(params.get('start'), params.get('end'),
+                                                               params.get('code')))
+            elif len(parts) == 2 and parts[0] == 'stocks':
+                body = _frame_json(self.service.stock_history(parts[1], params.get('start'), params.get('end')))
+            elif parts == ['top']:
+                body = _frame_json(self.service.top_stocks(params.get('n', 10), params.get('by', 'count'),
+                                                           params.get('start'), params.get('end')))
+            elif parts == ['dates']:
+                body = _frame_json(self.service.date_counts(params.get('start'), params.get('end')))
+            elif parts == ['stats']:
+                body = self.service.stats()
+            else:
+                self._send(404, {'error': f"未知的路径: {url.path}"})
+                return
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(200, body)
+
+    def _send(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def create_server(service, host='127.0.0.1', port=DEFAULT_PORT):
+    """创建 HTTP 服务（port 为 0 时自动分配端口），调用方负责 serve_forever / shutdown"""
+    handler = type('BoundQueryRequestHandler', (QueryRequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve_in_background(service, host='127.0.0.1', port=0):
+    """在后台线程中启动 HTTP 服务，返回 (server, thread)"""
+    server = create_server(service, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="涨停记录查询（按日期、股票代码索引，可启动本地 HTTP 服务）")
+    parser.add_argument("path", help="涨停记录文件：xlsx / parquet / feather / csv 报表或增量模式状态文件（.json）")
+    parser.add_argument("--date", default=None, help="查询某一天的涨停记录")
+    parser.add_argument("--start", default=None, help="起始日期")
+    parser.add_argument("--end", default=None, help="结束日期")
+    parser.add_argument("--code", default=None, help="查询单只股票的涨停历史")
+    parser.add_argument("--top", type=int, default=None, help="输出涨停次数 / 连板排行前 N 名")
+    parser.add_argument("--by", choices=list(TOP_ORDERS), default="count", help="排行依据（默认 count）")
+    parser.add_argument("--serve", action="store_true", help="启动本地 HTTP/JSON 服务")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP 服务监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"HTTP 服务端口（默认{DEFAULT_PORT}）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    service = LimitUpQueryService(args.path)
+    stats = service.stats()
+    logger.info(f"已加载 {stats['records']} 条涨停记录（{stats['stocks']} 只股票，"
+                f"{stats['first_date']} 至 {stats['last_date']}）")
+
+    if args.serve:
+        server = create_server(service, args.host, args.port)
+        logger.info(f"查询服务已启动: http://{args.host}:{server.server_address[1]}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("查询服务已停止")
+        finally:
+            server.server_close()
+        return
+
+    if args.top is not None:
+        result = service.top_stocks(args.top, args.by, args.start, args.end)
+    elif args.date:
+        result = service.on_date(args.date)
+    elif args.code:
+        result = service.stock_history(args.code, args.start, args.end)
+    else:
+        result = service.date_counts(args.start, args.end)
+    print(result.to_string(index=False) if not result.empty else "没有符合条件的涨停记录")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求限流工具
+提供全局共享的令牌桶限流器，用于控制对数据源的请求速率
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """线程安全的令牌桶限流器
+
+    rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发请求数）。
+    rate 为 None 或不大于 0 时不做限流。
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate if rate and rate > 0 else None
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """获取令牌，令牌不足时阻塞等待，返回实际等待的秒数"""
+        if self.rate is None:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # 先预占令牌再在锁外等待，多个线程按到达顺序依次排队
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
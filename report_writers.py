@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果输出
+逐批写入涨停记录（openpyxl 只写模式工作簿或分块 CSV），统计汇总使用累加器增量计算，
+内存占用不随记录数增长；以及一次性写出完整报表（Excel 或 Parquet / Feather / CSV 列式文件）
+"""
+
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from limit_up_engine import RECORD_COLUMNS, frame_to_records
+from streak_analytics import StreakAccumulator
+
+EMPTY_HINT = "在指定的时间范围内未找到涨停记录"
+
+
+class SummaryAccumulator:
+    """涨停记录统计累加器
+
+    只保存每只股票、每个日期的聚合值以及连板统计，结果与 create_summary_data 的汇总表一致。
+    track_streaks 为 False 时不累加连板统计（由调用方自行生成连板表）
+    """
+
+    def __init__(self, track_streaks=True):
+        self.total_records = 0
+        self.pct_sum = 0.0
+        self.pct_max = None
+        # 股票代码 -> [股票名称, 涨停次数, 最大涨幅, 涨幅合计, 最小涨幅, 总成交量]
+        self.stock_stats = {}
+        # 涨停日期 -> 涨停股票数
+        self.date_counts = {}
+        self.streaks = StreakAccumulator() if track_streaks else None
+
+    def update(self, records):
+        """累加一批涨停记录"""
+        if records is None or records.empty:
+            return
+
+        pct = records['涨跌幅(%)'].to_numpy(dtype=np.float64)
+        self.total_records += len(records)
+        self.pct_sum += float(pct.sum())
+        batch_max = float(pct.max())
+        self.pct_max = batch_max if self.pct_max is None else max(self.pct_max, batch_max)
+
+        grouped = records.groupby(['股票代码', '股票名称'], sort=False).agg(
+            count=('涨跌幅(%)', 'size'), max=('涨跌幅(%)', 'max'), sum=('涨跌幅(%)', 'sum'),
+            min=('涨跌幅(%)', 'min'), volume=('成交量', 'sum'))
+        for (stock_code, stock_name), row in zip(grouped.index, grouped.itertuples(index=False)):
+            stats = self.stock_stats.get(stock_code)
+            if stats is None:
+                self.stock_stats[stock_code] = [stock_name, row.count, row.max, row.sum, row.min, row.volume]
+            else:
+                stats[1] += row.count
+                stats[2] = max(stats[2], row.max)
+                stats[3] += row.sum
+                stats[4] = min(stats[4], row.min)
+                stats[5] += row.volume
+
+        for date_value, count in records['涨停日期'].value_counts(sort=False).items():
+            self.date_counts[date_value] = self.date_counts.get(date_value, 0) + int(count)
+
+        if self.streaks is not None:
+            self.streaks.update(frame_to_records(records))
+
+    @property
+    def stock_count(self):
+        return len(self.stock_stats)
+
+    @property
+    def pct_mean(self):
+        return self.pct_sum / self.total_records if self.total_records else None
+
+    def to_sheets(self):
+        """生成统计汇总表，格式与 create_summary_data 相同"""
+        if not self.total_records:
+            return {}
+
+        summary_df = pd.DataFrame([
+            {'统计类型': '总体统计', '统计项': '总涨停记录数', '数值': self.total_records},
+            {'统计类型': '总体统计', '统计项': '涉及股票数量', '数值': self.stock_count},
+            {'统计类型': '总体统计', '统计项': '平均涨幅(%)', '数值': round(self.pct_mean, 2)},
+            {'统计类型': '总体统计', '统计项': '最大涨幅(%)', '数值': round(self.pct_max, 2)},
+        ])
+
+        stock_stats = pd.DataFrame(
+            [(code, name, count, max_pct, total / count, min_pct, volume)
+             for code, (name, count, max_pct, total, min_pct, volume) in self.stock_stats.items()],
+            columns=['股票代码', '股票名称', '涨停次数', '最大涨幅(%)', '平均涨幅(%)', '最小涨幅(%)', '总成交量'],
+        ).round(2)
+        stock_stats = stock_stats.sort_values(['涨停次数', '股票代码'], ascending=[False, True])
+
+        date_stats = pd.DataFrame(list(self.date_counts.items()), columns=['涨停日期', '涨停股票数'])
+        date_stats = date_stats.sort_values('涨停日期', ascending=False)
+
+        return {
+            '统计汇总': summary_df,
+            '按股票统计': stock_stats,
+            '按日期统计': date_stats,
+            **(self.streaks.to_sheets() if self.streaks is not None else {}),
+        }
+
+
+def _rows(frame):
+    """DataFrame 逐行转换为可写入的元组，缺失值写为空单元格"""
+    for values in frame.itertuples(index=False, name=None):
+        yield tuple(None if isinstance(v, float) and v != v else v for v in values)
+
+
+def _header_width(column):
+    # 只写模式下无法事后遍历单元格，按表头长度估算列宽（最小12，最大30）
+    return min(max(len(str(column)) + 2, 12), 30)
+
+
+class ExcelStreamWriter:
+    """基于 openpyxl 只写模式的流式 Excel 输出"""
+
+    data_sheet_name = '涨停股票数据'
+
+    def __init__(self, path, columns=None):
+        # openpyxl 只在导出 Excel 时才需要，延迟导入
+        from openpyxl import Workbook
+
+        self.path = path
+        self.columns = list(columns or RECORD_COLUMNS)
+        self.rows_written = 0
+        self._workbook = Workbook(write_only=True)
+        self._data_sheet = None
+
+    def _add_sheet(self, title, columns):
+        from openpyxl.utils import get_column_letter
+
+        sheet = self._workbook.create_sheet(title)
+        for position, column in enumerate(columns, 1):
+            sheet.column_dimensions[get_column_letter(position)].width = _header_width(column)
+        sheet.append(list(columns))
+        return sheet
+
+    def write(self, records):
+        """追加一批涨停记录"""
+        if records is None or records.empty:
+            return
+        if self._data_sheet is None:
+            self._data_sheet = self._add_sheet(self.data_sheet_name, self.columns)
+        for row in _rows(records.reindex(columns=self.columns)):
+            self._data_sheet.append(row)
+        self.rows_written += len(records)
+
+    def close(self, summary_sheets=None):
+        """写入汇总表并保存文件"""
+        if self._data_sheet is None:
+            placeholder = self._add_sheet('统计汇总', ['提示'])
+            placeholder.append([EMPTY_HINT])
+        for sheet_name, sheet_df in (summary_sheets or {}).items():
+            if sheet_df is None or sheet_df.empty:
+                continue
+            sheet = self._add_sheet(sheet_name, sheet_df.columns)
+            for row in _rows(sheet_df):
+                sheet.append(row)
+        self._workbook.save(self.path)
+        return self.path
+
+
+class CsvStreamWriter:
+    """分块追加写入的 CSV 输出，汇总表写为同目录下的独立 CSV 文件"""
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.columns = list(columns or RECORD_COLUMNS)
+        self.rows_written = 0
+        # utf-8-sig 便于 Excel 直接打开中文表头
+        pd.DataFrame(columns=self.columns).to_csv(path, index=False, encoding='utf-8-sig')
+
+    def write(self, records):
+        """追加一批涨停记录"""
+        if records is None or records.empty:
+            return
+        records.reindex(columns=self.columns).to_csv(self.path, mode='a', header=False, index=False)
+        self.rows_written += len(records)
+
+    def close(self, summary_sheets=None):
+        """写入汇总表文件"""
+        stem, _ = os.path.splitext(self.path)
+        for sheet_name, sheet_df in (summary_sheets or {}).items():
+            if sheet_df is None or sheet_df.empty:
+                continue
+            sheet_df.to_csv(f"{stem}_{sheet_name}.csv", index=False, encoding='utf-8-sig')
+        return self.path
+
+
+# 估算列宽时最多检查的行数
+WIDTH_SAMPLE_ROWS = 2000
+MIN_COLUMN_WIDTH, MAX_COLUMN_WIDTH = 10, 30
+EXCEL_ENGINES = ('openpyxl', 'xlsxwriter')
+COLUMNAR_FORMATS = ('parquet', 'feather', 'csv')
+REPORT_FORMATS = ('xlsx',) + COLUMNAR_FORMATS
+
+
+def estimate_column_widths(frame, sample_rows=WIDTH_SAMPLE_ROWS):
+    """估算每列的 Excel 列宽（最小10，最大30）
+
+    不再把整列转换为字符串：等间隔抽取至多 sample_rows 行计算字符串长度，
+    数值列另外计入最大值和最小值（位数最多的值）
+    """
+    step = max(len(frame) // sample_rows, 1)
+    widths = []
+    for position, column in enumerate(frame.columns):
+        series = frame.iloc[:, position]
+        length = len(str(column))
+        if len(series):
+            length = max(length, int(series.iloc[::step].astype(str).str.len().max()))
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                values = series.dropna()
+                if len(values):
+                    length = max(length, len(str(values.max())), len(str(values.min())))
+        widths.append(min(max(length + 2, MIN_COLUMN_WIDTH), MAX_COLUMN_WIDTH))
+    return widths
+
+
+def excel_engine(engine='auto'):
+    """选择 xlsx 写出引擎：auto 在安装了 xlsxwriter 时使用它（写出速度快于 openpyxl），否则使用 openpyxl"""
+    if engine == 'auto':
+        return 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') is not None else 'openpyxl'
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"不支持的 Excel 引擎: {engine}")
+    return engine
+
+
+def _set_column_widths(writer, sheet_name, frame):
+    worksheet = writer.sheets[sheet_name]
+    widths = estimate_column_widths(frame)
+    if writer.engine == 'xlsxwriter':
+        for position, width in enumerate(widths):
+            worksheet.set_column(position, position, width)
+        return
+    from openpyxl.utils import get_column_letter
+
+    for position, width in enumerate(widths, 1):
+        worksheet.column_dimensions[get_column_letter(position)].width = width
+
+
+def write_excel_report(path, data, sheets=None, engine='auto'):
+    """把涨停记录和汇总表写入一个 Excel 工作簿，没有记录时写入提示信息"""
+    engine = excel_engine(engine)
+    if data is None or data.empty:
+        data_sheets = {'统计汇总': pd.DataFrame([{'提示': EMPTY_HINT}])}
+    else:
+        data_sheets = {ExcelStreamWriter.data_sheet_name: data, **(sheets or {})}
+    with pd.ExcelWriter(path, engine=engine) as writer:
+        for sheet_name, sheet_df in data_sheets.items():
+            if sheet_df is None or sheet_df.empty:
+                continue
+            sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+            _set_column_widths(writer, sheet_name, sheet_df)
+    return path
+
+
+def _columnar_frame(frame):
+    """列式格式要求每列类型一致：日期列统一为 datetime，数值与其他类型混合的对象列分别转为数值或字符串"""
+    frame = frame.reset_index(drop=True)
+    for column in frame.columns:
+        series = frame[column]
+        if str(column).endswith('日期'):
+            frame[column] = pd.to_datetime(series)
+            continue
+        if series.dtype != object:
+            continue
+        values = series.dropna()
+        if values.map(lambda value: isinstance(value, (int, float, np.number))).all():
+            frame[column] = pd.to_numeric(series)
+        elif values.map(type).nunique() > 1:
+            frame[column] = series.astype(str)
+    return frame
+
+
+def _write_columnar(frame, path, output_format):
+    if output_format == 'parquet':
+        frame.to_parquet(path, index=False)
+    elif output_format == 'feather':
+        frame.to_feather(path)
+    else:
+        frame.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def write_columnar_report(path, data, sheets=None, output_format='parquet'):
+    """写出列式报表：涨停记录写入 path，每张汇总表写为同目录下的 <文件名>_<表名>.<扩展名>
+
+    Parquet 和 Feather 需要 pyarrow，返回写出的全部文件路径
+    """
+    if output_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    data = data if data is not None and not data.empty else pd.DataFrame(columns=RECORD_COLUMNS)
+    stem, extension = os.path.splitext(path)
+    paths = [path]
+    _write_columnar(_columnar_frame(data), path, output_format)
+    for sheet_name, sheet_df in (sheets or {}).items():
+        if sheet_df is None or sheet_df.empty:
+            continue
+        sheet_path = f"{stem}_{sheet_name}{extension}"
+        _write_columnar(_columnar_frame(sheet_df), sheet_path, output_format)
+        paths.append(sheet_path)
+    return paths
+
+
+STREAM_WRITERS = {
+    'xlsx': ExcelStreamWriter,
+    'csv': CsvStreamWriter,
+}
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游请求执行层
+为数据源请求提供带抖动的指数退避重试、熔断器，以及按 AIMD（加性增、乘性减）
+自适应调整的并发上限，在上游开始拒绝请求时自动降速
+"""
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """指数退避重试策略（full jitter）
+
+    第 n 次重试前等待 [0, min(max_delay, base_delay * 2**n)] 之间的随机时长
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=10.0):
+        self.max_retries = max(int(max_retries), 0)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, retry_index):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_index)))
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到 failure_threshold 次后打开，reset_timeout 秒内所有请求暂停等待；
+    冷却结束后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=10, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._cond = threading.Condition()
+
+    def wait_until_allowed(self):
+        """阻塞直到允许发出请求"""
+        with self._cond:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                if self.state == self.OPEN:
+                    remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    self.state = self.HALF_OPEN
+                if not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    return
+                self._cond.wait()
+
+    def record_success(self):
+        with self._cond:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != self.CLOSED:
+                logger.info("熔断器恢复关闭，继续正常请求")
+                self.state = self.CLOSED
+                self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(f"连续请求失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self._cond.notify_all()
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发上限
+
+    请求持续成功时每完成约 limit 个请求把上限加一；出现失败或延迟突增
+    （超过平滑延迟的 latency_spike_factor 倍）时上限减半。
+    每轮减半后需完成 limit 个请求才会再次减半，避免同一波失败把上限一降到底
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=16, latency_spike_factor=3.0):
+        self.min_limit = max(int(min_limit), 1)
+        self.max_limit = max(int(max_limit), self.min_limit)
+        self.limit = min(max(int(initial_limit), self.min_limit), self.max_limit)
+        self.latency_spike_factor = latency_spike_factor
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self._successes = 0
+        self._completions_since_decrease = self.limit
+        self._latency_ewma = None
+        self._samples = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, success, latency=None):
+        with self._cond:
+            self.in_flight -= 1
+            self._completions_since_decrease += 1
+            spike = False
+            if success and latency is not None:
+                if self._samples >= 5 and latency > self._latency_ewma * self.latency_spike_factor:
+                    spike = True
+                else:
+                    self._latency_ewma = latency if self._latency_ewma is None else \
+                        0.9 * self._latency_ewma + 0.1 * latency
+                    self._samples += 1
+
+            if success and not spike:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+                    self.peak_limit = max(self.peak_limit, self.limit)
+            elif self._completions_since_decrease >= self.limit:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._successes = 0
+                self._completions_since_decrease = 0
+            self._cond.notify_all()
+
+
+class RequestExecutor:
+    """上游请求执行器：依次经过熔断器、并发上限和令牌桶限流后发出请求，失败按策略重试"""
+
+    def __init__(self, retry_policy=None, circuit_breaker=None, concurrency_limiter=None, rate_limiter=None,
+                 metrics=None):
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.concurrency_limiter = concurrency_limiter
+        self.rate_limiter = rate_limiter
+        # 可选的 metrics.Metrics，按函数名记录每次请求的延迟和失败
+        self.metrics = metrics
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def call(self, func, *args, **kwargs):
+        """执行请求，重试耗尽后抛出最后一次的异常"""
+        for attempt in range(self.retry_policy.max_retries + 1):
+            self.circuit_breaker.wait_until_allowed()
+            if self.concurrency_limiter is not None:
+                self.concurrency_limiter.acquire()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            self._count('requests')
+            start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                if self.metrics is not None:
+                    self.metrics.observe_request(func.__name__, time.monotonic() - start, success=False)
+                if self.concurrency_limiter is not None:
+                    self.concurrency_limiter.release(False)
+                self.circuit_breaker.record_failure()
+                if attempt >= self.retry_policy.max_retries:
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(self.retry_policy.backoff(attempt))
+                continue
+
+            latency = time.monotonic() - start
+            if self.metrics is not None:
+                self.metrics.observe_request(func.__name__, latency)
+            if self.concurrency_limiter is not None:
+                self.concurrency_limiter.release(True, latency)
+            self.circuit_breaker.record_success()
+            return result
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动窗口增量更新
+保存上一次运行识别出的涨停记录和每只股票的识别状态（最后收盘价、连板数），
+每日收盘后只处理新增的交易日：追加新的涨停记录，淘汰移出窗口的日期，
+并就地更新按股票、按日期的统计
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from limit_up_engine import CARRY_COLUMNS, RECORD_COLUMNS, frame_to_records
+from report_writers import SummaryAccumulator
+from streak_analytics import create_streak_sheets
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+class RollingSummary(SummaryAccumulator):
+    """可淘汰旧记录的统计累加器
+
+    保存窗口内的全部涨停记录（数量很小），淘汰时只重新计算受影响股票的统计，
+    删除移出窗口的日期；连板表在输出时由窗口内的记录生成
+    """
+
+    def __init__(self):
+        super().__init__(track_streaks=False)
+        self.records = pd.DataFrame(columns=RECORD_COLUMNS)
+
+    def update(self, records):
+        if records is None or records.empty:
+            return
+        super().update(records)
+        frames = [frame for frame in (self.records, records) if not frame.empty]
+        self.records = pd.concat(frames, ignore_index=True)
+
+    def evict_before(self, start_date):
+        """淘汰涨停日期早于 start_date 的记录，返回淘汰的记录数"""
+        if self.records.empty:
+            return 0
+        dates = self.records['涨停日期'].astype(str).str[:10]
+        evicted = (dates < str(start_date)[:10]).to_numpy()
+        if not evicted.any():
+            return 0
+
+        old = self.records[evicted]
+        self.records = self.records[~evicted].reset_index(drop=True)
+        for date_value in old['涨停日期'].unique():
+            self.date_counts.pop(date_value, None)
+
+        # 只重新计算涉及淘汰记录的股票
+        affected = set(old['股票代码'])
+        for stock_code in affected:
+            self.stock_stats.pop(stock_code, None)
+        remaining = self.records[self.records['股票代码'].isin(affected)]
+        if not remaining.empty:
+            grouped = remaining.groupby(['股票代码', '股票名称'], sort=False).agg(
+                count=('涨跌幅(%)', 'size'), max=('涨跌幅(%)', 'max'), sum=('涨跌幅(%)', 'sum'),
+                min=('涨跌幅(%)', 'min'), volume=('成交量', 'sum'))
+            for (stock_code, stock_name), row in zip(grouped.index, grouped.itertuples(index=False)):
+                self.stock_stats[stock_code] = [stock_name, row.count, row.max, row.sum, row.min, row.volume]
+
+        pct = self.records['涨跌幅(%)'].to_numpy(dtype=np.float64)
+        self.total_records = len(pct)
+        self.pct_sum = float(pct.sum())
+        self.pct_max = float(pct.max()) if len(pct) else None
+        return len(old)
+
+    def to_sheets(self):
+        sheets = super().to_sheets()
+        if sheets:
+            sheets.update(create_streak_sheets(frame_to_records(self.records)))
+        return sheets
+
+
+class RollingWindowState:
+    """滚动窗口状态文件（JSON）
+
+    保存窗口参数、已处理到的日期、窗口内的涨停记录和每只股票的识别状态，
+    写入时先写临时文件再替换，中断不会留下损坏的状态
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """读取状态，返回 (参数字典, RollingSummary, 识别状态表)，文件不存在或版本不符时返回 None"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != STATE_VERSION:
+            logger.warning("滚动窗口状态文件版本不一致，将重新构建")
+            return None
+
+        summary = RollingSummary()
+        summary.update(pd.DataFrame(state['records'], columns=RECORD_COLUMNS))
+        carry = pd.DataFrame(state['carry'], columns=['code'] + CARRY_COLUMNS)
+        carry = carry.astype({'code': np.int32, 'date': np.int32, 'close': np.float64,
+                              'boards': np.int16, 'prev_limit_up': bool}).set_index('code')
+        return state['params'], summary, carry
+
+    def save(self, params, summary, carry):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        records = summary.records.assign(
+            涨停日期=summary.records['涨停日期'].map(lambda value: str(value)[:10]))
+        carry_rows = carry.reset_index()
+        state = {
+            'version': STATE_VERSION,
+            'params': params,
+            'records': json.loads(records.to_json(orient='records', force_ascii=False)),
+            'carry': {column: carry_rows[column].tolist() for column in ['code'] + CARRY_COLUMNS},
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
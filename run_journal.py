@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行日志（断点续跑）
+以 JSON Lines 格式逐只股票记录已完成的股票代码及其涨停记录，
+运行中断后可从日志恢复，只处理剩余股票
+"""
+
+import json
+import logging
+import os
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """爬取运行日志
+
+    第一行为运行参数（日期范围、涨停阈值、复权方式、数据源），之后每行对应一只已完成的股票。
+    每写一行都会刷盘，进程被杀死时最多丢失正在写入的一行
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """读取已有日志，返回 (运行参数, {股票代码: 涨停记录DataFrame})，日志不存在时返回 None"""
+        if not os.path.exists(self.path):
+            return None
+
+        header = None
+        completed = {}
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下不完整的最后一行
+                    logger.warning("运行日志中存在不完整的记录，已忽略")
+                    continue
+                if entry.get('type') == 'header':
+                    header = entry
+                elif entry.get('type') == 'stock' and header is not None:
+                    completed[entry['code']] = pd.DataFrame(entry['records'])
+        if header is None:
+            return None
+        return header, completed
+
+    def start(self, params):
+        """开始新的运行（覆盖旧日志），params 为写入首行的运行参数字典"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'type': 'header', **params})
+
+    def resume(self):
+        """以追加方式继续写入已有日志"""
+        self.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, stock_code, records):
+        """记录一只股票已完成及其涨停记录"""
+        if records is None or records.empty:
+            rows = []
+        else:
+            records = records.assign(涨停日期=records['涨停日期'].map(lambda value: str(value)[:10]))
+            rows = json.loads(records.to_json(orient='records', force_ascii=False))
+        self._write({'type': 'stock', 'code': stock_code, 'records': rows})
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连板分析
+基于涨停识别阶段游程编码得到的连板数，统计每日连板天梯和窗口内最长的连板序列。
+输入为紧凑格式的涨停记录（见 limit_up_engine.frame_to_records），全部使用数组运算
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import decode_codes, decode_dates
+
+# 天梯统计的板数档位：首板、2板 ... 6板、7板及以上
+LADDER_LEVELS = 7
+LADDER_COLUMNS = ['首板'] + [f'{level}板' for level in range(2, LADDER_LEVELS)] + [f'{LADDER_LEVELS}板及以上']
+DEFAULT_TOP_N = 50
+
+
+def _ladder_arrays(records):
+    """返回 (日期数组, 各档位计数矩阵, 最高连板, 断板回封数)"""
+    dates, date_idx = np.unique(records['date'].to_numpy(), return_inverse=True)
+    boards = records['boards'].to_numpy().astype(np.int64)
+    level = np.minimum(boards, LADDER_LEVELS) - 1
+    counts = np.bincount(date_idx * LADDER_LEVELS + level,
+                         minlength=len(dates) * LADDER_LEVELS).reshape(len(dates), LADDER_LEVELS)
+    max_boards = np.zeros(len(dates), dtype=np.int64)
+    np.maximum.at(max_boards, date_idx, boards)
+    reseals = np.bincount(date_idx, weights=records['reseal'].to_numpy(), minlength=len(dates)).astype(np.int64)
+    return dates, counts, max_boards, reseals
+
+
+def _ladder_frame(dates, counts, max_boards, reseals):
+    ladder = pd.DataFrame(counts, columns=LADDER_COLUMNS)
+    ladder.insert(0, '涨停日期', decode_dates(dates))
+    ladder.insert(1, '涨停总数', counts.sum(axis=1))
+    ladder['连板总数'] = counts[:, 1:].sum(axis=1)
+    ladder['最高连板'] = max_boards
+    ladder['断板回封'] = reseals
+    return ladder.sort_values('涨停日期', ascending=False).reset_index(drop=True)
+
+
+def streak_ladder(records):
+    """每日连板天梯：各板数档位的涨停股票数、最高连板和断板回封数"""
+    if records is None or records.empty or 'boards' not in records.columns:
+        return pd.DataFrame()
+    return _ladder_frame(*_ladder_arrays(records))
+
+
+def _streak_runs(records):
+    """把涨停记录还原为连板序列，返回 (股票代码, 股票名称, 连板天数, 开始日期, 结束日期) 数组"""
+    codes = records['code'].to_numpy()
+    dates = records['date'].to_numpy()
+    order = np.lexsort((dates, codes))
+    codes, dates = codes[order], dates[order]
+    boards = records['boards'].to_numpy()[order].astype(np.int64)
+
+    # 下一条记录属于同一只股票且连板数加一时，当前记录不是序列的结尾
+    continues = (codes[1:] == codes[:-1]) & (boards[1:] == boards[:-1] + 1)
+    run_end = np.ones(len(codes), dtype=bool)
+    run_end[:-1] = ~continues
+    run_first = np.ones(len(codes), dtype=bool)
+    run_first[1:] = ~continues
+    ends = np.flatnonzero(run_end)
+    # 增量识别延续的连板序列可能开始于窗口之前，开始日期取窗口内的第一条记录
+    starts = np.flatnonzero(run_first)
+    # 只展开序列结尾记录的名称
+    names = np.asarray(records['name'].iloc[order[ends]], dtype=object)
+    return codes[ends], names, boards[ends], dates[starts], dates[ends]
+
+
+def _streak_frame(codes, names, lengths, start_dates, end_dates, top_n):
+    keep = lengths >= 2
+    codes, names, lengths = codes[keep], names[keep], lengths[keep]
+    start_dates, end_dates = start_dates[keep], end_dates[keep]
+    # 连板天数降序，同样天数时结束日期较近的在前
+    order = np.lexsort((-end_dates.astype(np.int64), -lengths))[:top_n]
+    return pd.DataFrame({
+        '股票代码': decode_codes(codes[order]),
+        '股票名称': names[order],
+        '连板天数': lengths[order],
+        '开始日期': decode_dates(start_dates[order]),
+        '结束日期': decode_dates(end_dates[order]),
+    })
+
+
+def longest_streaks(records, top_n=DEFAULT_TOP_N):
+    """窗口内最长的连板序列（只统计 2 连板及以上），按连板天数降序取前 top_n 个"""
+    if records is None or records.empty or 'boards' not in records.columns:
+        return pd.DataFrame()
+    return _streak_frame(*_streak_runs(records), top_n)
+
+
+class StreakAccumulator:
+    """连板统计累加器（流式模式使用）
+
+    每批记录需包含对应股票的全部涨停记录（按股票逐批产出时自然满足），
+    只保留每日天梯计数和当前最长的 top_n 个连板序列
+    """
+
+    def __init__(self, top_n=DEFAULT_TOP_N):
+        self.top_n = top_n
+        # 日期 -> [各档位计数, 最高连板, 断板回封数]
+        self.ladder = {}
+        self._runs = None
+
+    def update(self, records):
+        if records is None or records.empty or 'boards' not in records.columns:
+            return
+        for date_value, counts, max_boards, reseals in zip(*_ladder_arrays(records)):
+            entry = self.ladder.get(date_value)
+            if entry is None:
+                self.ladder[date_value] = [counts.copy(), int(max_boards), int(reseals)]
+            else:
+                entry[0] += counts
+                entry[1] = max(entry[1], int(max_boards))
+                entry[2] += int(reseals)
+
+        runs = _streak_runs(records)
+        if self._runs is not None:
+            runs = tuple(np.concatenate([old, new]) for old, new in zip(self._runs, runs))
+        # 只保留可能进入前 top_n 的序列
+        keep = np.lexsort((-runs[4].astype(np.int64), -runs[2]))[:self.top_n]
+        self._runs = tuple(values[keep] for values in runs)
+
+    def to_sheets(self):
+        if not self.ladder:
+            return {}
+        dates = np.array(list(self.ladder), dtype=np.int32)
+        counts = np.array([entry[0] for entry in self.ladder.values()])
+        max_boards = np.array([entry[1] for entry in self.ladder.values()])
+        reseals = np.array([entry[2] for entry in self.ladder.values()])
+        return {
+            '连板天梯': _ladder_frame(dates, counts, max_boards, reseals),
+            '最长连板': _streak_frame(*self._runs, self.top_n),
+        }
+
+
+def create_streak_sheets(records, top_n=DEFAULT_TOP_N):
+    """生成连板天梯和最长连板两张汇总表"""
+    return {
+        '连板天梯': streak_ladder(records),
+        '最长连板': longest_streaks(records, top_n),
+    }
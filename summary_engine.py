@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统计汇总引擎
+对涨停记录的股票代码和日期各做一次哈希编码（factorize），只转换去重后的取值，
+再用 bincount 和 ufunc.at 在一次遍历中得到按股票、按日期和总体的全部统计量。
+结果对象缓存生成的汇总表，打印统计信息和写出各工作表共用同一份结果
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import decode_codes, decode_dates, encode_dates
+from streak_analytics import create_streak_sheets
+
+STOCK_STATS_COLUMNS = ['股票代码', '股票名称', '涨停次数', '最大涨幅(%)', '平均涨幅(%)', '最小涨幅(%)', '总成交量']
+
+
+def factorize_records(data):
+    """输出用的中文字段涨停记录表转换为紧凑格式，返回 (紧凑记录, 股票编号, 日期编号)
+
+    股票代码和日期先哈希编码，只对去重后的取值做整数转换和日期解析，
+    结果与 limit_up_engine.frame_to_records 相同
+    """
+    code_index, code_values = pd.factorize(data['股票代码'])
+    date_index, date_values = pd.factorize(data['涨停日期'])
+    codes = np.asarray(code_values).astype(np.int64).astype(np.int32)
+    dates = encode_dates(np.asarray(date_values))
+    records = pd.DataFrame({
+        'code': codes[code_index],
+        'name': pd.Categorical(data['股票名称']),
+        'date': dates[date_index],
+        'pct_change': data['涨跌幅(%)'].to_numpy(dtype=np.float64),
+        'volume': data['成交量'].to_numpy(dtype=np.float64).astype(np.int64),
+    })
+    if '连板数' in data.columns:
+        records['boards'] = data['连板数'].to_numpy(dtype=np.int16)
+        records['reseal'] = (data['板型'] == '断板回封').to_numpy() if '板型' in data.columns \
+            else np.zeros(len(data), dtype=bool)
+    return records, (code_index, codes), (date_index, dates)
+
+
+class LimitUpSummary:
+    """一份涨停记录的全部统计结果
+
+    总体统计属性与 SummaryAccumulator 相同（total_records、stock_count、pct_mean、pct_max），
+    to_sheets() 生成与 create_summary_data 相同的汇总表，首次调用后缓存
+    """
+
+    def __init__(self, data):
+        self._sheets = None
+        self.records, (code_index, codes), (date_index, dates) = factorize_records(data)
+        pct = self.records['pct_change'].to_numpy()
+        volume = self.records['volume'].to_numpy()
+        n_stocks, n_records = len(codes), len(pct)
+
+        # 按股票统计：次数、涨幅合计、成交量合计用 bincount，最大 / 最小涨幅和首条记录位置用 ufunc.at
+        counts = np.bincount(code_index, minlength=n_stocks)
+        pct_sum = np.bincount(code_index, weights=pct, minlength=n_stocks)
+        volume_sum = np.bincount(code_index, weights=volume, minlength=n_stocks)
+        pct_max = np.full(n_stocks, -np.inf)
+        np.maximum.at(pct_max, code_index, pct)
+        pct_min = np.full(n_stocks, np.inf)
+        np.minimum.at(pct_min, code_index, pct)
+        first = np.full(n_stocks, n_records, dtype=np.int64)
+        np.minimum.at(first, code_index, np.arange(n_records))
+        # 只取每只股票首条记录的名称，不展开整列
+        name_column = self.records['name'].array
+        names = np.asarray(name_column.categories, dtype=object)[name_column.codes[first]]
+
+        # 涨停次数降序，相同时按股票代码升序，与流式和增量模式的累加器结果一致
+        order = np.lexsort((codes, -counts))
+        self.stock_stats = pd.DataFrame({
+            '股票代码': decode_codes(codes[order]),
+            '股票名称': names[order],
+            '涨停次数': counts[order],
+            '最大涨幅(%)': pct_max[order],
+            '平均涨幅(%)': pct_sum[order] / counts[order],
+            '最小涨幅(%)': pct_min[order],
+            '总成交量': np.round(volume_sum[order]).astype(np.int64),
+        }, columns=STOCK_STATS_COLUMNS).round(2)
+
+        date_counts = np.bincount(date_index, minlength=len(dates))
+        date_order = np.argsort(-dates.astype(np.int64), kind='stable')
+        self.date_stats = pd.DataFrame({'涨停日期': decode_dates(dates[date_order]),
+                                        '涨停股票数': date_counts[date_order]})
+
+        self.total_records = n_records
+        self.stock_count = n_stocks
+        self.pct_mean = float(pct.sum() / n_records) if n_records else None
+        self.pct_max = float(pct.max()) if n_records else None
+
+    def to_sheets(self):
+        if self._sheets is None:
+            if not self.total_records:
+                self._sheets = {}
+                return self._sheets
+            summary_df = pd.DataFrame([
+                {'统计类型': '总体统计', '统计项': '总涨停记录数', '数值': self.total_records},
+                {'统计类型': '总体统计', '统计项': '涉及股票数量', '数值': self.stock_count},
+                {'统计类型': '总体统计', '统计项': '平均涨幅(%)', '数值': round(self.pct_mean, 2)},
+                {'统计类型': '总体统计', '统计项': '最大涨幅(%)', '数值': round(self.pct_max, 2)},
+            ])
+            self._sheets = {
+                '统计汇总': summary_df,
+                '按股票统计': self.stock_stats,
+                '按日期统计': self.date_stats,
+                # 连板天梯和最长连板
+                **create_streak_sheets(self.records),
+            }
+        return self._sheets
@@ -6,11 +6,40 @@
 
 import sys
 import os
+import subprocess
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from gem_limitup_scraper import GEMLimitUpScraper
+from gem_limitup_scraper import GEMLimitUpScraper, parse_scenario, scenario_name
+from benchmark import run_benchmarks
+from market_scan import MarketScanner
+from distributed import Coordinator, WorkQueue, Worker
+from metrics import Metrics, ProgressReporter
+from query_service import LimitUpQueryService, serve_in_background
+import intraday_watch
+from intraday_watch import LimitUpWatcher, PollingSnapshotSource, ReplaySnapshotSource, Snapshot, watch
+from data_providers import (BAR_COLUMNS, AkshareProvider, DataProvider, HttpBarProvider, ReplayProvider,
+                            SyntheticProvider, kline_secid, record_provider)
+from kline_server import KlineReplayServer
+import bar_store
+from bar_store import last_settled_date
+from bar_schema import decode_codes, decode_dates, encode_dates
+from limit_up_engine import concat_stock_bars, detect_limit_up, detect_limit_up_incremental, listing_date_series
+from limit_rules import classify_limit_bars, is_st_name, limit_up_price
+from rate_limit import TokenBucket
+from report_writers import estimate_column_widths
+from request_executor import AdaptiveConcurrencyLimiter, CircuitBreaker, RequestExecutor, RetryPolicy
+import numpy as np
 import pandas as pd
 import logging
+import tempfile
+import threading
+import json
+import sqlite3
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+import time
 
 # 设置日志级别
 logging.basicConfig(level=logging.INFO)
@@ -121,6 +150,1194 @@ def test_small_batch_scraping():
         print("ℹ️  小批量测试未发现涨停记录")
         return True  # 这不算失败
 
+class _OfflineScraper(GEMLimitUpScraper):
+    """使用本地构造数据的爬虫，用于离线测试"""
+
+    def __init__(self, stock_count=20, **kwargs):
+        kwargs.setdefault('use_cache', False)
+        # 股票列表和日线由下面的方法构造，数据源只提供其余接口（如上市日期），不访问网络
+        kwargs.setdefault('provider', SyntheticProvider())
+        super().__init__(**kwargs)
+        self.stock_count = stock_count
+
+    def get_gem_stock_list(self):
+        codes = [f"300{i:03d}" for i in range(1, self.stock_count + 1)]
+        return pd.DataFrame({'code': codes, 'name': [f"股票{c}" for c in codes]})
+
+    def get_stock_daily_data(self, stock_code, start_date, end_date):
+        seed = int(stock_code)
+        dates = pd.bdate_range(end=end_date, periods=15).strftime('%Y-%m-%d')
+        closes = [10.0 + (seed % 7)]
+        for i in range(1, len(dates)):
+            # 每只股票在不同日期出现一次 20% 涨幅
+            closes.append(round(closes[-1] * (1.2 if i == seed % len(dates) else 1.01), 2))
+        return pd.DataFrame({
+            '日期': dates, '开盘': closes, '收盘': closes, '最高': closes, '最低': closes,
+            '成交量': [1000 + seed] * len(dates), '成交额': [1e6] * len(dates), '换手率': [1.0] * len(dates)
+        })
+
+
+def test_concurrent_scraping_matches_sequential():
+    """测试并发抓取结果与顺序抓取一致"""
+    print("\n=== 测试并发抓取与令牌桶限流 ===")
+    sequential = _OfflineScraper(max_workers=1, requests_per_second=None).scrape_limit_up_stocks(days_back=30)
+    concurrent = _OfflineScraper(max_workers=8, requests_per_second=None).scrape_limit_up_stocks(days_back=30)
+
+    assert not sequential.empty
+    pd.testing.assert_frame_equal(sequential.reset_index(drop=True), concurrent.reset_index(drop=True))
+    print(f"✅ 并发与顺序抓取结果一致，共 {len(concurrent)} 条涨停记录")
+
+    # 流式消费较慢时，已提交未取走的任务不超过 2 × 线程数
+    scraper = _OfflineScraper(stock_count=60, max_workers=4, requests_per_second=None)
+    fetched = []
+    original_fetch = scraper._fetch_stock_bars
+    scraper._fetch_stock_bars = lambda *args: fetched.append(args[2]) or original_fetch(*args)
+    backlog = []
+    for consumed, (code, _, _) in enumerate(scraper.iter_stock_bars(days_back=30), 1):
+        time.sleep(0.002)
+        backlog.append(len(fetched) - consumed)
+    assert consumed == len(fetched) == 60 and max(backlog) <= 8, max(backlog)
+
+    # 令牌桶：容量为 1、每秒 50 个令牌时，11 次请求至少需要约 0.2 秒
+    bucket = TokenBucket(50)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    assert elapsed >= 0.18, elapsed
+    print(f"✅ 令牌桶限流生效，11 次请求耗时 {elapsed:.3f} 秒")
+    return True
+
+def test_bar_store_incremental_fetch():
+    """测试本地日线仓库只下载缺失的日期区间"""
+    print("\n=== 测试本地日线仓库增量抓取 ===")
+
+    class CountingScraper(GEMLimitUpScraper):
+        def __init__(self, **kwargs):
+            super().__init__(requests_per_second=None, **kwargs)
+            self.requests = []
+
+        def _download_daily_data(self, stock_code, start_date, end_date, adjust=None):
+            self.requests.append((start_date, end_date))
+            dates = pd.bdate_range(start_date, end_date)
+            return pd.DataFrame({
+                '日期': dates.date, '开盘': 10.0, '收盘': 10.5, '最高': 11.0, '最低': 9.5,
+                '成交量': 1000.0, '成交额': 1e6, '换手率': 1.5
+            })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper = CountingScraper(cache_path=os.path.join(tmp, 'bars.sqlite'), provider=SyntheticProvider())
+        first = scraper.get_stock_daily_data('300001', '2024-01-01', '2024-01-31')
+        again = scraper.get_stock_daily_data('300001', '2024-01-01', '2024-01-31')
+        extended = scraper.get_stock_daily_data('300001', '2024-01-01', '2024-02-02')
+
+        assert scraper.requests == [('2024-01-01', '2024-01-31'), ('2024-02-01', '2024-02-02')], scraper.requests
+        assert len(first) == len(again) == 23
+        assert len(extended) == 25
+        assert extended['日期'].iloc[-1] == '2024-02-02'
+
+        # 北京时间 15:00 收盘前下载的当天K线不计入覆盖区间，下次运行重新下载
+        cst = timezone(timedelta(hours=8))
+        assert last_settled_date(datetime(2024, 3, 4, 14, 59, tzinfo=cst)) == date(2024, 3, 3)
+        assert last_settled_date(datetime(2024, 3, 4, 15, 0, tzinfo=cst)) == date(2024, 3, 4)
+        assert last_settled_date(datetime(2024, 3, 4, 6, 59, tzinfo=timezone.utc)) == date(2024, 3, 3)
+        store = scraper.bar_store
+        today = date.today().isoformat()
+        intraday = pd.DataFrame({'日期': [today], '开盘': 10.0, '收盘': 10.2, '最高': 10.3, '最低': 9.9,
+                                 '成交量': 100.0, '成交额': 1e3, '换手率': 0.1})
+        original = bar_store.last_settled_date
+        try:
+            bar_store.last_settled_date = lambda: date.today() - timedelta(days=1)
+            store.save_range('300002', intraday, today, today)
+            assert store.missing_ranges('300002', today, today) == [(today, today)]
+            bar_store.last_settled_date = lambda: date.today()
+            store.save_range('300002', intraday, today, today)
+            assert store.missing_ranges('300002', today, today) == []
+            # 刚收盘的工作日上游未返回当天K线时只覆盖到前一天，非工作日直接覆盖到当天
+            yesterday = (date.today() - timedelta(days=1)).isoformat()
+            store.save_range('300004', pd.DataFrame(), yesterday, today)
+            expected = [(today, today)] if np.is_busday(today) else []
+            assert store.missing_ranges('300004', yesterday, today) == expected
+
+            # 周日重复运行：周末没有K线也计入覆盖区间，第二次运行不再请求上游
+            bar_store.last_settled_date = lambda: date(2024, 3, 10)
+            scraper.requests.clear()
+            first = scraper.get_stock_daily_data('300003', '2024-03-01', '2024-03-10')
+            again = scraper.get_stock_daily_data('300003', '2024-03-01', '2024-03-10')
+            weekend = scraper.get_stock_daily_data('300003', '2024-03-09', '2024-03-10')
+            assert scraper.requests == [('2024-03-01', '2024-03-10')], scraper.requests
+            assert len(first) == len(again) == 6 and weekend.empty
+        finally:
+            bar_store.last_settled_date = original
+        print("✅ 重复查询命中本地仓库；收盘前的当天K线不计入覆盖，非交易日重复运行不请求上游")
+    return True
+
+def test_bar_store_adjustment():
+    """测试本地仓库保存不复权数据和复权因子，读取时按复权方式计算"""
+    print("\n=== 测试复权因子与除权除息 ===")
+
+    class ExRightsProvider(DataProvider):
+        # 2024-02-01 实施 10 送 10：不复权收盘价减半，涨跌额以除权参考价 10.0 为基准
+        name = 'ex_rights'
+
+        def __init__(self):
+            self.bar_requests = []
+            self.factor_requests = 0
+
+        def get_daily_bars(self, stock_code, start_date, end_date, adjust='qfq'):
+            assert adjust == 'none'
+            self.bar_requests.append((start_date, end_date))
+            dates = pd.bdate_range(start_date, end_date)
+            after = dates >= pd.Timestamp('2024-02-01')
+            closes = np.where(after, 10.2, 20.0)
+            changes = np.where(dates == pd.Timestamp('2024-02-01'), 0.2, 0.0)
+            return pd.DataFrame({
+                '日期': dates.strftime('%Y-%m-%d'), '开盘': closes, '收盘': closes, '最高': closes,
+                '最低': closes, '成交量': 1000.0, '成交额': 1e6, '涨跌额': changes, '换手率': 1.5
+            })
+
+        def get_adjust_factors(self, stock_code):
+            self.factor_requests += 1
+            return pd.DataFrame({'日期': ['2024-01-02', '2024-02-01'], '复权因子': [1.0, 2.0]})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'bars.sqlite')
+        provider = ExRightsProvider()
+        scraper = GEMLimitUpScraper(provider=provider, cache_path=cache_path, requests_per_second=None)
+        january = scraper.get_stock_daily_data('300001', '2024-01-01', '2024-01-31')
+        assert provider.factor_requests == 1
+        assert list(january['收盘'].unique()) == [10.0]
+
+        # 新增区间中出现除权除息，只下载新的日线并重新获取一次复权因子
+        extended = scraper.get_stock_daily_data('300001', '2024-01-01', '2024-02-02')
+        assert provider.bar_requests == [('2024-01-01', '2024-01-31'), ('2024-02-01', '2024-02-02')]
+        assert provider.factor_requests == 2
+        scraper.get_stock_daily_data('300001', '2024-01-01', '2024-02-02')
+        assert provider.factor_requests == 2
+        assert list(extended['收盘'].iloc[[0, -1]]) == [10.0, 10.2]
+
+        hfq = GEMLimitUpScraper(provider=provider, cache_path=cache_path, adjust='hfq')
+        raw = GEMLimitUpScraper(provider=provider, cache_path=cache_path, adjust='none')
+        assert list(hfq.get_stock_daily_data('300001', '2024-01-01', '2024-02-02')['收盘'].iloc[[0, -1]]) == [20.0, 20.4]
+        assert list(raw.get_stock_daily_data('300001', '2024-01-01', '2024-02-02')['收盘'].iloc[[0, -1]]) == [20.0, 10.2]
+        assert len(provider.bar_requests) == 2
+
+        # 除权日的前复权涨幅不会被误判为跌停
+        records = scraper.identify_limit_up_stocks(extended, '300001', '测试')
+        assert records == []
+        print("✅ 除权除息后前复权价格连续，仓库只补充新数据并刷新一次复权因子")
+    return True
+
+def test_exchange_limit_rules():
+    """测试按板块、制度阶段和 ST 状态计算涨停价及封板分类"""
+    print("\n=== 测试交易所涨跌停规则 ===")
+
+    def bars(dates, prev_close, open_, high, low, close, change=None):
+        # 第一行为前收盘价，第二行为待识别的K线
+        return pd.DataFrame({
+            '日期': dates, '开盘': [prev_close, open_], '最高': [prev_close, high], '最低': [prev_close, low],
+            '收盘': [prev_close, close], '涨跌额': [0.0, close - prev_close if change is None else change],
+            '成交量': 1000.0, '成交额': 1e6, '换手率': 1.0,
+        })
+
+    frames = [
+        # 创业板注册制改革前为 10%，改革当日起为 20%
+        ('300001', '创业甲', bars(['2020-08-20', '2020-08-21'], 10.0, 10.5, 11.0, 10.4, 11.0)),
+        ('300002', '创业乙', bars(['2020-08-21', '2020-08-24'], 11.0, 12.0, 13.2, 11.8, 13.2)),
+        # 主板 ST 为 5%：10.05 × 1.05 = 10.5525 → 10.55
+        ('600001', '*ST测试', bars(['2024-03-01', '2024-03-04'], 10.05, 10.2, 10.55, 10.1, 10.55)),
+        # 10.05 × 1.1 = 11.055 四舍五入为 11.06，收盘 11.05 只算触板
+        ('000001', '主板甲', bars(['2024-03-01', '2024-03-04'], 10.05, 10.5, 11.06, 10.4, 11.05)),
+        # 北交所 30% 一字板
+        ('830001', '北证甲', bars(['2024-03-01', '2024-03-04'], 10.0, 13.0, 13.0, 13.0, 13.0)),
+        # 科创板 T 字板：开盘涨停、盘中打开、收盘回封
+        ('688001', '科创甲', bars(['2024-03-01', '2024-03-04'], 10.0, 12.0, 12.0, 11.5, 12.0)),
+        # 除权除息日按涨跌额还原除权参考价 10.00，涨停价为 11.00
+        ('600002', '除权甲', bars(['2024-03-01', '2024-03-04'], 20.0, 10.5, 11.0, 10.4, 11.0, change=1.0)),
+    ]
+    compact = concat_stock_bars(frames)
+    rules = classify_limit_bars(
+        compact['code'].to_numpy(), compact['date'].to_numpy(), is_st_name(compact['name'].astype(str)),
+        compact['close'].to_numpy() - compact['change'].to_numpy(), compact['open'].to_numpy(),
+        compact['high'].to_numpy(), compact['low'].to_numpy(), compact['close'].to_numpy())
+    second = np.arange(1, len(compact), 2)
+    assert list(rules['limit_pct'][second]) == [10, 20, 5, 10, 30, 20, 10]
+    assert list(rules['limit_price'][second]) == [11.0, 13.2, 10.55, 11.06, 13.0, 12.0, 11.0]
+    assert list(rules['closed'][second]) == [True, True, True, False, True, True, True]
+    assert list(rules['touched'][second]) == [True] * 7
+    assert list(rules['one_word'][second]) == [False, False, False, False, True, False, False]
+
+    records = detect_limit_up(compact)
+    assert list(records['股票代码']) == ['300001', '300002', '600001', '830001', '688001', '600002']
+    assert list(records['涨停幅度(%)']) == [10, 20, 5, 30, 20, 10]
+    assert list(records['封板形态']) == ['换手板', '换手板', '换手板', '一字板', 'T字板', '换手板']
+    assert list(records['前日收盘价']) == [10.0, 11.0, 10.05, 10.0, 10.0, 10.0]
+
+    # 容差只用于复权乘数不为 1 的K线：未复权的 11.99（涨停价 12.00）和 1.19（涨停价 1.20）不是涨停
+    near = [('300003', '创业丙', bars(['2024-03-01', '2024-03-04'], 10.0, 11.5, 11.99, 11.4, 11.99).assign(复权乘数=1.0)),
+            ('300004', '创业丁', bars(['2024-03-01', '2024-03-04'], 1.0, 1.1, 1.19, 1.05, 1.19).assign(复权乘数=1.0))]
+    assert detect_limit_up(concat_stock_bars(near), tolerance=0.01).empty
+    adjusted = [(code, name, frame.assign(复权乘数=0.5)) for code, name, frame in near]
+    assert len(detect_limit_up(concat_stock_bars(adjusted), tolerance=0.01)) == 2
+    # 收盘价高于涨停价说明当日没有涨跌幅限制
+    assert detect_limit_up(concat_stock_bars([
+        ('300005', '创业戊', bars(['2024-03-01', '2024-03-04'], 10.0, 12.0, 13.5, 11.8, 13.5))])).empty
+
+    # 注册制新股上市后前 5 个交易日不设涨跌幅限制，按数据源提供的上市日期排除
+    days = pd.bdate_range('2024-03-01', periods=10).strftime('%Y-%m-%d')
+
+    def rising(dates):
+        # 连续按涨停价收盘
+        closes = [10.0]
+        for _ in dates:
+            closes.append(float(limit_up_price(closes[-1], 20)))
+        closes = np.asarray(closes[1:])
+        return pd.DataFrame({'日期': dates, '开盘': closes, '最高': closes, '最低': closes, '收盘': closes,
+                             '涨跌额': np.diff(np.concatenate(([10.0], closes))),
+                             '成交量': 1000.0, '成交额': 1e6, '换手率': 1.0})
+
+    veteran = bars(list(days[:2]), 10.0, 10.0, 10.0, 10.0, 10.0)
+    listing_dates = listing_date_series(pd.DataFrame({'code': ['301999', '300007'],
+                                                      'listing_date': [days[3], '2015-06-01']}))
+    batch = concat_stock_bars([('300006', '老股', veteran), ('301999', '新股', rising(list(days[3:9])))])
+    ipo_records = detect_limit_up(batch, listing_dates=listing_dates)
+    assert list(ipo_records['涨停日期']) == [days[8]] and list(ipo_records['连板数']) == [1]
+    # 逐只识别、按窗口识别与整批识别结果相同
+    alone = detect_limit_up(concat_stock_bars([('301999', '新股', rising(list(days[6:9])))]),
+                            listing_dates=listing_dates)
+    assert list(alone['涨停日期']) == [days[8]]
+
+    # 停牌后复牌（批次中第一根K线晚于其他股票）的老股不是新股，复牌后的涨停照常识别
+    active = rising(list(days)).assign(开盘=10.0, 最高=10.0, 最低=10.0, 收盘=10.0, 涨跌额=0.0)
+    resumed = [('300006', '老股', active), ('300007', '复牌', rising(list(days[5:])))]
+    resumed_bars = concat_stock_bars(resumed)
+    for listing in (None, listing_dates):
+        batch_records = detect_limit_up(resumed_bars, listing_dates=listing)
+        single_records = detect_limit_up(concat_stock_bars(resumed[1:]), listing_dates=listing)
+        assert list(batch_records['连板数']) == list(single_records['连板数']) == [1, 2, 3, 4, 5]
+    print(f"✅ {len(frames)} 种板块/制度组合的涨停价与封板分类正确，新股上市初期和未复权K线不误判")
+    return True
+
+def test_vectorized_detection_matches_reference():
+    """测试批量涨停识别与逐行计算结果一致"""
+    print("\n=== 测试批量涨停识别 ===")
+    scraper = _OfflineScraper(stock_count=30)
+    end_date = '2024-01-31'
+    stocks = scraper.get_gem_stock_list()
+    frames = [(code, name, scraper.get_stock_daily_data(code, '2024-01-01', end_date))
+              for code, name in zip(stocks['code'], stocks['name'])]
+
+    batch = scraper.identify_limit_up_batch(concat_stock_bars(frames))
+
+    # 逐行计算的参考结果：创业板 20% 涨停价按十进制四舍五入到分
+    expected = []
+    for code, name, frame in frames:
+        closes = frame['收盘'].tolist()
+        for i in range(1, len(closes)):
+            limit_price = (Decimal(str(closes[i - 1])) * Decimal('1.2')).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            if Decimal(str(closes[i])) >= limit_price:
+                pct = (closes[i] - closes[i - 1]) / closes[i - 1] * 100
+                expected.append((code, frame['日期'].iloc[i], round(pct, 2)))
+
+    actual = list(zip(batch['股票代码'], batch['涨停日期'], batch['涨跌幅(%)']))
+    assert actual == expected, (actual, expected)
+    assert list(batch['前日收盘价'] < batch['涨停价格']) == [True] * len(batch)
+
+    # 单只股票接口仍返回记录字典列表
+    code, name, frame = frames[0]
+    records = scraper.identify_limit_up_stocks(frame, code, name)
+    assert [r['涨停日期'] for r in records] == [e[1] for e in expected if e[0] == code]
+    print(f"✅ 批量识别 {len(frames)} 只股票，{len(batch)} 条涨停记录与逐行计算一致")
+    return True
+
+def test_streaming_output_matches_batch():
+    """测试流式输出与一次性汇总结果一致"""
+    print("\n=== 测试流式输出 ===")
+    scraper = _OfflineScraper(stock_count=40)
+    expected = scraper.scrape_limit_up_stocks(days_back=30)
+    expected_sheets = scraper.create_summary_data(expected)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path, accumulator = scraper.scrape_to_file_streaming(
+            days_back=30, filename=os.path.join(tmp, 'stream.xlsx'))
+        sheets = pd.read_excel(xlsx_path, sheet_name=None)
+        expected_names = ['涨停股票数据'] + [name for name, sheet in expected_sheets.items() if not sheet.empty]
+        assert list(sheets) == expected_names, list(sheets)
+        assert len(sheets['涨停股票数据']) == len(expected)
+
+        actual_sheets = accumulator.to_sheets()
+        pd.testing.assert_frame_equal(actual_sheets['统计汇总'], expected_sheets['统计汇总'])
+        for name, key in [('按股票统计', '股票代码'), ('按日期统计', '涨停日期'), ('连板天梯', '涨停日期')]:
+            left = actual_sheets[name].sort_values(key).reset_index(drop=True)
+            right = expected_sheets[name].sort_values(key).reset_index(drop=True)
+            pd.testing.assert_frame_equal(left, right, check_dtype=False)
+
+        csv_path, _ = scraper.scrape_to_file_streaming(
+            days_back=30, filename=os.path.join(tmp, 'stream.csv'), output_format='csv')
+        assert len(pd.read_csv(csv_path, dtype={'股票代码': str})) == len(expected)
+        assert os.path.exists(os.path.join(tmp, 'stream_按股票统计.csv'))
+    print(f"✅ 流式写出 {accumulator.total_records} 条记录，汇总结果与一次性计算一致")
+    return True
+
+def test_offline_providers_and_benchmark():
+    """测试合成数据源、录制回放数据源和性能基准"""
+    print("\n=== 测试离线数据源与性能基准 ===")
+    provider = SyntheticProvider(n_stocks=20, n_days=60, seed=7)
+    scraper = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider)
+    result = scraper.scrape_limit_up_stocks(days_back=90)
+    assert not result.empty and result['股票代码'].str.startswith('300').all()
+    again = GEMLimitUpScraper(requests_per_second=None, use_cache=False,
+                              provider=SyntheticProvider(n_stocks=20, n_days=60, seed=7))
+    pd.testing.assert_frame_equal(result, again.scrape_limit_up_stocks(days_back=90))
+
+    # 错误注入（不重试）：失败的股票被跳过，其余股票的结果不受影响
+    flaky = SyntheticProvider(n_stocks=20, n_days=60, seed=7, error_rate=0.3)
+    flaky_result = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=flaky,
+                                     max_retries=0).scrape_limit_up_stocks(days_back=90)
+    assert len(flaky_result) < len(result)
+    assert set(flaky_result['涨停日期'] + flaky_result['股票代码']) <= set(result['涨停日期'] + result['股票代码'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start, end = str(provider.calendar[0].date()), str(provider.calendar[-1].date())
+        record_provider(provider, tmp, start, end)
+        replay = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=ReplayProvider(tmp))
+        pd.testing.assert_frame_equal(result, replay.scrape_limit_up_stocks(days_back=90), check_dtype=False)
+
+        results = run_benchmarks([(10, 30)], output_path=os.path.join(tmp, 'bench.jsonl'))
+        assert set(results[0]['seconds']) == {'fetch', 'detection', 'summary', 'export'}
+        assert results[0]['requests'] == 10
+        assert os.path.getsize(os.path.join(tmp, 'bench.jsonl')) > 0
+    print(f"✅ 合成/回放数据源结果一致（{len(result)} 条涨停记录），基准测试正常输出")
+    return True
+
+def test_resume_from_journal():
+    """测试运行中断后从运行日志恢复"""
+    print("\n=== 测试断点续跑 ===")
+
+    class CrashingScraper(GEMLimitUpScraper):
+        def _fetch_stock_bars(self, idx, total_stocks, stock_code, stock_name, start_date, end_date):
+            if idx == 9:
+                raise KeyboardInterrupt("模拟进程中断")
+            return super()._fetch_stock_bars(idx, total_stocks, stock_code, stock_name, start_date, end_date)
+
+    def make_provider():
+        return SyntheticProvider(n_stocks=20, n_days=60, seed=3)
+
+    expected = GEMLimitUpScraper(requests_per_second=None, use_cache=False,
+                                 provider=make_provider()).scrape_limit_up_stocks(days_back=90)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_path = os.path.join(tmp, 'journal.jsonl')
+        crashing = CrashingScraper(requests_per_second=None, use_cache=False, provider=make_provider())
+        try:
+            crashing.scrape_limit_up_stocks(days_back=90, journal_path=journal_path)
+            raise AssertionError("应当在第 9 只股票处中断")
+        except KeyboardInterrupt:
+            pass
+
+        # 模拟跨日恢复：日志首行的日期范围记录为前一天的运行
+        with open(journal_path, encoding='utf-8') as f:
+            lines = f.readlines()
+        header = json.loads(lines[0])
+        recorded = (header['start_date'], header['end_date'])
+        shifted = tuple((pd.Timestamp(day) - pd.Timedelta(days=1)).strftime('%Y-%m-%d') for day in recorded)
+        header['start_date'], header['end_date'] = shifted
+        with open(journal_path, 'w', encoding='utf-8') as f:
+            f.writelines([json.dumps(header, ensure_ascii=False) + '\n'] + lines[1:])
+
+        class RangeRecordingScraper(GEMLimitUpScraper):
+            ranges = set()
+
+            def _fetch_stock_bars(self, idx, total_stocks, stock_code, stock_name, start_date, end_date):
+                self.ranges.add((start_date, end_date))
+                return super()._fetch_stock_bars(idx, total_stocks, stock_code, stock_name, start_date, end_date)
+
+        provider = make_provider()
+        resumed = RangeRecordingScraper(requests_per_second=None, use_cache=False, provider=provider)
+        result = resumed.scrape_limit_up_stocks(days_back=90, journal_path=journal_path, resume=True)
+
+        assert provider.request_count == 12, provider.request_count
+        assert RangeRecordingScraper.ranges == {shifted}, RangeRecordingScraper.ranges
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False)
+
+        # 天数不同时沿用日志中的日期范围继续恢复（所有股票均已完成，不再抓取）
+        provider = make_provider()
+        GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider
+                          ).scrape_limit_up_stocks(days_back=60, journal_path=journal_path, resume=True)
+        assert provider.request_count == 0, provider.request_count
+
+        # 复权方式、涨停阈值或数据源与日志不一致时不恢复，重新抓取全部股票
+        for options in [{'adjust': 'none'}, {'limit_up_threshold': 9.5}]:
+            provider = make_provider()
+            GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider, **options
+                              ).scrape_limit_up_stocks(days_back=90, journal_path=journal_path, resume=True)
+            assert provider.request_count == 20, (options, provider.request_count)
+        GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=ReplayProvider(tmp)
+                          ).scrape_limit_up_stocks(days_back=90, journal_path=journal_path, resume=True)
+        with open(journal_path, encoding='utf-8') as f:
+            header = json.loads(f.readline())
+        assert (header['adjust'], header['provider'], header['days_back']) == ('qfq', 'replay', 90)
+    print("✅ 恢复运行只抓取剩余 12 只股票，结果与完整运行一致；运行参数不一致时不恢复")
+    return True
+
+def test_retry_and_adaptive_concurrency():
+    """测试请求重试、熔断器和 AIMD 自适应并发"""
+    print("\n=== 测试请求重试与自适应并发 ===")
+
+    def make_scraper(provider):
+        executor = RequestExecutor(
+            retry_policy=RetryPolicy(max_retries=5, base_delay=0.001, max_delay=0.01),
+            circuit_breaker=CircuitBreaker(failure_threshold=50, reset_timeout=0.01),
+            concurrency_limiter=AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=8),
+        )
+        return GEMLimitUpScraper(max_workers=8, requests_per_second=None, use_cache=False,
+                                 provider=provider, request_executor=executor)
+
+    expected = make_scraper(SyntheticProvider(n_stocks=30, n_days=60, seed=5)).scrape_limit_up_stocks(days_back=90)
+    scraper = make_scraper(SyntheticProvider(n_stocks=30, n_days=60, seed=5, error_rate=0.3))
+    result = scraper.scrape_limit_up_stocks(days_back=90)
+    pd.testing.assert_frame_equal(result, expected)
+    assert scraper.request_executor.stats['retries'] > 0
+    assert scraper.report_failed_stocks().empty
+
+    # 一直失败的股票在重试耗尽后进入失败报告
+    always_failing = SyntheticProvider(n_stocks=3, n_days=60, seed=5, error_rate=1.0)
+    failing_scraper = make_scraper(always_failing)
+    failing_scraper.scrape_limit_up_stocks(days_back=90)
+    assert list(failing_scraper.report_failed_stocks()['股票代码']) == ['300001', '300002', '300003']
+    assert always_failing.request_count == 3 * 6
+
+    # AIMD：连续成功时加性增，失败时乘性减
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=8)
+    for _ in range(40):
+        limiter.acquire()
+        limiter.release(True, 0.01)
+    assert limiter.limit == 8, limiter.limit
+    limiter.acquire()
+    limiter.release(False)
+    assert limiter.limit == 4, limiter.limit
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    start = time.monotonic()
+    breaker.wait_until_allowed()
+    assert time.monotonic() - start >= 0.04 and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    print(f"✅ 30% 错误率下重试 {scraper.request_executor.stats['retries']} 次后结果完整，失败报告与 AIMD 正常")
+    return True
+
+def test_compact_bar_schema():
+    """测试紧凑日线格式的字段类型、内存占用和往返转换"""
+    print("\n=== 测试紧凑日线格式 ===")
+    provider = SyntheticProvider(n_stocks=50, n_days=120, seed=11)
+    start, end = str(provider.calendar[0].date()), str(provider.calendar[-1].date())
+    stocks = provider.get_stock_list()
+    frames = [(code, name, provider.get_daily_bars(code, start, end))
+              for code, name in zip(stocks['code'], stocks['name'])]
+
+    bars = concat_stock_bars(frames)
+    assert str(bars['code'].dtype) == 'int32' and str(bars['date'].dtype) == 'int32'
+    assert str(bars['close'].dtype) == 'float32' and str(bars['name'].dtype) == 'category'
+    raw = pd.concat([frame.assign(股票代码=code, 股票名称=name) for code, name, frame in frames])
+    ratio = raw.memory_usage(deep=True).sum() / bars.memory_usage(deep=True).sum()
+    assert ratio > 2.5, ratio
+
+    assert list(decode_codes(bars['code'].iloc[[0]])) == ['300001']
+    assert decode_dates(bars['date'].iloc[[0]])[0] == frames[0][2]['日期'].iloc[0]
+
+    # 识别结果的价格与原始数据完全一致
+    records = detect_limit_up(bars, 19.0)
+    original = raw.set_index(['股票代码', '日期'])['收盘']
+    assert list(records['涨停价格']) == [original[(c, d)] for c, d in zip(records['股票代码'], records['涨停日期'])]
+    print(f"✅ 紧凑格式内存占用降低 {ratio:.1f} 倍，识别出 {len(records)} 条涨停记录")
+    return True
+
+def test_limit_up_streaks():
+    """测试连板数、板型、连板天梯和最长连板统计"""
+    print("\n=== 测试连板统计 ===")
+    dates = pd.bdate_range('2024-03-01', periods=8).strftime('%Y-%m-%d')
+    # A：3 连板后断板一天再涨停（断板回封）；B：2 连板
+    closes = {
+        '300001': [10.0, 12.0, 14.4, 17.28, 17.0, 20.4, 20.5, 20.6],
+        '300002': [5.0, 5.1, 6.12, 7.34, 7.3, 7.2, 7.1, 7.0],
+    }
+    frames = [(code, f"股票{code}", pd.DataFrame({
+        '日期': dates, '开盘': close, '收盘': close, '最高': close, '最低': close,
+        '成交量': 1000, '成交额': 1e6, '换手率': 1.0})) for code, close in closes.items()]
+    scraper = _OfflineScraper()
+    records = scraper.identify_limit_up_batch(concat_stock_bars(frames))
+
+    assert list(records['连板数']) == [1, 2, 3, 1, 1, 2], list(records['连板数'])
+    assert list(records['板型']) == ['首板', '连板', '连板', '断板回封', '首板', '连板'], list(records['板型'])
+
+    sheets = scraper.create_summary_data(records)
+    ladder = sheets['连板天梯'].set_index('涨停日期')
+    assert ladder.loc[dates[3], '最高连板'] == 3 and ladder.loc[dates[3], '连板总数'] == 2
+    assert ladder.loc[dates[2], '首板'] == 1 and ladder.loc[dates[2], '2板'] == 1
+    assert ladder.loc[dates[5], '断板回封'] == 1
+
+    longest = sheets['最长连板']
+    assert list(longest['股票代码']) == ['300001', '300002'] and list(longest['连板天数']) == [3, 2]
+    assert longest['开始日期'].iloc[0] == dates[1] and longest['结束日期'].iloc[0] == dates[3]
+    print(f"✅ 连板数与板型正确，最长连板 {longest['连板天数'].iloc[0]} 天")
+    return True
+
+# 导入主模块的耗时预算（秒），akshare 和 openpyxl 不应在导入时加载
+IMPORT_TIME_BUDGET = 1.5
+
+def test_market_scan_sharding():
+    """测试全市场扫描按板块分片、多进程处理后与整体识别结果一致"""
+    print("\n=== 测试全市场分片扫描 ===")
+    options = {'n_stocks': 40, 'n_days': 60, 'end_date': '2024-03-29', 'universe': 'market', 'seed': 5}
+    provider = SyntheticProvider(**options)
+    date_range = (str(provider.calendar[0].date()), str(provider.calendar[-1].date()))
+    stocks = provider.get_stock_list()
+
+    # 创业板筛选包含 301 开头的代码
+    gem = GEMLimitUpScraper(provider=provider, use_cache=False).get_gem_stock_list()
+    assert set(code[:3] for code in gem['code']) == {'300', '301'}
+
+    scanner = MarketScanner(provider='synthetic', provider_options=options, processes=2, shard_size=3,
+                            requests_per_second=None, use_cache=False)
+    records = scanner.scan(date_range=date_range)
+
+    stats = scanner.shard_stats
+    assert stats['股票数'].sum() == len(stocks) and stats['股票数'].max() <= 3
+    assert list(stats['分片']) == list(range(1, len(stats) + 1))
+    # 同一分片内的股票属于同一板块
+    assert list(stats['板块'].drop_duplicates()) == ['主板', '创业板', '科创板', '北交所']
+
+    bars = concat_stock_bars((code, name, provider.get_daily_bars(code, *date_range))
+                             for code, name in zip(stocks['code'], stocks['name']))
+    expected = detect_limit_up(bars, tolerance=0.01)
+    assert sorted(zip(records['股票代码'], records['涨停日期'])) == \
+        sorted(zip(expected['股票代码'], expected['涨停日期']))
+    assert set(records['涨停幅度(%)']) == {10, 20, 30}
+    print(f"✅ {len(stocks)} 只股票分为 {len(stats)} 个分片，合并得到 {len(records)} 条涨停记录")
+    return True
+
+def test_rolling_window_incremental_update():
+    """测试增量模式逐日更新滚动窗口后与完整重算结果一致"""
+    print("\n=== 测试滚动窗口增量更新 ===")
+    provider = SyntheticProvider(n_stocks=30, n_days=80, end_date='2024-03-29', limit_up_prob=0.1, seed=3)
+
+    class RangeRecordingScraper(GEMLimitUpScraper):
+        def __init__(self):
+            super().__init__(provider=provider, use_cache=False, requests_per_second=None)
+            self.ranges = set()
+
+        def get_stock_daily_data(self, stock_code, start_date, end_date):
+            self.ranges.add((start_date, end_date))
+            return super().get_stock_daily_data(stock_code, start_date, end_date)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'rolling_state.json')
+        RangeRecordingScraper().update_rolling_window(20, state_path=state_path, end_date='2024-03-10')
+        for day in pd.bdate_range('2024-03-11', '2024-03-29'):
+            scraper = RangeRecordingScraper()
+            records, summary = scraper.update_rolling_window(20, state_path=state_path, end_date=str(day.date()))
+            # 每次只抓取上次处理到的交易日之后的数据
+            assert scraper.ranges == {(str((day - pd.offsets.BDay(1) + pd.Timedelta(days=1)).date()),
+                                       str(day.date()))}, scraper.ranges
+
+        # 同一天重复运行不再抓取
+        scraper = RangeRecordingScraper()
+        scraper.update_rolling_window(20, state_path=state_path, end_date='2024-03-29')
+        assert scraper.ranges == set()
+
+    # 完整重算：从增量模式首次构建窗口的日期开始识别，保留最终窗口内的记录
+    stocks = provider.get_stock_list()
+    bars = concat_stock_bars((code, name, provider.get_daily_bars(code, '2024-02-19', '2024-03-29'))
+                             for code, name in zip(stocks['code'], stocks['name']))
+    expected = detect_limit_up(bars, tolerance=0.01)
+    expected = expected[expected['涨停日期'] >= '2024-03-09']
+    columns = ['股票代码', '涨停日期', '连板数', '板型', '涨跌幅(%)']
+    assert sorted(map(tuple, records[columns].to_numpy().tolist())) == \
+        sorted(map(tuple, expected[columns].to_numpy().tolist()))
+
+    sheets = summary.to_sheets()
+    for sheet_name, sheet_df in scraper.create_summary_data(expected).items():
+        pd.testing.assert_frame_equal(sheets[sheet_name].reset_index(drop=True),
+                                      sheet_df.reset_index(drop=True), check_dtype=False)
+
+    # 某天抓取失败的股票下次从自己处理到的日期继续抓取，缺失交易日的涨停不会丢失
+    lost_code = expected.loc[expected['涨停日期'] == '2024-03-28', '股票代码'].iloc[0]
+
+    class FlakyScraper(RangeRecordingScraper):
+        def get_stock_daily_data(self, stock_code, start_date, end_date):
+            if stock_code == lost_code and end_date == '2024-03-28':
+                self.failed_stocks[stock_code] = '连接超时'
+                return pd.DataFrame()
+            return super().get_stock_daily_data(stock_code, start_date, end_date)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'rolling_state.json')
+        FlakyScraper().update_rolling_window(20, state_path=state_path, end_date='2024-03-10')
+        for day in pd.bdate_range('2024-03-11', '2024-03-29'):
+            scraper = FlakyScraper()
+            flaky_records, _ = scraper.update_rolling_window(20, state_path=state_path, end_date=str(day.date()))
+        assert scraper.ranges == {('2024-03-29', '2024-03-29'), ('2024-03-28', '2024-03-29')}, scraper.ranges
+    assert sorted(map(tuple, flaky_records[columns].to_numpy().tolist())) == \
+        sorted(map(tuple, expected[columns].to_numpy().tolist()))
+
+    # 状态日期之后缺少交易日的股票不延续连板：300002 缺少 03-05 的K线，03-06 的涨停为首板
+    def limit_bars(dates, closes, prev_close):
+        return pd.DataFrame({'日期': dates, '开盘': closes, '最高': closes, '最低': closes, '收盘': closes,
+                             '涨跌额': np.diff(np.concatenate(([prev_close], closes))),
+                             '成交量': 1000.0, '成交额': 1e6, '换手率': 1.0})
+    first = concat_stock_bars([('300001', '甲', limit_bars(['2024-03-01', '2024-03-04'], [12.0, 14.4], 10.0)),
+                               ('300002', '乙', limit_bars(['2024-03-01', '2024-03-04'], [12.0, 14.4], 10.0))])
+    _, carry = detect_limit_up_incremental(first)
+    second = concat_stock_bars([('300001', '甲', limit_bars(['2024-03-05', '2024-03-06'], [17.28, 20.74], 14.4)),
+                                ('300002', '乙', limit_bars(['2024-03-06'], [17.28], 14.4))])
+    gap_records, _ = detect_limit_up_incremental(second, carry)
+    assert list(zip(gap_records['股票代码'], gap_records['连板数'])) == [('300001', 3), ('300001', 4), ('300002', 1)]
+    print(f"✅ 逐日增量更新 {len(pd.bdate_range('2024-03-11', '2024-03-29'))} 次，"
+          f"窗口内 {len(records)} 条涨停记录与完整重算一致；抓取失败的交易日下次补抓")
+    return True
+
+def test_intraday_watcher_events():
+    """测试盘中快照比较产生的触板、封板、炸板事件"""
+    print("\n=== 测试盘中涨停监控 ===")
+    # 300001 昨收 10.00（涨停价 12.00），600001 昨收 10.05（涨停价 11.06），688001 昨收 20.00（涨停价 24.00）
+    ticks = [
+        ('2024-03-04 09:30:00', [11.50, 10.50, 24.00], [11.60, 10.60, 24.00]),
+        ('2024-03-04 09:31:00', [11.90, 11.06, 24.00], [12.00, 11.06, 24.00]),
+        ('2024-03-04 09:32:00', [12.00, 11.02, 24.00], [12.00, 11.06, 24.00]),
+        ('2024-03-04 09:33:00', [11.95, 11.06, float('nan')], [12.00, 11.06, 24.00]),
+    ]
+    rows = []
+    for timestamp, prices, highs in ticks:
+        for code, name, prev_close, price, high in zip(['300001', '600001', '688001'], ['创业甲', '主板甲', '科创甲'],
+                                                      [10.0, 10.05, 20.0], prices, highs):
+            rows.append({'code': code, 'name': name, 'price': price, 'prev_close': prev_close,
+                         'open': prev_close, 'high': high, 'low': prev_close, 'timestamp': timestamp})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        feed_path = os.path.join(tmp, 'feed.csv')
+        pd.DataFrame(rows).to_csv(feed_path, index=False)
+        events, watcher = watch(ReplaySnapshotSource(feed_path))
+
+        # 命令行回放时 --count 限制回放的快照份数；replay 数据源没有实时快照，不可用于轮询
+        events_path = os.path.join(tmp, 'events.csv')
+        intraday_watch.main(['--replay', feed_path, '--count', '2', '--events', events_path])
+        assert list(pd.read_csv(events_path)['快照时间'].str[-8:].unique()) == ['09:30:00', '09:31:00']
+        try:
+            intraday_watch.parse_args(['--provider', 'replay'])
+            raise AssertionError("--provider replay 应被拒绝")
+        except SystemExit:
+            pass
+
+    actual = [(t[-8:], kind, code) for t, kind, code in zip(events['快照时间'], events['事件'], events['股票代码'])]
+    assert actual == [
+        ('09:30:00', '触板', '688001'), ('09:30:00', '封板', '688001'),
+        ('09:31:00', '触板', '300001'), ('09:31:00', '触板', '600001'), ('09:31:00', '封板', '600001'),
+        ('09:32:00', '封板', '300001'), ('09:32:00', '炸板', '600001'),
+        # 688001 最新价缺失时保持封板状态，不产生炸板事件
+        ('09:33:00', '封板', '600001'), ('09:33:00', '炸板', '300001'),
+    ], actual
+    assert list(events.loc[events['股票代码'] == '600001', '涨停价'].unique()) == [11.06]
+    assert watcher.latency_summary()['events'] == len(events)
+
+    # 同一交易日内某只股票从快照中缺失后重新出现，不会重置状态、重复产生触板 / 封板事件；日期变化时才重置
+    frame = pd.DataFrame(rows[-3:]).drop(columns='timestamp').assign(price=[12.0, 11.06, 24.0])
+    replay = LimitUpWatcher()
+    first_events = replay.process(Snapshot.from_frame(frame, '2024-03-04 09:40:00'))
+    assert [kind for kind, *_ in first_events] == ['触板'] * 3 + ['封板'] * 3
+    assert replay.process(Snapshot.from_frame(frame.iloc[1:], '2024-03-04 09:41:00')) == []
+    # 缺失的股票沿用已知的昨收和涨停价
+    assert not np.isnan(replay.limit_price).any() and replay.sealed.all()
+    assert replay.process(Snapshot.from_frame(frame, '2024-03-04 09:42:00')) == []
+    assert len(replay.process(Snapshot.from_frame(frame, '2024-03-05 09:30:00'))) == 6
+
+    # 轮询合成数据源的全市场快照
+    provider = SyntheticProvider(n_stocks=500, universe='market', limit_up_prob=0.2)
+    events, watcher = watch(PollingSnapshotSource(provider, interval=0, max_snapshots=20),
+                            LimitUpWatcher(boards=['创业板']))
+    assert watcher.snapshots == 20 and len(watcher.codes) == 100
+    assert len(events) and set(events['股票代码'].str[:2]) == {'30'}
+    print(f"✅ 事件序列正确，轮询 {watcher.snapshots} 份快照产生 {len(events)} 个事件，"
+          f"延迟 p99 {watcher.latency_summary()['p99_ms']} 毫秒")
+    return True
+
+def test_pipeline_metrics():
+    """测试运行指标：阶段耗时、请求延迟和错误次数、处理量以及 JSON / Prometheus 导出"""
+    print("\n=== 测试运行指标 ===")
+    metrics = Metrics()
+    executor = RequestExecutor(retry_policy=RetryPolicy(max_retries=5, base_delay=0.001, max_delay=0.01),
+                               circuit_breaker=CircuitBreaker(failure_threshold=50, reset_timeout=0.01),
+                               metrics=metrics)
+    provider = SyntheticProvider(n_stocks=20, n_days=60, seed=5, error_rate=0.3)
+    scraper = GEMLimitUpScraper(max_workers=4, requests_per_second=None, use_cache=False,
+                                provider=provider, request_executor=executor, metrics=metrics)
+    with tempfile.TemporaryDirectory() as tmp:
+        result = scraper.scrape_limit_up_stocks(days_back=90)
+        output_path = scraper.save_to_excel(result, os.path.join(tmp, 'report.xlsx'))
+        paths = metrics.export(os.path.join(tmp, 'metrics'))
+        metrics.export(os.path.join(tmp, 'metrics'))
+
+        data = metrics.to_dict()
+        assert set(data['stages']) == {'list_fetch', 'bar_fetch', 'detection', 'summary', 'excel_write'}
+        assert all(stage['wall_seconds'] >= 0 and stage['count'] >= 1 for stage in data['stages'].values())
+        bars = data['requests']['get_daily_bars']
+        assert bars['count'] == provider.request_count
+        assert bars['errors'] == executor.stats['retries'] > 0
+        assert bars['p50_seconds'] <= bars['p90_seconds'] <= bars['p99_seconds']
+        assert data['counters']['bar_rows'] == 20 * 60
+        assert data['counters']['bar_bytes'] > 0
+        assert data['counters']['record_rows'] == len(result)
+        assert data['counters']['output_bytes'] == os.path.getsize(output_path)
+
+        with open(paths[0], encoding='utf-8') as f:
+            assert json.load(f)['counters'] == data['counters']
+        with open(paths[1], encoding='utf-8') as f:
+            prom = f.read()
+        assert 'gem_scraper_stage_wall_seconds{stage="detection"}' in prom
+        assert f'gem_scraper_request_latency_seconds_count{{operation="get_daily_bars"}} {bars["count"]}' in prom
+        assert f'gem_scraper_request_latency_seconds_bucket{{operation="get_daily_bars",le="+Inf"}} {bars["count"]}' in prom
+        with open(paths[2], encoding='utf-8') as f:
+            assert len(f.readlines()) == 2
+
+    # 进度输出限频：间隔内的多次推进只在结束时输出一行
+    progress_logs = []
+    handler = logging.Handler()
+    handler.emit = lambda record: progress_logs.append(record.getMessage())
+    progress_logger = logging.getLogger('metrics')
+    level = progress_logger.level
+    progress_logger.addHandler(handler)
+    progress_logger.setLevel(logging.INFO)
+    try:
+        progress = ProgressReporter(1000, label='抓取日线', interval=60)
+        for _ in range(1000):
+            progress.advance()
+        progress.finish()
+    finally:
+        progress_logger.removeHandler(handler)
+        progress_logger.setLevel(level)
+    assert len(progress_logs) == 1 and progress_logs[0].startswith('抓取日线 1000/1000'), progress_logs
+    print(f"✅ 指标完整：{metrics.stage_summary()}")
+    return True
+
+def test_report_formats():
+    """测试列宽估算和 Parquet / Feather / CSV 报表输出"""
+    print("\n=== 测试报表输出格式 ===")
+    scraper = GEMLimitUpScraper(requests_per_second=None, use_cache=False, report_formats=('xlsx', 'parquet'),
+                                provider=SyntheticProvider(n_stocks=20, n_days=60, limit_up_prob=0.1, seed=2))
+    result = scraper.scrape_limit_up_stocks(days_back=90)
+    sheets = scraper.create_summary_data(result)
+
+    # 行数不超过抽样上限时与逐个单元格计算的列宽一致
+    expected_widths = [min(max(max(result[column].astype(str).map(len).max(), len(column)) + 2, 10), 30)
+                       for column in result.columns]
+    assert estimate_column_widths(result) == expected_widths
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = scraper.save_report(result, os.path.join(tmp, 'report.xlsx'))
+        assert paths[0] == os.path.join(tmp, 'report.xlsx')
+        assert paths[1:] == [os.path.join(tmp, f'report{suffix}.parquet')
+                             for suffix in [''] + [f'_{name}' for name in sheets]]
+        workbook = pd.ExcelFile(paths[0])
+        assert workbook.sheet_names == ['涨停股票数据'] + list(sheets)
+
+        for output_format, reader in [('parquet', pd.read_parquet), ('feather', pd.read_feather),
+                                      ('csv', lambda path: pd.read_csv(path, dtype={'股票代码': str}))]:
+            written = scraper.save_report(result, os.path.join(tmp, 'report.xlsx'), formats=[output_format])
+            loaded = reader(written[0])
+            assert list(loaded.columns) == list(result.columns) and len(loaded) == len(result)
+            assert list(loaded['股票代码']) == list(result['股票代码'])
+            assert np.allclose(loaded['涨跌幅(%)'], result['涨跌幅(%)'])
+            assert list(pd.to_datetime(loaded['涨停日期'])) == list(pd.to_datetime(result['涨停日期']))
+            stock_stats = reader(os.path.join(tmp, f'report_按股票统计.{output_format}'))
+            assert list(stock_stats['涨停次数']) == list(sheets['按股票统计']['涨停次数'])
+
+        # 没有涨停记录时仍写出带表头的空文件
+        empty_paths = scraper.save_report(pd.DataFrame(), os.path.join(tmp, 'empty.xlsx'), formats=['parquet'])
+        assert empty_paths == [os.path.join(tmp, 'empty.parquet')] and pd.read_parquet(empty_paths[0]).empty
+
+    try:
+        GEMLimitUpScraper(use_cache=False, report_formats=('xls',))
+        assert False, "不支持的格式应报错"
+    except ValueError:
+        pass
+    print(f"✅ 列宽估算与逐格计算一致，{len(result)} 条记录的 xlsx / parquet / feather / csv 输出正确")
+    return True
+
+def test_query_service():
+    """测试涨停记录查询服务：索引查询与直接筛选一致、LRU 缓存和 HTTP 接口"""
+    print("\n=== 测试涨停记录查询服务 ===")
+    scraper = GEMLimitUpScraper(requests_per_second=None, use_cache=False,
+                                provider=SyntheticProvider(n_stocks=40, n_days=80, limit_up_prob=0.1, seed=4))
+    result = scraper.scrape_limit_up_stocks(days_back=120)
+    columns = ['股票代码', '涨停日期', '连板数']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = scraper.save_report(result, os.path.join(tmp, 'report.xlsx'), formats=['parquet', 'xlsx'])
+        service = LimitUpQueryService(paths[0])
+        assert len(LimitUpQueryService(os.path.join(tmp, 'report.xlsx')).index) == len(result)
+
+    def expected(frame):
+        return sorted(map(tuple, frame[columns].to_numpy().tolist()))
+
+    day = result['涨停日期'].mode()[0]
+    assert expected(service.on_date(day)) == expected(result[result['涨停日期'] == day])
+    all_dates = sorted(result['涨停日期'].unique())
+    start, end = all_dates[5], all_dates[20]
+    window = result[(result['涨停日期'] >= start) & (result['涨停日期'] <= end)]
+    assert len(window) and expected(service.date_range(start, end)) == expected(window)
+    code = result['股票代码'].mode()[0]
+    history = service.stock_history(int(code))
+    assert list(history['涨停日期']) == sorted(result.loc[result['股票代码'] == code, '涨停日期'])
+    assert expected(service.stock_history(code, start, end)) == expected(window[window['股票代码'] == code])
+    assert service.stock_history('300999').empty and service.on_date('2000-01-01').empty
+
+    counts = result.groupby('股票代码').agg(count=('涨停日期', 'size'), streak=('连板数', 'max')).reset_index()
+    top = service.top_stocks(5)
+    reference = counts.sort_values(['count', 'streak', '股票代码'], ascending=[False, False, True]).head(5)
+    assert list(top['股票代码']) == list(reference['股票代码'])
+    top_streak = service.top_stocks(3, by='streak')
+    assert list(top_streak['最高连板']) == sorted(counts['streak'], reverse=True)[:3]
+    dates = service.date_counts()
+    assert dict(zip(dates['涨停日期'], dates['涨停股票数'])) == result['涨停日期'].value_counts().to_dict()
+
+    # 相同参数（不同写法）命中缓存
+    misses = service.stats()['cache']['misses']
+    assert service.on_date(pd.Timestamp(day)) is service.on_date(day)
+    assert service.stats()['cache']['misses'] == misses
+
+    server, thread = serve_in_background(service)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/stocks/{code}") as response:
+            body = json.loads(response.read().decode('utf-8'))
+        assert [row['涨停日期'] for row in body] == list(history['涨停日期'])
+        with urllib.request.urlopen(f"{base}/top?n=5") as response:
+            assert [row['股票代码'] for row in json.loads(response.read())] == list(reference['股票代码'])
+        with urllib.request.urlopen(f"{base}/stats") as response:
+            assert json.loads(response.read())['records'] == len(result)
+        try:
+            urllib.request.urlopen(f"{base}/limit-ups?date=not-a-date")
+            assert False, "非法日期应返回 400"
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        service.on_date(day)
+    cached_us = (time.perf_counter() - start) * 1000
+    print(f"✅ 查询结果与直接筛选一致，缓存命中单次查询约 {cached_us:.1f} 微秒")
+    return True
+
+def test_distributed_work_queue():
+    """测试分布式模式：多个工作者按租约领取任务，失联工作者的任务在租约到期后重新发放"""
+    print("\n=== 测试分布式工作队列 ===")
+    def make_provider():
+        return SyntheticProvider(n_stocks=45, n_days=60, limit_up_prob=0.1, seed=6)
+
+    expected = GEMLimitUpScraper(requests_per_second=None, use_cache=False,
+                                 provider=make_provider()).scrape_limit_up_stocks(days_back=90)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = WorkQueue(os.path.join(tmp, 'queue.sqlite'), lease_seconds=0.5)
+        coordinator = Coordinator(queue, GEMLimitUpScraper(requests_per_second=None, use_cache=False,
+                                                           provider=make_provider()), task_size=5)
+        job_id = coordinator.submit(days_back=90)
+        assert queue.progress(job_id)['pending'] == 9
+
+        # 失联的工作者领取任务后不再续租也不提交结果
+        lost_task, _ = queue.claim(job_id, 'lost-worker')
+        workers = [Worker(queue, make_provider, worker_id=f'worker-{i}', requests_per_second=None, use_cache=False)
+                   for i in range(3)]
+        threads = [threading.Thread(target=worker.run, args=(job_id,), kwargs={'poll_interval': 0.05})
+                   for worker in workers]
+        for thread in threads:
+            thread.start()
+        counts = coordinator.wait(job_id, poll_interval=0.05, timeout=30)
+        for thread in threads:
+            thread.join()
+        assert counts == {'pending': 0, 'leased': 0, 'done': 9, 'failed': 0}, counts
+        assert sum(worker.tasks_completed for worker in workers) == 9
+        # 失联工作者迟到的结果被丢弃
+        assert not queue.complete(job_id, lost_task, 'lost-worker', {'records': [], 'failed': {}})
+
+        result = coordinator.merge(job_id)
+        columns = ['股票代码', '涨停日期', '连板数', '涨跌幅(%)']
+        assert sorted(map(tuple, result[columns].to_numpy().tolist())) == \
+            sorted(map(tuple, expected[columns].to_numpy().tolist()))
+        assert queue.latest_job() == job_id
+
+        # 必然失败的任务按退避重新发放，尝试次数达到上限后标记为 failed，协调者不会一直等待
+        class BrokenWorker(Worker):
+            def process(self, scraper, params, payload):
+                raise RuntimeError("数据源不可用")
+
+        failing = WorkQueue(os.path.join(tmp, 'failing.sqlite'), lease_seconds=5.0, max_attempts=3, retry_delay=0.05)
+        failing_job = failing.create_job(queue.job_params(job_id), [{'stocks': [['300001', '测试']]}])
+        started = time.monotonic()
+        assert BrokenWorker(failing, make_provider, requests_per_second=None,
+                            use_cache=False).run(failing_job, poll_interval=0.01) == 0
+        elapsed = time.monotonic() - started
+        assert Coordinator(failing, coordinator.scraper).wait(failing_job, poll_interval=0.01, timeout=5) == \
+            {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+        [(_, status, _, error)] = failing.results(failing_job)
+        assert status == 'failed' and '数据源不可用' in error
+        # 两次退避：0.05 + 0.1 秒
+        assert elapsed >= 0.15, elapsed
+        attempts = sqlite3.connect(failing.path).execute("SELECT attempts FROM tasks").fetchone()[0]
+        assert attempts == 3, attempts
+    print(f"✅ 3 个工作者完成 9 个任务（含 1 个租约到期重新发放的任务），合并 {len(result)} 条涨停记录；"
+          f"失败任务重试 {attempts} 次后标记为失败")
+    return True
+
+def test_http_bar_provider():
+    """测试连接池 HTTP 数据源：对本地回放服务复用 keep-alive 连接，结果与直接回放一致"""
+    print("\n=== 测试连接池 HTTP 数据源 ===")
+    synthetic = SyntheticProvider(n_stocks=40, n_days=80, limit_up_prob=0.1, seed=8)
+    start_date, end_date = str(synthetic.calendar[0].date()), str(synthetic.calendar[-1].date())
+
+    assert [kline_secid(code) for code in ['300001', '600519', '688001', '900901', '430047', '920001']] == \
+        ['0.300001', '1.600519', '1.688001', '1.900901', '0.430047', '0.920001']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        record_provider(synthetic, tmp, start_date, end_date)
+        replay = ReplayProvider(tmp)
+        server = KlineReplayServer(replay).start()
+        try:
+            provider = HttpBarProvider(base_url=server.url, pool_size=4, timeout=(1.0, 5.0), fallback=replay)
+            bars = provider.get_daily_bars('300001', start_date, end_date, adjust='none')
+            pd.testing.assert_frame_equal(bars, replay.get_daily_bars('300001', start_date, end_date, adjust='none'),
+                                          check_dtype=False)
+            response = provider.session.get(server.url, params={'secid': '0.300001', 'beg': '19000101',
+                                                                'end': '21000101'})
+            assert response.headers['Content-Encoding'] == 'gzip'
+
+            def scrape(source):
+                return GEMLimitUpScraper(max_workers=4, requests_per_second=None, use_cache=False,
+                                         provider=source).scrape_limit_up_stocks(days_back=150)
+
+            connections = server.stats['connections']
+            result = scrape(provider)
+            pd.testing.assert_frame_equal(result, scrape(ReplayProvider(tmp)))
+            # 4 个线程共用连接池，40 只股票的请求最多新建 4 个连接
+            assert server.stats['connections'] - connections <= 4, server.stats
+            assert provider.get_daily_bars('300999', start_date, end_date).empty
+
+            broken = HttpBarProvider(base_url=server.url + '/missing', fallback=replay)
+            try:
+                broken.get_daily_bars('300001', start_date, end_date)
+                assert False, "HTTP 错误应抛出异常"
+            except Exception as e:
+                assert '404' in str(e)
+            provider.close()
+        finally:
+            server.stop()
+    print(f"✅ {server.stats['requests']} 次请求共用 {server.stats['connections']} 个连接，结果与直接回放一致")
+    return True
+
+def test_vectorized_summary_engine():
+    """测试向量化统计汇总与逐组聚合结果一致，且同一份数据只计算一次"""
+    print("\n=== 测试统计汇总引擎 ===")
+    scraper = _OfflineScraper(stock_count=60)
+    records = scraper.scrape_limit_up_stocks(days_back=60)
+    assert not records.empty
+    sheets = scraper.create_summary_data(records)
+
+    # 用 pandas 分组聚合逐项计算参考结果
+    grouped = records.groupby('股票代码', sort=True)
+    expected = grouped.agg(
+        股票名称=('股票名称', 'first'),
+        涨停次数=('涨跌幅(%)', 'size'),
+        **{'最大涨幅(%)': ('涨跌幅(%)', 'max'),
+           '平均涨幅(%)': ('涨跌幅(%)', 'mean'),
+           '最小涨幅(%)': ('涨跌幅(%)', 'min')},
+        总成交量=('成交量', 'sum')
+    ).round(2).reset_index()
+    expected = expected.sort_values(['涨停次数', '股票代码'], ascending=[False, True]).reset_index(drop=True)
+    actual = sheets['按股票统计'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    date_counts = records.groupby('涨停日期').size().sort_index(ascending=False)
+    assert sheets['按日期统计']['涨停日期'].astype(str).tolist() == [str(d) for d in date_counts.index]
+    assert sheets['按日期统计']['涨停股票数'].tolist() == date_counts.tolist()
+    overall = dict(zip(sheets['统计汇总']['统计项'], sheets['统计汇总']['数值']))
+    assert overall['总涨停记录数'] == len(records)
+    assert overall['涉及股票数量'] == records['股票代码'].nunique()
+    assert overall['最大涨幅(%)'] == round(records['涨跌幅(%)'].max(), 2)
+    assert {'连板天梯', '最长连板'} <= set(sheets)
+
+    # 打印统计信息和再次生成汇总表复用同一份结果
+    summary = scraper.summarize(records)
+    assert scraper.create_summary_data(records) is sheets
+    assert abs(summary.pct_mean - records['涨跌幅(%)'].mean()) < 1e-9
+    assert scraper.summarize(records.copy()) is not summary
+    print(f"✅ {len(records)} 条记录、{summary.stock_count} 只股票的汇总与分组聚合一致")
+    return True
+
+def test_bar_dataset():
+    """测试按年分区的内存映射日线数据集：分段识别与一次识别一致，筛选读取零拷贝"""
+    print("\n=== 测试日线数据集 ===")
+    import pyarrow as pa
+    from bar_dataset import BarDataset, build_dataset
+    from limit_up_engine import detect_limit_up_chunks
+
+    provider = SyntheticProvider(n_stocks=30, n_days=700, seed=5)
+    scraper = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider)
+    days_back = (provider.calendar[-1] - provider.calendar[0]).days
+    bars = concat_stock_bars(scraper.iter_stock_bars(days_back))
+    key = ['股票代码', '涨停日期']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = BarDataset(tmp)
+        # 分 3 批抓取时各批先暂存，每个年分区只重写一次
+        merged = []
+        original_merge = dataset._merge_partition
+        dataset._merge_partition = lambda year, parts: merged.append(year) or original_merge(year, parts)
+        assert build_dataset(scraper, dataset, days_back, batch_size=12) == len(bars)
+        assert sorted(merged) == dataset.years() and not os.path.exists(os.path.join(tmp, '_staging'))
+        # 重复写入同样的K线不会产生重复行
+        dataset.write(bars.iloc[:500])
+        stats = dataset.stats()
+        assert stats['rows'] == len(bars) and stats['stocks'] == 30 and stats['partitions'] >= 3, stats
+
+        loaded = BarDataset(tmp).load()
+        pd.testing.assert_frame_equal(loaded.drop(columns='name'), bars.drop(columns='name'))
+        assert np.array_equal(np.asarray(loaded['name'], dtype=object), np.asarray(bars['name'], dtype=object))
+
+        # 跨分区延续连板状态，结果与拼接后一次识别相同
+        expected = detect_limit_up(bars).sort_values(key).reset_index(drop=True)
+        actual = scraper.identify_from_dataset(BarDataset(tmp))
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected)
+
+        # 按日期范围和股票筛选
+        last_date = dataset.date_range()[1]
+        start = str(decode_dates([bars['date'].quantile(0.4)])[0])
+        end = str(decode_dates([bars['date'].quantile(0.8)])[0])
+        codes = ['300003', '300010', '300011']
+        selected = bars[(bars['date'] >= encode_dates([start])[0]) & (bars['date'] <= encode_dates([end])[0])
+                        & bars['code'].isin([int(code) for code in codes])].reset_index(drop=True)
+        subset = dataset.load(start, end, codes)
+        pd.testing.assert_frame_equal(subset.drop(columns='name'), selected.drop(columns='name'))
+        expected = detect_limit_up(selected).sort_values(key).reset_index(drop=True)
+        actual = scraper.identify_from_dataset(dataset, (start, end), codes)
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected)
+        assert detect_limit_up_chunks(dataset.iter_partitions(codes=['399999'])).empty
+
+        # 整个分区和单只股票的读取直接引用内存映射，不分配新的内存
+        allocated = pa.total_allocated_bytes()
+        frames = list(BarDataset(tmp).iter_partitions()) + list(dataset.iter_partitions(codes=['300007']))
+        assert pa.total_allocated_bytes() - allocated < 4096
+        assert all(not frame[column].to_numpy().flags.owndata
+                   for frame in frames for column in ('code', 'date', 'close', 'volume'))
+        assert all(not frame['name'].array.codes.flags.owndata for frame in frames)
+
+        scraper.output_directory = os.path.join(tmp, 'output')
+        recent = scraper.run_dataset(BarDataset(tmp), days_back=60)
+        assert not recent.empty and os.path.exists(scraper.output_file)
+        assert recent['涨停日期'].min() >= str(pd.Timestamp(last_date) - pd.Timedelta(days=60))[:10]
+    print(f"✅ {stats['partitions']} 个年分区共 {stats['rows']} 根K线，分段识别与一次识别一致，筛选读取零拷贝")
+    return True
+
+def test_scenario_runs_share_one_fetch():
+    """测试多情景模式只抓取一次，且各情景结果与单独运行一致"""
+    print("\n=== 测试多情景模式 ===")
+    scenarios = [(5, None), (30, 9.5), (90, 19.0), (250, 19.8), (250, None)]
+    provider = SyntheticProvider(n_stocks=40, n_days=200, seed=7, limit_up_prob=0.08)
+    scraper = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider)
+    results = scraper.scrape_scenarios(scenarios)
+    assert provider.request_count == 40, provider.request_count
+
+    for (days_back, threshold), actual in zip(scenarios, results):
+        separate = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider,
+                                     limit_up_threshold=threshold)
+        expected = separate.scrape_limit_up_stocks(days_back=days_back)
+        assert not expected.empty
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper = GEMLimitUpScraper(requests_per_second=None, use_cache=False, provider=provider,
+                                    report_formats=('csv',))
+        scraper.output_directory = tmp
+        reports = scraper.run_scenarios(scenarios + [(5, None)])
+        assert list(reports) == scenarios
+        for days_back, threshold in scenarios:
+            path = os.path.join(tmp, f"gem_limit_up_stocks_{scenario_name(days_back, threshold)}.csv")
+            assert len(pd.read_csv(path)) == len(reports[(days_back, threshold)])
+
+    assert parse_scenario('30') == (30, None) and parse_scenario('90:19.8') == (90, 19.8)
+    assert parse_scenario('250:rule') == (250, None)
+    print(f"✅ {len(scenarios)} 个情景共用一次抓取（{provider.request_count} 次请求），结果与单独运行一致")
+    return True
+
+def test_akshare_provider_symbols():
+    """测试 akshare 数据源的证券代码：历史行情用 6 位代码，复权因子按交易所加 sh / sz / bj 前缀"""
+    print("\n=== 测试 akshare 数据源证券代码 ===")
+    calls = []
+
+    class FakeAkshare:
+        def stock_zh_a_hist(self, symbol, period, start_date, end_date, adjust):
+            calls.append(('hist', symbol, start_date, end_date, adjust))
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        def stock_zh_a_daily(self, symbol, adjust):
+            calls.append(('daily', symbol, adjust))
+            return pd.DataFrame({'date': ['2024-01-02'], 'hfq_factor': ['1.5']})
+
+        def stock_info_sz_name_code(self, symbol):
+            return pd.DataFrame({'A股代码': ['300001'], 'A股上市日期': ['2009-10-30']})
+
+        def stock_info_sh_name_code(self, symbol):
+            code = '600519' if symbol == '主板A股' else '688001'
+            return pd.DataFrame({'证券代码': [code], '上市日期': [pd.Timestamp('2019-07-22')]})
+
+        def stock_info_bj_name_code(self):
+            return pd.DataFrame({'证券代码': [920001], '上市日期': ['2021-11-15']})
+
+    class FakeAkshareProvider(AkshareProvider):
+        ak = FakeAkshare()
+
+    provider = FakeAkshareProvider()
+    for code in ['600519', '688001', '300001', '000001', '830799']:
+        provider.get_daily_bars(code, '2024-01-01', '2024-01-31', adjust='none')
+        factors = provider.get_adjust_factors(code)
+    assert list(factors['复权因子']) == [1.5]
+    assert [call[1] for call in calls if call[0] == 'hist'] == ['600519', '688001', '300001', '000001', '830799']
+    assert [call[1] for call in calls if call[0] == 'daily'] == \
+        ['sh600519', 'sh688001', 'sz300001', 'sz000001', 'bj830799']
+    assert calls[0] == ('hist', '600519', '20240101', '20240131', '')
+    listing = listing_date_series(provider.get_listing_dates())
+    assert list(decode_codes(listing.index)) == ['300001', '600519', '688001', '920001']
+    assert list(decode_dates(listing.to_numpy())) == ['2009-10-30', '2019-07-22', '2019-07-22', '2021-11-15']
+    print(f"✅ {len(calls)} 次调用的证券代码格式正确")
+    return True
+
+def test_import_time_budget():
+    """测试主模块导入耗时，以及离线流程不会加载 akshare 和 openpyxl"""
+    print("\n=== 测试导入耗时 ===")
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import gem_limitup_scraper\n"
+        "elapsed = time.perf_counter() - start\n"
+        "from data_providers import SyntheticProvider\n"
+        "scraper = gem_limitup_scraper.GEMLimitUpScraper(requests_per_second=None, use_cache=False,\n"
+        "                                                provider=SyntheticProvider(n_stocks=5, n_days=30))\n"
+        "scraper.create_summary_data(scraper.scrape_limit_up_stocks(days_back=60))\n"
+        "print(elapsed, 'akshare' in sys.modules, 'openpyxl' in sys.modules)\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    elapsed, akshare_loaded, openpyxl_loaded = float(output[0]), output[1], output[2]
+    assert akshare_loaded == 'False' and openpyxl_loaded == 'False', output
+    assert elapsed < IMPORT_TIME_BUDGET, elapsed
+    print(f"✅ 主模块导入耗时 {elapsed:.2f} 秒，离线流程未加载 akshare 和 openpyxl")
+    return True
+
 def main():
     """运行所有测试"""
     print("开始运行A股创业板涨停股票爬虫测试...")
@@ -129,7 +1346,31 @@ def main():
         test_gem_stock_list,
         test_single_stock_data,
         test_limit_up_identification,
-        test_small_batch_scraping
+        test_small_batch_scraping,
+        test_concurrent_scraping_matches_sequential,
+        test_bar_store_incremental_fetch,
+        test_bar_store_adjustment,
+        test_vectorized_detection_matches_reference,
+        test_exchange_limit_rules,
+        test_streaming_output_matches_batch,
+        test_offline_providers_and_benchmark,
+        test_resume_from_journal,
+        test_retry_and_adaptive_concurrency,
+        test_compact_bar_schema,
+        test_limit_up_streaks,
+        test_market_scan_sharding,
+        test_rolling_window_incremental_update,
+        test_intraday_watcher_events,
+        test_pipeline_metrics,
+        test_report_formats,
+        test_query_service,
+        test_distributed_work_queue,
+        test_http_bar_provider,
+        test_vectorized_summary_engine,
+        test_bar_dataset,
+        test_scenario_runs_share_one_fetch,
+        test_akshare_provider_symbols,
+        test_import_time_budget
     ]
     
     passed = 0